@@ -0,0 +1,386 @@
+"""
+Analytics - jam kerja, keterlambatan dan absen beruntun untuk dashboard HR
+
+Alur:
+- Database hanya melakukan satu GROUP BY (nama, tanggal) untuk rentang
+  tanggal yang belum ada di cache: jam masuk pertama, jam keluar terakhir,
+  jumlah scan per hari
+- Agregat harian di-cache per (scope, tanggal) bersama versi hari itu
+  (jumlah log, id log terbesar). Hari yang sudah lewat tetap bisa berubah
+  (sync batch offline /api/absensi/batch, backlog replicator kiosk, log yang
+  dihapus), jadi setiap pembacaan memvalidasi versi hari yang di-cache
+  dengan satu COUNT/MAX per tanggal dan hanya hari yang versinya berubah
+  dibaca ulang; hari ini selalu dibaca ulang
+- Metrik per karyawan/departemen dihitung dengan matriks NumPy
+  karyawan x hari kerja, tanpa loop per baris
+
+Jadwal shift dibaca dari file JSON (env SHIFT_SCHEDULE_FILE, default
+shifts.json):
+
+    {
+        "default": {"start": "08:00", "end": "17:00", "grace_minutes": 15},
+        "departemen": {"Production": {"start": "07:00", "end": "16:00"}},
+        "workdays": [0, 1, 2, 3, 4]
+    }
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from database import Statement, as_date
+
+SHIFT_SCHEDULE_FILE = "shifts.json"
+DEFAULT_SHIFT = {'start': '08:00', 'end': '17:00', 'grace_minutes': 15}
+DEFAULT_WORKDAYS = [0, 1, 2, 3, 4]
+
+# Jumlah hari (per scope) yang disimpan di cache
+CACHE_DAYS = 5000
+
+# Agregat harian per karyawan; jam masuk/keluar sebagai detik sejak tengah malam
+DAILY_ROWS = Statement('analytics_daily', """
+    SELECT tanggal, nama, MAX(departemen) AS departemen,
+           EXTRACT(EPOCH FROM MIN(jam)) AS first_in, EXTRACT(EPOCH FROM MAX(jam)) AS last_out,
+           COUNT(*) AS scans, MAX(id) AS last_id
+    FROM log_absensi
+    WHERE tanggal BETWEEN ? AND ?{scope_sql}
+    GROUP BY tanggal, nama
+""", sqlite="""
+    SELECT tanggal, nama, MAX(departemen) AS departemen,
+           CAST(strftime('%s', '1970-01-01 ' || MIN(jam)) AS INTEGER) AS first_in,
+           CAST(strftime('%s', '1970-01-01 ' || MAX(jam)) AS INTEGER) AS last_out,
+           COUNT(*) AS scans, MAX(id) AS last_id
+    FROM log_absensi
+    WHERE tanggal BETWEEN ? AND ?{scope_sql}
+    GROUP BY tanggal, nama
+""", types={'tanggal': as_date, 'first_in': float, 'last_out': float, 'scans': int, 'last_id': int})
+
+# Versi per hari untuk validasi cache: log baru menaikkan MAX(id), log yang
+# dihapus menurunkan COUNT(*)
+DAILY_VERSIONS = Statement('analytics_daily_versions', """
+    SELECT tanggal, COUNT(*) AS scans, MAX(id) AS last_id
+    FROM log_absensi
+    WHERE tanggal BETWEEN ? AND ?{scope_sql}
+    GROUP BY tanggal
+""", types={'tanggal': as_date, 'scans': int, 'last_id': int})
+
+EMPTY_DAY = (0, None)
+
+ROSTER = Statement('analytics_roster', "SELECT nama, departemen FROM karyawan WHERE 1=1{scope_sql} ORDER BY nama")
+
+
+def _seconds(value: str) -> int:
+    """'HH:MM' atau 'HH:MM:SS' -> detik sejak tengah malam"""
+    parts = [int(p) for p in str(value).split(':')]
+    parts += [0] * (3 - len(parts))
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+
+def _clock(seconds: float) -> Optional[str]:
+    """Detik sejak tengah malam -> 'HH:MM', None untuk NaN"""
+    if seconds is None or np.isnan(seconds):
+        return None
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+class ShiftSchedule:
+    def __init__(self, default: Optional[Dict] = None, departemen: Optional[Dict[str, Dict]] = None,
+                 workdays: Optional[List[int]] = None):
+        self.default = dict(DEFAULT_SHIFT, **(default or {}))
+        self.departemen = {name: dict(self.default, **shift) for name, shift in (departemen or {}).items()}
+        self.workdays = set(workdays if workdays is not None else DEFAULT_WORKDAYS)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'ShiftSchedule':
+        path = path or os.getenv('SHIFT_SCHEDULE_FILE', SHIFT_SCHEDULE_FILE)
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return cls(data.get('default'), data.get('departemen'), data.get('workdays'))
+        except Exception as e:
+            print(f"Error reading shift schedule {path}: {e}")
+            return cls()
+
+    def shift_for(self, departemen: Optional[str]) -> Dict:
+        return self.departemen.get(departemen, self.default)
+
+    def workdays_between(self, start: date, end: date) -> List[date]:
+        days = (end - start).days + 1
+        return [start + timedelta(days=i) for i in range(max(0, days))
+                if (start + timedelta(days=i)).weekday() in self.workdays]
+
+
+class AttendanceAnalytics:
+    def __init__(self, db, schedule: Optional[ShiftSchedule] = None, cache_days: int = CACHE_DAYS):
+        """
+        Args:
+            db: DatabaseManager dashboard (database.py)
+            schedule: Jadwal shift, default dari SHIFT_SCHEDULE_FILE
+            cache_days: Maksimal entry (scope, tanggal) di cache
+        """
+        self.db = db
+        self.schedule = schedule or ShiftSchedule.load()
+        self.cache_days = cache_days
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Data harian (database + cache)
+    # ------------------------------------------------------------------
+    def _fetch_days(self, start: date, end: date,
+                    scope: Tuple[str, list]) -> Dict[date, Tuple[Tuple[int, Optional[int]], List[Tuple]]]:
+        """
+        Returns:
+            Dict tanggal -> (versi, agregat harian); versi dihitung dari baris
+            yang sama sehingga konsisten dengan agregatnya
+        """
+        scope_sql, scope_params = scope
+        rows = self.db.fetch(
+            DAILY_ROWS, [start.isoformat(), end.isoformat()] + list(scope_params), scope_sql=scope_sql
+        )
+        days = {start + timedelta(days=i): [] for i in range((end - start).days + 1)}
+        versions = {}
+        for row in rows:
+            days.setdefault(row['tanggal'], []).append(
+                (row['nama'], row['departemen'], row['first_in'], row['last_out'], row['scans'])
+            )
+            scans, last_id = versions.get(row['tanggal'], EMPTY_DAY)
+            versions[row['tanggal']] = (scans + row['scans'], max(last_id or 0, row['last_id'] or 0))
+        return {day: (versions.get(day, EMPTY_DAY), entries) for day, entries in days.items()}
+
+    def _day_versions(self, start: date, end: date, scope: Tuple[str, list]) -> Dict[date, Tuple[int, Optional[int]]]:
+        scope_sql, scope_params = scope
+        rows = self.db.fetch(
+            DAILY_VERSIONS, [start.isoformat(), end.isoformat()] + list(scope_params), scope_sql=scope_sql
+        )
+        return {row['tanggal']: (row['scans'], row['last_id']) for row in rows}
+
+    def daily_rows(self, start: date, end: date, scope: Tuple[str, list] = ('', [])) -> Dict[date, List[Tuple]]:
+        """
+        Agregat harian per karyawan: (nama, departemen, first_in_detik, last_out_detik, scans)
+
+        Hari di cache divalidasi dengan versinya (satu query COUNT/MAX per
+        tanggal); hari yang belum ada atau versinya berubah dibaca dengan
+        satu query per rentang berurutan.
+        """
+        scope_key = (scope[0], tuple(scope[1]))
+        today = date.today()
+        wanted = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        result, cached, missing = {}, {}, []
+        with self._lock:
+            for day in wanted:
+                entry = self._cache.get((scope_key, day))
+                if entry is not None and day < today:
+                    self._cache.move_to_end((scope_key, day))
+                    cached[day] = entry
+                else:
+                    missing.append(day)
+
+        if cached:
+            versions = self._day_versions(min(cached), max(cached), scope)
+            for day, (version, rows) in cached.items():
+                if versions.get(day, EMPTY_DAY) == version:
+                    result[day] = rows
+                else:
+                    missing.append(day)
+            missing.sort()
+
+        # Gabungkan tanggal hilang yang berurutan menjadi satu query
+        ranges = []
+        for day in missing:
+            if ranges and (day - ranges[-1][1]).days == 1:
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        for range_start, range_end in ranges:
+            fetched = self._fetch_days(range_start, range_end, scope)
+            with self._lock:
+                for day, (version, rows) in fetched.items():
+                    result[day] = rows
+                    if day < today:
+                        self._cache[(scope_key, day)] = (version, rows)
+                        self._cache.move_to_end((scope_key, day))
+                while len(self._cache) > self.cache_days:
+                    self._cache.popitem(last=False)
+        return result
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Metrik
+    # ------------------------------------------------------------------
+    def _roster(self, scope: Tuple[str, list], departemen: Optional[str]) -> List[Tuple[str, str]]:
+        scope_sql, scope_params = scope
+        params = list(scope_params)
+        if departemen:
+            scope_sql += " AND departemen = ?"
+            params.append(departemen)
+        return [(row['nama'], row['departemen']) for row in self.db.fetch(ROSTER, params, scope_sql=scope_sql)]
+
+    def _matrices(self, start: date, end: date, scope: Tuple[str, list], departemen: Optional[str]):
+        """
+        Bangun matriks karyawan x hari kerja
+
+        Returns:
+            Tuple (roster, days, first_in, last_out) dengan first_in/last_out
+            float (detik), NaN = tidak hadir
+        """
+        end = min(end, date.today())
+        days = self.schedule.workdays_between(start, end)
+        roster = self._roster(scope, departemen)
+        # Karyawan yang sudah dihapus tapi masih punya log tetap dihitung
+        index = {nama: i for i, (nama, _) in enumerate(roster)}
+        daily = self.daily_rows(start, end, scope) if days else {}
+        for day in days:
+            for nama, dept, _, _, _ in daily.get(day, []):
+                if nama not in index and (not departemen or dept == departemen):
+                    index[nama] = len(roster)
+                    roster.append((nama, dept))
+
+        first_in = np.full((len(roster), len(days)), np.nan)
+        last_out = np.full((len(roster), len(days)), np.nan)
+        for column, day in enumerate(days):
+            rows = [row for row in daily.get(day, []) if row[0] in index]
+            if not rows:
+                continue
+            employees = np.fromiter((index[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+            first_in[employees, column] = [row[2] for row in rows]
+            last_out[employees, column] = [row[3] for row in rows]
+        return roster, days, first_in, last_out
+
+    def _shift_arrays(self, roster: List[Tuple[str, str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Batas terlambat (start + grace) dan jam selesai shift per karyawan, dalam detik"""
+        late_after = np.empty(len(roster))
+        shift_end = np.empty(len(roster))
+        for i, (_, dept) in enumerate(roster):
+            shift = self.schedule.shift_for(dept)
+            late_after[i] = _seconds(shift['start']) + int(shift.get('grace_minutes', 0)) * 60
+            shift_end[i] = _seconds(shift['end'])
+        return late_after, shift_end
+
+    @staticmethod
+    def _absence_streaks(present: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Absen beruntun terpanjang dan yang sedang berjalan per baris (hari kerja)
+
+        Posisi hadir terakhir di-propagate dengan maximum.accumulate, panjang
+        streak di setiap hari = jarak ke hari hadir terakhir.
+        """
+        if present.shape[1] == 0:
+            zeros = np.zeros(present.shape[0], dtype=np.int64)
+            return zeros, zeros
+        columns = np.arange(present.shape[1])
+        last_present = np.maximum.accumulate(np.where(present, columns, -1), axis=1)
+        streak = columns - last_present
+        return streak.max(axis=1), streak[:, -1]
+
+    def employee_metrics(self, start: date, end: date, scope: Tuple[str, list] = ('', []),
+                         departemen: Optional[str] = None) -> List[Dict]:
+        """
+        Metrik per karyawan dalam rentang tanggal (hanya hari kerja)
+
+        Returns:
+            List dict per karyawan, urut nama
+        """
+        roster, days, first_in, last_out = self._matrices(start, end, scope, departemen)
+        if not roster:
+            return []
+        late_after, shift_end = self._shift_arrays(roster)
+
+        present = ~np.isnan(first_in)
+        days_present = present.sum(axis=1)
+        hours = (last_out - first_in) / 3600.0
+        total_hours = np.nansum(hours, axis=1)
+        late_seconds = np.clip(first_in - late_after[:, None], 0, None)
+        late = np.nan_to_num(late_seconds) > 0
+        early_leave = np.nan_to_num(shift_end[:, None] - last_out) > 0
+        longest_streak, current_streak = self._absence_streaks(present)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_first_in = np.nansum(first_in, axis=1) / days_present
+            avg_last_out = np.nansum(last_out, axis=1) / days_present
+
+        result = []
+        for i, (nama, dept) in enumerate(roster):
+            present_days = int(days_present[i])
+            result.append({
+                'nama': nama,
+                'departemen': dept,
+                'hari_kerja': len(days),
+                'hari_hadir': present_days,
+                'hari_absen': len(days) - present_days,
+                'total_jam': round(float(total_hours[i]), 2),
+                'rata_jam': round(float(total_hours[i]) / present_days, 2) if present_days else 0.0,
+                'rata_jam_masuk': _clock(avg_first_in[i]),
+                'rata_jam_keluar': _clock(avg_last_out[i]),
+                'hari_terlambat': int(late[i].sum()),
+                'total_menit_terlambat': round(float(np.nansum(late_seconds[i])) / 60.0, 1),
+                'hari_pulang_cepat': int(early_leave[i].sum()),
+                'absen_beruntun_terpanjang': int(longest_streak[i]),
+                'absen_beruntun_saat_ini': int(current_streak[i])
+            })
+        result.sort(key=lambda row: row['nama'])
+        return result
+
+    def department_metrics(self, start: date, end: date, scope: Tuple[str, list] = ('', [])) -> List[Dict]:
+        """Metrik per departemen, agregasi dengan bincount atas matriks yang sama"""
+        roster, days, first_in, last_out = self._matrices(start, end, scope, None)
+        if not roster:
+            return []
+        late_after, _ = self._shift_arrays(roster)
+        names = sorted({dept or '-' for _, dept in roster})
+        dept_index = {name: i for i, name in enumerate(names)}
+        groups = np.array([dept_index[dept or '-'] for _, dept in roster])
+
+        present = ~np.isnan(first_in)
+        late = np.nan_to_num(first_in - late_after[:, None]) > 0
+        hours = np.nansum(last_out - first_in, axis=1) / 3600.0
+
+        size = len(names)
+        employees = np.bincount(groups, minlength=size)
+        present_days = np.bincount(groups, weights=present.sum(axis=1), minlength=size)
+        late_days = np.bincount(groups, weights=late.sum(axis=1), minlength=size)
+        total_hours = np.bincount(groups, weights=hours, minlength=size)
+        possible = employees * len(days)
+
+        return [
+            {
+                'departemen': name,
+                'jumlah_karyawan': int(employees[i]),
+                'hari_hadir': int(present_days[i]),
+                'tingkat_kehadiran': round(float(present_days[i] / possible[i]), 4) if possible[i] else 0.0,
+                'rata_jam': round(float(total_hours[i] / present_days[i]), 2) if present_days[i] else 0.0,
+                'hari_terlambat': int(late_days[i]),
+                'tingkat_keterlambatan': round(float(late_days[i] / present_days[i]), 4) if present_days[i] else 0.0
+            }
+            for i, name in enumerate(names)
+        ]
+
+    def employee_days(self, nama: str, start: date, end: date, scope: Tuple[str, list] = ('', [])) -> List[Dict]:
+        """Rincian harian satu karyawan: jam masuk/keluar, jam kerja, terlambat"""
+        daily = self.daily_rows(start, min(end, date.today()), scope)
+        result = []
+        for day in sorted(daily):
+            for row_nama, dept, first_in, last_out, scans in daily[day]:
+                if row_nama != nama:
+                    continue
+                shift = self.schedule.shift_for(dept)
+                late_after = _seconds(shift['start']) + int(shift.get('grace_minutes', 0)) * 60
+                result.append({
+                    'tanggal': day.isoformat(),
+                    'jam_masuk': _clock(first_in),
+                    'jam_keluar': _clock(last_out),
+                    'jam_kerja': round((last_out - first_in) / 3600.0, 2),
+                    'menit_terlambat': round(max(0.0, first_in - late_after) / 60.0, 1),
+                    'scan': scans
+                })
+        return result
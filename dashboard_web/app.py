@@ -1,64 +1,43 @@
-from flask import Flask, render_template, jsonify, request
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import sqlite3
-from datetime import datetime, timedelta,time
-import calendar
+from flask import Flask, render_template, jsonify, request, send_file, abort
+from datetime import date, datetime, timedelta
 import os
 
-app = Flask(__name__)
+import fast_json
+from analytics import AttendanceAnalytics
+from database import DatabaseManager, Statement, POSTGRESQL, as_date
+from thumbnails import ThumbnailService
 
-class DatabaseManager:
-    def __init__(self):
-        self.conn = None
-        self.init_connection()
-    
-    def init_connection(self):
-        """Inisialisasi koneksi database"""
-        try:
-            # Coba PostgreSQL dulu
-            self.conn = psycopg2.connect(
-                host=os.getenv('DB_HOST', 'localhost'),
-                database=os.getenv('DB_NAME', 'absensi_db'),
-                user=os.getenv('DB_USER', 'postgres'),
-                password=os.getenv('DB_PASSWORD', 'postgres'),
-                port=os.getenv('DB_PORT', '5432')
-            )
-            self.db_type = 'postgresql'
-            print("Connected to PostgreSQL")
-        except Exception as e:
-            # Fallback ke SQLite
-            print(f"PostgreSQL connection failed: {e}")
-            print("Falling back to SQLite")
-            self.conn = sqlite3.connect('absensi.db', check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row
-            self.db_type = 'sqlite'
-    
-    def get_cursor(self):
-        if self.db_type == 'postgresql':
-            return self.conn.cursor(cursor_factory=RealDictCursor)
-        else:
-            return self.conn.cursor()
-    
-    def execute_query(self, query, params=None):
-        cursor = self.get_cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        if query.strip().upper().startswith('SELECT'):
-            result = cursor.fetchall()
-            if self.db_type == 'sqlite':
-                # Convert sqlite3.Row to dict
-                result = [dict(row) for row in result]
-            return result
-        else:
-            self.conn.commit()
-            return cursor.rowcount
+app = Flask(__name__)
+# jsonify lewat orjson + kompresi gzip/brotli
+fast_json.init_app(app)
 
 db = DatabaseManager()
 
+analytics = AttendanceAnalytics(db)
+thumbnails = ThumbnailService(app.static_folder)
+
+# Foto bukti absensi tidak pernah ditimpa, thumbnail boleh di-cache lama oleh browser
+THUMBNAIL_MAX_AGE = 7 * 24 * 3600
+
+def scope_filter():
+    """
+    Filter tenant/site dari query string (?tenant=...&site=...) atau env
+    TENANT_ID / DASHBOARD_SITE_ID. site=all atau tanpa site = semua site.
+
+    Returns:
+        Tuple (potongan SQL " AND ...", list parameter)
+    """
+    tenant = request.args.get('tenant') or os.getenv('TENANT_ID')
+    site = request.args.get('site') or os.getenv('DASHBOARD_SITE_ID')
+    sql, params = '', []
+    if tenant:
+        sql += " AND tenant_id = ?"
+        params.append(tenant)
+    if site and site != 'all':
+        sql += " AND site_id = ?"
+        params.append(site)
+    return sql, params
+
 @app.route('/')
 def dashboard():
     """Halaman dashboard utama"""
@@ -74,59 +53,177 @@ def statistik():
     """Halaman statistik kehadiran"""
     return render_template('statistik.html')
 
+@app.route('/thumb/<size>/<path:image_path>')
+def thumbnail(size, image_path):
+    """Thumbnail foto absensi (WebP/JPEG), dibuat saat pertama diminta lalu di-cache di disk"""
+    try:
+        result = thumbnails.get(image_path, size, request.headers.get('Accept'))
+    except Exception as e:
+        print(f"Error creating thumbnail {image_path}: {e}")
+        abort(500)
+    if result is None:
+        abort(404)
+    cache_path, mimetype, etag = result
+    response = send_file(cache_path, mimetype=mimetype, etag=etag, max_age=THUMBNAIL_MAX_AGE, conditional=True)
+    response.vary.add('Accept')
+    return response
+
+# Kolom sort yang diizinkan -> ORDER BY (arah disisipkan lewat {d})
+LOG_SORT_COLUMNS = {
+    'tanggal': "tanggal {d}, jam {d}",
+    'jam': "jam {d}, tanggal DESC",
+    'nama': "nama {d}, tanggal DESC, jam DESC",
+    'departemen': "departemen {d}, tanggal DESC, jam DESC",
+    'posisi': "posisi {d}, tanggal DESC, jam DESC"
+}
+LOG_PAGE_SIZE_MAX = 200
+# Di atas batas ini total tidak dihitung persis (estimasi planner / "10000+")
+LOG_COUNT_CAP = 10000
+
+# {filter_sql} dari log_absensi_filters(), {limit_sql} '' / LIMIT ? [OFFSET ?]
+LOG_ABSENSI = Statement('log_absensi', """
+    SELECT nama, departemen, posisi, tanggal, jam, path_gambar, site_id, created_at
+    FROM log_absensi
+    WHERE 1=1{filter_sql}
+    ORDER BY {order_by}{limit_sql}
+""")
+
+LOG_ABSENSI_COUNT = Statement('log_absensi_count', f"""
+    SELECT COUNT(*) AS total
+    FROM (SELECT 1 FROM log_absensi WHERE 1=1{{filter_sql}} LIMIT {LOG_COUNT_CAP + 1}) t
+""")
+
+LOG_ABSENSI_MATCH = Statement('log_absensi_match', "SELECT 1 FROM log_absensi WHERE 1=1{filter_sql}")
+
+def log_absensi_filters():
+    """
+    Filter log absensi dari query string: start_date, end_date, nama (persis),
+    q (cari nama), departemen, plus scope tenant/site
+
+    Pencarian `q` di PostgreSQL memakai ILIKE '%q%' (index trigram
+    idx_log_absensi_nama_trgm), di SQLite prefix LIKE 'q%' (index
+    idx_log_absensi_nama_nocase).
+
+    Returns:
+        Tuple (potongan SQL " AND ...", list parameter)
+    """
+    sql, params = scope_filter()
+    if request.args.get('start_date'):
+        sql += " AND tanggal >= ?"
+        params.append(request.args['start_date'])
+    if request.args.get('end_date'):
+        sql += " AND tanggal <= ?"
+        params.append(request.args['end_date'])
+    if request.args.get('nama'):
+        sql += " AND nama = ?"
+        params.append(request.args['nama'])
+    search = request.args.get('q', '').strip()
+    if search:
+        if db.db_type == POSTGRESQL:
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            sql += " AND nama ILIKE ?"
+            params.append(f"%{escaped}%")
+        else:
+            sql += " AND nama LIKE ?"
+            params.append(search.replace('%', '').replace('_', '') + '%')
+    if request.args.get('departemen'):
+        sql += " AND departemen = ?"
+        params.append(request.args['departemen'])
+    return sql, params
+
+def count_log_absensi(filter_sql, params):
+    """
+    Jumlah baris yang cocok, dihitung persis sampai LOG_COUNT_CAP
+
+    Returns:
+        Tuple (total, estimated). Di atas cap, PostgreSQL memakai estimasi
+        row dari planner; SQLite mengembalikan cap + 1.
+    """
+    total = db.fetch_one(LOG_ABSENSI_COUNT, params, filter_sql=filter_sql)['total']
+    if total <= LOG_COUNT_CAP:
+        return total, False
+    estimate = db.estimate_rows(LOG_ABSENSI_MATCH, params, filter_sql=filter_sql)
+    return max(total, estimate or 0), True
+
+def stream_json_list(head, key, batches):
+    """
+    Response JSON bertahap {**head, key: [...]}: baris dikirim per batch
+    tanpa menampung seluruh hasil (tidak dikompresi after_request)
+    """
+    body = fast_json.raw_json_body(head, key, '[]')
+
+    def generate():
+        yield body[:-2]
+        first = True
+        for batch in batches:
+            if not batch:
+                continue
+            yield (b'' if first else b',') + fast_json.dumps(batch)[1:-1]
+            first = False
+        yield body[-2:]
+
+    return app.response_class(generate(), mimetype='application/json')
+
 @app.route('/api/log-absensi')
 def api_log_absensi():
-    """API untuk mendapatkan data log absensi"""
+    """
+    API untuk mendapatkan data log absensi
+
+    Dengan `page` (dan `size`, `sort`, `order`, `q`) hanya satu halaman yang
+    dikirim, ditambah info pagination. Tanpa `page` perilaku lama dipakai
+    (maksimal `limit` baris, default 1000; limit=0 = semua baris, dikirim
+    bertahap lewat cursor server-side).
+    """
     try:
-        # Filter parameters
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        nama = request.args.get('nama')
-        departemen = request.args.get('departemen')
-        limit = request.args.get('limit', 1000, type=int)
-
-        # Base query
-        query = """
-            SELECT nama, departemen, posisi, tanggal, jam, path_gambar, created_at
-            FROM log_absensi
-            WHERE 1=1
-        """
-        params = []
-
-        # Add filters
-        if start_date:
-            query += " AND tanggal >= %s" if db.db_type == 'postgresql' else " AND tanggal >= ?"
-            params.append(start_date)
-        if end_date:
-            query += " AND tanggal <= %s" if db.db_type == 'postgresql' else " AND tanggal <= ?"
-            params.append(end_date)
-        if nama:
-            query += " AND nama = %s" if db.db_type == 'postgresql' else " AND nama = ?"
-            params.append(nama)
-        if departemen:
-            query += " AND departemen = %s" if db.db_type == 'postgresql' else " AND departemen = ?"
-            params.append(departemen)
-
-        query += " ORDER BY tanggal DESC, jam DESC"
-        if limit:
-            query += f" LIMIT {limit}"
-
-        logs = db.execute_query(query, params)
-
-        # Konversi kolom 'jam' menjadi string
-        for log in logs:
-            if 'jam' in log:
-                jam_value = log['jam']
-                if jam_value is not None:
-                    if isinstance(jam_value, time):
-                        log['jam'] = jam_value.strftime('%H:%M:%S')
-                    else:
-                        log['jam'] = str(jam_value)
+        filter_sql, params = log_absensi_filters()
+        page = request.args.get('page', type=int)
+
+        result = {'success': True}
+        if page is not None:
+            size = max(1, min(request.args.get('size', 25, type=int), LOG_PAGE_SIZE_MAX))
+            page = max(1, page)
+            sort = request.args.get('sort', 'tanggal')
+            if sort not in LOG_SORT_COLUMNS:
+                raise ValueError(f"Invalid sort column: {sort}")
+            direction = 'ASC' if request.args.get('order', 'desc').lower() == 'asc' else 'DESC'
+            fragments = {
+                'filter_sql': filter_sql,
+                'order_by': LOG_SORT_COLUMNS[sort].format(d=direction),
+                'limit_sql': " LIMIT ? OFFSET ?"
+            }
+
+            total, estimated = count_log_absensi(filter_sql, params)
+            result['pagination'] = {
+                'page': page,
+                'size': size,
+                'total': total,
+                'estimated': estimated,
+                'pages': (total + size - 1) // size
+            }
+            params = params + [size, (page - 1) * size]
+        else:
+            limit = request.args.get('limit', 1000, type=int)
+            fragments = {
+                'filter_sql': filter_sql,
+                'order_by': "tanggal DESC, jam DESC",
+                'limit_sql': " LIMIT ?" if limit else ''
+            }
+            if limit:
+                params.append(limit)
+            else:
+                return stream_json_list(result, 'data', db.iter_batches(LOG_ABSENSI, params, **fragments))
+
+        if db.json_passthrough:
+            return fast_json.raw_json_response(app, result, 'data', db.fetch_json(LOG_ABSENSI, params, **fragments))
 
+        # tanggal/jam di-encode langsung oleh fast_json (ISO 8601)
+        result['data'] = db.fetch(LOG_ABSENSI, params, **fragments)
+        return jsonify(result)
+    except ValueError as e:
         return jsonify({
-            'success': True,
-            'data': logs
-        })
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         print("Error in /api/log-absensi:", e)
         return jsonify({
@@ -134,12 +231,18 @@ def api_log_absensi():
             'error': str(e)
         }), 500
 
+DEPARTEMEN_LIST = Statement('departemen_list', """
+    SELECT DISTINCT departemen FROM karyawan
+    WHERE departemen IS NOT NULL{scope_sql}
+    ORDER BY departemen
+""")
+
 @app.route('/api/departemen')
 def api_departemen():
     """API untuk mendapatkan list departemen"""
     try:
-        query = "SELECT DISTINCT departemen FROM karyawan WHERE departemen IS NOT NULL ORDER BY departemen"
-        departemen_list = db.execute_query(query)
+        scope_sql, scope_params = scope_filter()
+        departemen_list = db.fetch(DEPARTEMEN_LIST, scope_params, scope_sql=scope_sql)
         return jsonify({
             'success': True,
             'data': [d['departemen'] for d in departemen_list]
@@ -150,12 +253,21 @@ def api_departemen():
             'error': str(e)
         }), 500
 
+KARYAWAN_LIST = Statement('karyawan_list', """
+    SELECT nama, departemen, posisi, site_id FROM karyawan
+    WHERE 1=1{scope_sql}
+    ORDER BY nama
+""")
+
 @app.route('/api/karyawan')
 def api_karyawan():
     """API untuk mendapatkan list karyawan"""
     try:
-        query = "SELECT nama, departemen, posisi FROM karyawan ORDER BY nama"
-        karyawan_list = db.execute_query(query)
+        scope_sql, scope_params = scope_filter()
+        if db.json_passthrough:
+            raw = db.fetch_json(KARYAWAN_LIST, scope_params, scope_sql=scope_sql)
+            return fast_json.raw_json_response(app, {'success': True}, 'data', raw)
+        karyawan_list = db.fetch(KARYAWAN_LIST, scope_params, scope_sql=scope_sql)
         return jsonify({
             'success': True,
             'data': karyawan_list
@@ -166,6 +278,21 @@ def api_karyawan():
             'error': str(e)
         }), 500
 
+def month_range(year, month):
+    """Tanggal pertama bulan dan tanggal pertama bulan berikutnya (ISO)"""
+    first = date(int(year), int(month), 1)
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first.isoformat(), following.isoformat()
+
+# Rentang tanggal (bukan EXTRACT/strftime per baris) supaya index tanggal terpakai
+KEHADIRAN_BULANAN = Statement('kehadiran_bulanan', """
+    SELECT tanggal, COUNT(DISTINCT nama) AS jumlah_hadir
+    FROM log_absensi
+    WHERE tanggal >= ? AND tanggal < ?{scope_sql}
+    GROUP BY tanggal
+    ORDER BY tanggal
+""")
+
 @app.route('/api/statistik/kehadiran-bulanan')
 def api_statistik_bulanan():
     """API untuk statistik kehadiran bulanan"""
@@ -173,32 +300,9 @@ def api_statistik_bulanan():
         year = request.args.get('year', datetime.now().year)
         month = request.args.get('month', datetime.now().month)
         
-        # Query untuk mendapatkan kehadiran per hari dalam bulan
-        if db.db_type == 'postgresql':
-            query = """
-                SELECT 
-                    DATE(tanggal) as tanggal,
-                    COUNT(DISTINCT nama) as jumlah_hadir
-                FROM log_absensi 
-                WHERE EXTRACT(YEAR FROM tanggal) = %s 
-                AND EXTRACT(MONTH FROM tanggal) = %s
-                GROUP BY DATE(tanggal)
-                ORDER BY tanggal
-            """
-        else:
-            query = """
-                SELECT 
-                    tanggal,
-                    COUNT(DISTINCT nama) as jumlah_hadir
-                FROM log_absensi 
-                WHERE strftime('%Y', tanggal) = ? 
-                AND strftime('%m', tanggal) = ?
-                GROUP BY tanggal
-                ORDER BY tanggal
-            """
-        
-        params = [str(year), f"{int(month):02d}"]
-        data = db.execute_query(query, params)
+        # Kehadiran per hari dalam bulan
+        scope_sql, scope_params = scope_filter()
+        data = db.fetch(KEHADIRAN_BULANAN, list(month_range(year, month)) + scope_params, scope_sql=scope_sql)
         
         return jsonify({
             'success': True,
@@ -211,6 +315,18 @@ def api_statistik_bulanan():
             'error': str(e)
         }), 500
 
+STATISTIK_DEPARTEMEN = Statement('statistik_departemen', """
+    SELECT 
+        departemen,
+        COUNT(*) as total_kehadiran,
+        COUNT(DISTINCT nama) as jumlah_karyawan
+    FROM log_absensi 
+    WHERE tanggal BETWEEN ? AND ?
+    AND departemen IS NOT NULL{scope_sql}
+    GROUP BY departemen
+    ORDER BY total_kehadiran DESC
+""")
+
 @app.route('/api/statistik/departemen')
 def api_statistik_departemen():
     """API untuk statistik kehadiran per departemen"""
@@ -218,29 +334,8 @@ def api_statistik_departemen():
         start_date = request.args.get('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
         
-        query = """
-            SELECT 
-                departemen,
-                COUNT(*) as total_kehadiran,
-                COUNT(DISTINCT nama) as jumlah_karyawan
-            FROM log_absensi 
-            WHERE tanggal BETWEEN %s AND %s
-            AND departemen IS NOT NULL
-            GROUP BY departemen
-            ORDER BY total_kehadiran DESC
-        """ if db.db_type == 'postgresql' else """
-            SELECT 
-                departemen,
-                COUNT(*) as total_kehadiran,
-                COUNT(DISTINCT nama) as jumlah_karyawan
-            FROM log_absensi 
-            WHERE tanggal BETWEEN ? AND ?
-            AND departemen IS NOT NULL
-            GROUP BY departemen
-            ORDER BY total_kehadiran DESC
-        """
-        
-        data = db.execute_query(query, [start_date, end_date])
+        scope_sql, scope_params = scope_filter()
+        data = db.fetch(STATISTIK_DEPARTEMEN, [start_date, end_date] + scope_params, scope_sql=scope_sql)
         
         return jsonify({
             'success': True,
@@ -253,6 +348,20 @@ def api_statistik_departemen():
             'error': str(e)
         }), 500
 
+KARYAWAN_RANKING = Statement('karyawan_ranking', """
+    SELECT 
+        nama,
+        departemen,
+        posisi,
+        COUNT(*) as total_kehadiran,
+        COUNT(DISTINCT tanggal) as hari_hadir
+    FROM log_absensi 
+    WHERE tanggal BETWEEN ? AND ?{scope_sql}
+    GROUP BY nama, departemen, posisi
+    ORDER BY total_kehadiran DESC
+    LIMIT 50
+""")
+
 @app.route('/api/statistik/karyawan-ranking')
 def api_statistik_karyawan():
     """API untuk ranking kehadiran karyawan"""
@@ -260,33 +369,8 @@ def api_statistik_karyawan():
         start_date = request.args.get('start_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
         end_date = request.args.get('end_date', datetime.now().strftime('%Y-%m-%d'))
         
-        query = """
-            SELECT 
-                nama,
-                departemen,
-                posisi,
-                COUNT(*) as total_kehadiran,
-                COUNT(DISTINCT tanggal) as hari_hadir
-            FROM log_absensi 
-            WHERE tanggal BETWEEN %s AND %s
-            GROUP BY nama, departemen, posisi
-            ORDER BY total_kehadiran DESC
-            LIMIT 50
-        """ if db.db_type == 'postgresql' else """
-            SELECT 
-                nama,
-                departemen,
-                posisi,
-                COUNT(*) as total_kehadiran,
-                COUNT(DISTINCT tanggal) as hari_hadir
-            FROM log_absensi 
-            WHERE tanggal BETWEEN ? AND ?
-            GROUP BY nama, departemen, posisi
-            ORDER BY total_kehadiran DESC
-            LIMIT 50
-        """
-        
-        data = db.execute_query(query, [start_date, end_date])
+        scope_sql, scope_params = scope_filter()
+        data = db.fetch(KARYAWAN_RANKING, [start_date, end_date] + scope_params, scope_sql=scope_sql)
         
         return jsonify({
             'success': True,
@@ -299,47 +383,175 @@ def api_statistik_karyawan():
             'error': str(e)
         }), 500
 
+# Semua agregat halaman statistik dalam satu query. Kolom `kind` menandai
+# grouping: total | hari | jam | departemen | karyawan
+OVERVIEW_POSTGRESQL = """
+    SELECT
+        CASE
+            WHEN GROUPING(nama) = 0 THEN 'karyawan'
+            WHEN GROUPING(departemen) = 0 THEN 'departemen'
+            WHEN GROUPING(tanggal) = 0 THEN 'hari'
+            WHEN GROUPING(jam) = 0 THEN 'jam'
+            ELSE 'total'
+        END as kind,
+        tanggal, jam, departemen, nama, posisi,
+        COUNT(*) as total,
+        COUNT(DISTINCT nama) as karyawan,
+        COUNT(DISTINCT departemen) as departemen_aktif,
+        COUNT(DISTINCT tanggal) as hari
+    FROM (
+        SELECT nama, departemen, posisi, tanggal, CAST(EXTRACT(HOUR FROM jam) AS INTEGER) as jam
+        FROM log_absensi
+        WHERE tanggal BETWEEN ? AND ?{scope_sql}
+    ) f
+    GROUP BY GROUPING SETS ((), (tanggal), (jam), (departemen), (nama, departemen, posisi))
+"""
+
+OVERVIEW_SQLITE = """
+    WITH f AS (
+        SELECT nama, departemen, posisi, tanggal, CAST(substr(jam, 1, 2) AS INTEGER) as jam
+        FROM log_absensi
+        WHERE tanggal BETWEEN ? AND ?{scope_sql}
+    )
+    SELECT 'total' as kind, NULL as tanggal, NULL as jam, NULL as departemen, NULL as nama, NULL as posisi,
+           COUNT(*) as total, COUNT(DISTINCT nama) as karyawan,
+           COUNT(DISTINCT departemen) as departemen_aktif, COUNT(DISTINCT tanggal) as hari
+    FROM f
+    UNION ALL
+    SELECT 'hari', tanggal, NULL, NULL, NULL, NULL, COUNT(*), COUNT(DISTINCT nama), NULL, NULL
+    FROM f GROUP BY tanggal
+    UNION ALL
+    SELECT 'jam', NULL, jam, NULL, NULL, NULL, COUNT(*), NULL, NULL, NULL
+    FROM f GROUP BY jam
+    UNION ALL
+    SELECT 'departemen', NULL, NULL, departemen, NULL, NULL, COUNT(*), COUNT(DISTINCT nama), NULL, NULL
+    FROM f GROUP BY departemen
+    UNION ALL
+    SELECT 'karyawan', NULL, NULL, departemen, nama, posisi, COUNT(*), NULL, NULL, COUNT(DISTINCT tanggal)
+    FROM f GROUP BY nama, departemen, posisi
+"""
+
+OVERVIEW = Statement('statistik_overview', OVERVIEW_POSTGRESQL, sqlite=OVERVIEW_SQLITE, types={
+    'tanggal': as_date, 'jam': int, 'total': int, 'karyawan': int, 'departemen_aktif': int, 'hari': int
+})
+
+# Jumlah karyawan di ranking overview (sama dengan /api/statistik/karyawan-ranking)
+OVERVIEW_RANKING_LIMIT = 50
+
+@app.route('/api/statistik/overview')
+def api_statistik_overview():
+    """
+    API ringkasan halaman statistik: total, kehadiran per hari, sebaran jam,
+    per departemen dan ranking karyawan untuk satu periode, dihitung di
+    database dalam satu query (tanpa batas jumlah baris log)
+    """
+    try:
+        start, end = analytics_range()
+        scope_sql, scope_params = scope_filter()
+        rows = db.fetch(OVERVIEW, [start.isoformat(), end.isoformat()] + scope_params, scope_sql=scope_sql)
+
+        ringkasan = {'total_absensi': 0, 'karyawan_unik': 0, 'departemen_aktif': 0, 'hari_aktif': 0}
+        per_hari, per_jam, departemen, ranking = [], [], [], []
+        for row in rows:
+            kind = row['kind']
+            if kind == 'total':
+                ringkasan = {
+                    'total_absensi': row['total'],
+                    'karyawan_unik': row['karyawan'],
+                    'departemen_aktif': row['departemen_aktif'],
+                    'hari_aktif': row['hari']
+                }
+            elif kind == 'hari':
+                per_hari.append({
+                    'tanggal': row['tanggal'].isoformat(),
+                    'jumlah_hadir': row['karyawan'],
+                    'total': row['total']
+                })
+            elif kind == 'jam':
+                if row['jam'] is not None:
+                    per_jam.append({'jam': row['jam'], 'total': row['total']})
+            elif kind == 'departemen':
+                if row['departemen'] is not None:
+                    departemen.append({
+                        'departemen': row['departemen'],
+                        'total_kehadiran': row['total'],
+                        'jumlah_karyawan': row['karyawan']
+                    })
+            else:
+                ranking.append({
+                    'nama': row['nama'],
+                    'departemen': row['departemen'],
+                    'posisi': row['posisi'],
+                    'total_kehadiran': row['total'],
+                    'hari_hadir': row['hari']
+                })
+
+        days = (end - start).days + 1
+        ringkasan['rata_rata_harian'] = round(ringkasan['total_absensi'] / days, 1)
+        per_hari.sort(key=lambda d: d['tanggal'])
+        per_jam.sort(key=lambda d: d['jam'])
+        departemen.sort(key=lambda d: d['total_kehadiran'], reverse=True)
+        ranking.sort(key=lambda d: d['total_kehadiran'], reverse=True)
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'periode': {'start_date': start.isoformat(), 'end_date': end.isoformat(), 'hari': days},
+                'ringkasan': ringkasan,
+                'per_hari': per_hari,
+                'per_jam': per_jam,
+                'departemen': departemen,
+                'ranking': ranking[:OVERVIEW_RANKING_LIMIT]
+            }
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+SUMMARY_KARYAWAN = Statement('summary_karyawan', """
+    SELECT COUNT(*) AS total, COUNT(DISTINCT departemen) AS departemen
+    FROM karyawan
+    WHERE 1=1{scope_sql}
+""")
+
+# Hadir hari ini dan total absensi bulan ini dalam satu scan rentang tanggal
+SUMMARY_ABSENSI = Statement('summary_absensi', """
+    SELECT COUNT(DISTINCT CASE WHEN tanggal = ? THEN nama END) AS hari_ini, COUNT(*) AS bulan_ini
+    FROM log_absensi
+    WHERE tanggal >= ? AND tanggal < ?{scope_sql}
+""")
+
 @app.route('/api/dashboard-summary')
 def api_dashboard_summary():
     """API untuk data ringkasan dashboard"""
     try:
-        today = datetime.now().strftime('%Y-%m-%d')
+        today = datetime.now().date()
+        scope_sql, scope_params = scope_filter()
         
-        # Total karyawan
-        total_karyawan = db.execute_query("SELECT COUNT(*) as total FROM karyawan")[0]['total']
+        # Total karyawan dan departemen
+        karyawan = db.fetch_one(SUMMARY_KARYAWAN, scope_params, scope_sql=scope_sql)
         
-        # Kehadiran hari ini
-        kehadiran_hari_ini = db.execute_query(
-            "SELECT COUNT(DISTINCT nama) as total FROM log_absensi WHERE tanggal = %s" if db.db_type == 'postgresql'
-            else "SELECT COUNT(DISTINCT nama) as total FROM log_absensi WHERE tanggal = ?", 
-            [today]
-        )[0]['total']
-        
-        # Total departemen
-        total_departemen = db.execute_query(
-            "SELECT COUNT(DISTINCT departemen) as total FROM karyawan WHERE departemen IS NOT NULL"
-        )[0]['total']
-        
-        # Absensi bulan ini
-        current_month = datetime.now().strftime('%Y-%m')
-        if db.db_type == 'postgresql':
-            absensi_bulan_ini = db.execute_query(
-                "SELECT COUNT(*) as total FROM log_absensi WHERE TO_CHAR(tanggal, 'YYYY-MM') = %s",
-                [current_month]
-            )[0]['total']
-        else:
-            absensi_bulan_ini = db.execute_query(
-                "SELECT COUNT(*) as total FROM log_absensi WHERE strftime('%Y-%m', tanggal) = ?",
-                [current_month]
-            )[0]['total']
+        # Kehadiran hari ini dan absensi bulan ini
+        absensi = db.fetch_one(
+            SUMMARY_ABSENSI,
+            [today.isoformat()] + list(month_range(today.year, today.month)) + scope_params,
+            scope_sql=scope_sql
+        )
         
         return jsonify({
             'success': True,
             'data': {
-                'total_karyawan': total_karyawan,
-                'kehadiran_hari_ini': kehadiran_hari_ini,
-                'total_departemen': total_departemen,
-                'absensi_bulan_ini': absensi_bulan_ini
+                'total_karyawan': karyawan['total'],
+                'kehadiran_hari_ini': absensi['hari_ini'],
+                'total_departemen': karyawan['departemen'],
+                'absensi_bulan_ini': absensi['bulan_ini']
             }
         })
         
@@ -349,5 +561,97 @@ def api_dashboard_summary():
             'error': str(e)
         }), 500
 
+def analytics_range():
+    """Rentang tanggal analytics dari query string, default 30 hari terakhir"""
+    end = request.args.get('end_date')
+    start = request.args.get('start_date')
+    end = datetime.strptime(end, '%Y-%m-%d').date() if end else datetime.now().date()
+    start = datetime.strptime(start, '%Y-%m-%d').date() if start else end - timedelta(days=30)
+    if start > end:
+        raise ValueError('start_date must be before end_date')
+    return start, end
+
+@app.route('/api/analytics/karyawan')
+def api_analytics_karyawan():
+    """API jam masuk/keluar, jam kerja, keterlambatan dan absen beruntun per karyawan"""
+    try:
+        start, end = analytics_range()
+        data = analytics.employee_metrics(start, end, scope_filter(), request.args.get('departemen'))
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/analytics/karyawan/<path:nama>/harian')
+def api_analytics_karyawan_harian(nama):
+    """API rincian harian satu karyawan"""
+    try:
+        start, end = analytics_range()
+        return jsonify({
+            'success': True,
+            'data': analytics.employee_days(nama, start, end, scope_filter())
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/analytics/departemen')
+def api_analytics_departemen():
+    """API tingkat kehadiran, rata-rata jam kerja dan keterlambatan per departemen"""
+    try:
+        start, end = analytics_range()
+        return jsonify({
+            'success': True,
+            'data': analytics.department_metrics(start, end, scope_filter())
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+SITES = Statement('sites', """
+    SELECT tenant_id, site_id, COUNT(*) as jumlah_karyawan
+    FROM karyawan
+    GROUP BY tenant_id, site_id
+    ORDER BY tenant_id, site_id
+""")
+
+@app.route('/api/sites')
+def api_sites():
+    """API untuk list tenant + site yang punya karyawan (pilihan filter dashboard)"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': db.fetch(SITES)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,335 @@
+"""
+Database - lapisan query dashboard (PostgreSQL, fallback SQLite lokal)
+
+- Statement: query bernama. SQL ditulis sekali dengan placeholder `?`
+  (dikonversi otomatis untuk PostgreSQL), varian SQLite hanya jika fungsi
+  tanggal/waktunya berbeda, dan potongan dinamis {nama} (filter scope,
+  ORDER BY) diisi saat render
+- PostgreSQL: setiap teks SQL hasil render di-PREPARE sekali per koneksi lalu
+  dijalankan dengan EXECUTE, jadi parse + plan tidak diulang per request.
+  Cache dibatasi PREPARED_CACHE_SIZE (LRU, yang terlama di-DEALLOCATE)
+- SQLite: statement cache bawaan sqlite3 (cached_statements) per teks SQL
+- Baca vs tulis ditentukan method yang dipanggil (fetch / execute), bukan
+  dari awalan teks SQL
+- iter_batches: cursor server-side (named cursor PostgreSQL) di koneksi
+  terpisah untuk hasil besar, dibaca per batch
+- Typed rows: kolom di Statement.types dikonversi ke tipe Python yang sama di
+  kedua dialect (mis. tanggal SQLite string -> date, EXTRACT PostgreSQL
+  Decimal -> float)
+
+Mode SQLite (env SQLITE_PATH, default absensi.db) memakai WAL dan membuat
+tabel + index yang sama dengan docker/init.sql, sehingga bisa dipakai sebagai
+mode lokal penuh tanpa server PostgreSQL.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import psycopg2
+from psycopg2 import errors as pg_errors
+
+import fast_json
+
+POSTGRESQL = 'postgresql'
+SQLITE = 'sqlite'
+
+SQLITE_PATH = "absensi.db"
+# Maksimal prepared statement per koneksi PostgreSQL / statement cache SQLite
+PREPARED_CACHE_SIZE = 256
+# Baris per fetch untuk iter_batches
+ITER_BATCH_SIZE = 2000
+
+# Skema SQLite, padanan docker/init.sql
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS karyawan (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nama TEXT NOT NULL,
+        departemen TEXT NOT NULL,
+        posisi TEXT NOT NULL,
+        face_encoding_path TEXT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        tenant_id TEXT NOT NULL DEFAULT 'default',
+        site_id TEXT NOT NULL DEFAULT 'default',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS log_absensi (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nama TEXT NOT NULL,
+        departemen TEXT,
+        posisi TEXT,
+        tanggal DATE NOT NULL,
+        jam TIME NOT NULL,
+        path_gambar TEXT,
+        client_id TEXT,
+        tenant_id TEXT NOT NULL DEFAULT 'default',
+        site_id TEXT NOT NULL DEFAULT 'default',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_log_absensi_tanggal ON log_absensi(tanggal)",
+    "CREATE INDEX IF NOT EXISTS idx_log_absensi_nama ON log_absensi(nama)",
+    "CREATE INDEX IF NOT EXISTS idx_log_absensi_departemen ON log_absensi(departemen)",
+    "CREATE INDEX IF NOT EXISTS idx_karyawan_nama ON karyawan(nama)",
+    "DROP INDEX IF EXISTS idx_log_absensi_client_id",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_log_absensi_tenant_client_id ON log_absensi(tenant_id, client_id)",
+    "CREATE INDEX IF NOT EXISTS idx_karyawan_tenant_site ON karyawan(tenant_id, site_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_log_absensi_tenant_site_tanggal ON log_absensi(tenant_id, site_id, tanggal)",
+    # Pengganti index trigram: pencarian nama prefix (LIKE 'q%')
+    "CREATE INDEX IF NOT EXISTS idx_log_absensi_nama_nocase ON log_absensi(nama COLLATE NOCASE)"
+]
+
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456"
+]
+
+
+def as_date(value: Any) -> date:
+    """date dari date/datetime/string ISO"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def as_time(value: Any) -> time:
+    """time dari time/string 'HH:MM[:SS[.ffffff]]'"""
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(str(value))
+
+
+class Statement:
+    def __init__(self, name: str, sql: str, sqlite: Optional[str] = None,
+                 types: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        """
+        Args:
+            name: Nama statement (identifier SQL, dipakai untuk PREPARE)
+            sql: SQL dengan placeholder `?` dan potongan {nama}; dipakai kedua
+                dialect kecuali `sqlite` diisi. Tidak boleh ada `?` literal.
+            sqlite: SQL khusus SQLite jika sintaksnya berbeda
+            types: Konversi kolom hasil (nilai NULL tidak dikonversi),
+                mis. {'tanggal': as_date, 'total': int}
+        """
+        self.name = name
+        self.sql = sql
+        self.sqlite = sqlite
+        self.types = types or {}
+
+    def render(self, dialect: str, fragments: Dict[str, str]) -> str:
+        sql = self.sqlite if dialect == SQLITE and self.sqlite is not None else self.sql
+        return sql.format(**fragments)
+
+
+def _numbered(sql: str) -> str:
+    """Placeholder ? -> $1, $2, ... (PREPARE PostgreSQL)"""
+    counter = itertools.count(1)
+    return ''.join(part if i == 0 else f"${next(counter)}{part}" for i, part in enumerate(sql.split('?')))
+
+
+def _pyformat(sql: str) -> str:
+    """Placeholder ? -> %s (psycopg2 tanpa PREPARE)"""
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+def map_rows(cursor, rows: Sequence[Sequence], types: Dict[str, Callable]) -> List[Dict]:
+    """Baris tuple menjadi dict, kolom di `types` dikonversi"""
+    columns = [column[0] for column in cursor.description]
+    converters = [(i, types[name]) for i, name in enumerate(columns) if name in types]
+    if not converters:
+        return [dict(zip(columns, row)) for row in rows]
+    result = []
+    for row in rows:
+        row = list(row)
+        for i, convert in converters:
+            if row[i] is not None:
+                row[i] = convert(row[i])
+        result.append(dict(zip(columns, row)))
+    return result
+
+
+class DatabaseManager:
+    def __init__(self, prepared_cache_size: int = PREPARED_CACHE_SIZE):
+        self.conn = None
+        self.db_type = None
+        self.prepared_cache_size = prepared_cache_size
+        # Teks SQL -> nama prepared statement di koneksi PostgreSQL saat ini
+        self._prepared = OrderedDict()
+        self._prepared_seq = 0
+        self._lock = threading.Lock()
+        self.init_connection()
+
+    @staticmethod
+    def _pg_params() -> Dict[str, str]:
+        return {
+            'host': os.getenv('DB_HOST', 'localhost'),
+            'database': os.getenv('DB_NAME', 'absensi_db'),
+            'user': os.getenv('DB_USER', 'postgres'),
+            'password': os.getenv('DB_PASSWORD', 'postgres'),
+            'port': os.getenv('DB_PORT', '5432')
+        }
+
+    def init_connection(self):
+        """Inisialisasi koneksi database"""
+        with self._lock:
+            self._prepared.clear()
+        try:
+            # Coba PostgreSQL dulu
+            self.conn = psycopg2.connect(**self._pg_params())
+            # Dashboard hanya membaca: tanpa transaksi terbuka di antara request
+            self.conn.autocommit = True
+            self.db_type = POSTGRESQL
+            print("Connected to PostgreSQL")
+        except Exception as e:
+            # Fallback ke SQLite lokal
+            print(f"PostgreSQL connection failed: {e}")
+            print("Falling back to SQLite")
+            self.sqlite_path = os.getenv('SQLITE_PATH', SQLITE_PATH)
+            self.conn = self._sqlite_connect()
+            self.db_type = SQLITE
+            self._init_sqlite_schema()
+
+    def _sqlite_connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.sqlite_path, check_same_thread=False, isolation_level=None,
+                               cached_statements=self.prepared_cache_size)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _init_sqlite_schema(self) -> None:
+        for sql in SQLITE_SCHEMA:
+            try:
+                self.conn.execute(sql)
+            except sqlite3.OperationalError as e:
+                # Database lama dengan kolom berbeda: index dilewati
+                print(f"SQLite schema: {e}")
+        try:
+            self.conn.execute("PRAGMA optimize")
+        except sqlite3.OperationalError:
+            pass
+
+    @property
+    def json_passthrough(self):
+        """PG_JSON_PASSTHROUGH: list besar diambil sebagai array JSON jadi dari PostgreSQL"""
+        return self.db_type == POSTGRESQL and os.getenv('PG_JSON_PASSTHROUGH', 'false').lower() in ('1', 'true', 'yes')
+
+    # ------------------------------------------------------------------
+    # Eksekusi
+    # ------------------------------------------------------------------
+    def _prepare(self, cursor, name: str, sql: str) -> str:
+        with self._lock:
+            prepared = self._prepared.get(sql)
+            if prepared is not None:
+                self._prepared.move_to_end(sql)
+                return prepared
+            self._prepared_seq += 1
+            prepared = f"{name}_{self._prepared_seq}"
+            cursor.execute(f"PREPARE {prepared} AS {_numbered(sql)}")
+            self._prepared[sql] = prepared
+            while len(self._prepared) > self.prepared_cache_size:
+                _, oldest = self._prepared.popitem(last=False)
+                cursor.execute(f"DEALLOCATE {oldest}")
+            return prepared
+
+    def _run(self, cursor, name: str, sql: str, params: Sequence, prefix: str = '') -> None:
+        if self.db_type == SQLITE:
+            cursor.execute(prefix + sql, params)
+            return
+        prepared = self._prepare(cursor, name, sql)
+        arguments = f" ({', '.join(['%s'] * len(params))})" if params else ''
+        try:
+            cursor.execute(f"{prefix}EXECUTE {prepared}{arguments}", params)
+        except pg_errors.InvalidSqlStatementName:
+            # Baru di-DEALLOCATE thread lain: prepare ulang sekali
+            with self._lock:
+                self._prepared.pop(sql, None)
+            prepared = self._prepare(cursor, name, sql)
+            cursor.execute(f"{prefix}EXECUTE {prepared}{arguments}", params)
+
+    def fetch(self, statement: Statement, params: Sequence = (), **fragments) -> List[Dict]:
+        """Jalankan SELECT, semua baris sebagai list dict"""
+        cursor = self.conn.cursor()
+        try:
+            self._run(cursor, statement.name, statement.render(self.db_type, fragments), list(params))
+            return map_rows(cursor, cursor.fetchall(), statement.types)
+        finally:
+            cursor.close()
+
+    def fetch_one(self, statement: Statement, params: Sequence = (), **fragments) -> Optional[Dict]:
+        rows = self.fetch(statement, params, **fragments)
+        return rows[0] if rows else None
+
+    def fetch_json(self, statement: Statement, params: Sequence = (), **fragments) -> str:
+        """SELECT lewat json_agg (PostgreSQL saja): array JSON sebagai teks"""
+        sql = fast_json.json_agg_sql(statement.render(self.db_type, fragments))
+        cursor = self.conn.cursor()
+        try:
+            self._run(cursor, f"{statement.name}_json", sql, list(params))
+            return cursor.fetchone()[1]
+        finally:
+            cursor.close()
+
+    def estimate_rows(self, statement: Statement, params: Sequence = (), **fragments) -> Optional[int]:
+        """Estimasi jumlah baris dari planner PostgreSQL (None di SQLite)"""
+        if self.db_type != POSTGRESQL:
+            return None
+        cursor = self.conn.cursor()
+        try:
+            self._run(cursor, statement.name, statement.render(self.db_type, fragments), list(params),
+                      prefix="EXPLAIN (FORMAT JSON) ")
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def execute(self, statement: Statement, params: Sequence = (), **fragments) -> int:
+        """Jalankan INSERT/UPDATE/DELETE, commit, kembalikan jumlah baris"""
+        cursor = self.conn.cursor()
+        try:
+            self._run(cursor, statement.name, statement.render(self.db_type, fragments), list(params))
+            self.conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def iter_batches(self, statement: Statement, params: Sequence = (), batch_size: int = ITER_BATCH_SIZE,
+                     **fragments) -> Iterator[List[Dict]]:
+        """
+        Hasil SELECT besar per batch tanpa menampung semua baris di memori
+
+        PostgreSQL memakai named cursor (server-side) di koneksi sendiri;
+        DECLARE tidak bisa memakai EXECUTE sehingga jalur ini tidak di-PREPARE.
+        SQLite (WAL) membaca dari koneksi sendiri juga, tanpa memblok writer.
+        """
+        sql = statement.render(self.db_type, fragments)
+        if self.db_type == POSTGRESQL:
+            conn = psycopg2.connect(**self._pg_params())
+            cursor = conn.cursor(name=f"{statement.name}_stream")
+            cursor.itersize = batch_size
+            sql = _pyformat(sql)
+        else:
+            conn = self._sqlite_connect()
+            cursor = conn.cursor()
+        try:
+            cursor.execute(sql, list(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield map_rows(cursor, rows, statement.types)
+        finally:
+            cursor.close()
+            conn.close()
@@ -0,0 +1,201 @@
+"""
+Fast JSON - serialisasi response JSON untuk API server dan dashboard
+
+- Encoder orjson jika terpasang (fallback ke json stdlib), dengan date,
+  time, datetime dan Decimal ditangani langsung sehingga baris database
+  tidak perlu dikonversi dulu per kolom
+- rows_to_dicts: baris tuple dari cursor biasa langsung menjadi list dict
+  (tanpa RealDictCursor / sqlite3.Row)
+- Kompresi gzip / brotli sesuai header Accept-Encoding
+- Mode passthrough PostgreSQL: json_agg_sql() membuat PostgreSQL mengembalikan
+  array JSON jadi, raw_json_response() menyisipkannya ke response apa adanya
+
+Modul ini ada di desktop_app/ dan dashboard_web/ dengan isi yang sama karena
+image Docker dashboard hanya berisi direktori dashboard_web; ubah keduanya
+bersamaan.
+
+Pakai lewat init_app(app): jsonify memakai encoder ini dan response besar
+dikompresi otomatis.
+"""
+import datetime
+import decimal
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response lebih kecil dari ini tidak dikompresi (overhead header > hemat)
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 3
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain', 'text/csv',
+    'application/javascript', 'text/javascript', 'image/svg+xml'
+}
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    """Tipe yang tidak ditangani encoder secara native"""
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):
+        # numpy array / scalar
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode ke JSON (UTF-8 bytes, tanpa spasi)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def rows_to_dicts(cursor, rows: Optional[Sequence[Sequence]] = None) -> List[Dict]:
+    """
+    Baris tuple hasil query menjadi list dict
+
+    Args:
+        cursor: Cursor setelah execute (nama kolom dari cursor.description)
+        rows: Hasil fetch; None = cursor.fetchall()
+    """
+    columns = [column[0] for column in cursor.description]
+    if rows is None:
+        rows = cursor.fetchall()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def json_agg_sql(query: str) -> str:
+    """
+    Bungkus SELECT supaya PostgreSQL mengembalikan satu baris
+    (jumlah baris, array JSON sebagai teks). Urutan ORDER BY di query dalam
+    dipertahankan json_agg untuk subquery sederhana seperti di sini.
+    """
+    return f"SELECT COUNT(*), COALESCE(json_agg(t), '[]')::text FROM ({query}) t"
+
+
+def raw_json_body(payload: Dict, key: str, raw: str) -> bytes:
+    """Encode payload dengan tambahan field `key` berisi JSON mentah (tanpa decode ulang)"""
+    head = dumps(payload)
+    separator = b',' if len(head) > 2 else b''
+    return head[:-1] + separator + dumps(key) + b':' + raw.encode('utf-8') + b'}'
+
+
+def raw_json_response(app, payload: Dict, key: str, raw: str):
+    """Response Flask dari raw_json_body (tetap melewati kompresi after_request)"""
+    return app.response_class(raw_json_body(payload, key, raw), mimetype='application/json')
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pilih content-encoding dari header Accept-Encoding
+
+    Returns:
+        'br' (jika modul brotli ada), 'gzip', atau None
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response, accept_encoding: Optional[str]):
+    """Kompres response Flask jika client mendukung dan isinya cukup besar"""
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class FastJSONProvider:
+    """JSON provider Flask (app.json) berbasis dumps()/loads() di atas"""
+
+    def __init__(self, app):
+        self._app = app
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def dump(self, obj: Any, fp, **kwargs) -> None:
+        fp.write(self.dumps(obj))
+
+    def loads(self, s, **kwargs) -> Any:
+        return loads(s)
+
+    def load(self, fp, **kwargs) -> Any:
+        return loads(fp.read())
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+        if not args and not kwargs:
+            obj = None
+        elif len(args) == 1:
+            obj = args[0]
+        else:
+            obj = args or kwargs
+        return self._app.response_class(dumps(obj), mimetype='application/json')
+
+
+def init_app(app) -> None:
+    """Pasang encoder cepat untuk jsonify dan kompresi response"""
+    from flask import request
+
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request.headers.get('Accept-Encoding'))
@@ -0,0 +1,115 @@
+"""
+Thumbnails - varian kecil foto bukti absensi untuk dashboard
+
+Foto asli (crop wajah dari do_absensi) tidak pernah diubah. Thumbnail dibuat
+saat pertama kali diminta, disimpan di direktori cache (env
+THUMBNAIL_CACHE_DIR) dan dipakai ulang selama foto asli tidak berubah:
+nama file cache mengandung hash dari path, mtime dan ukuran foto asli, dan
+hash yang sama dipakai sebagai ETag.
+
+Format WebP dipakai jika browser mengirim Accept: image/webp, selain itu JPEG.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_CACHE_DIR = "thumb_cache"
+
+# Sisi terpanjang (px) per ukuran
+SIZES = {'sm': 96, 'md': 320, 'lg': 800}
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True})
+}
+
+
+class ThumbnailService:
+    def __init__(self, source_dir: str, cache_dir: Optional[str] = None):
+        """
+        Args:
+            source_dir: Root foto asli (static folder dashboard)
+            cache_dir: Direktori cache thumbnail
+        """
+        self.source_dir = os.path.realpath(source_dir)
+        self.cache_dir = cache_dir or os.getenv('THUMBNAIL_CACHE_DIR', THUMBNAIL_CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def resolve_source(self, image_path: str) -> Optional[str]:
+        """Path absolut foto asli, None jika keluar dari source_dir atau tidak ada"""
+        path = os.path.realpath(os.path.join(self.source_dir, image_path))
+        if not path.startswith(self.source_dir + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    @staticmethod
+    def pick_format(accept: Optional[str]) -> str:
+        return 'webp' if accept and 'image/webp' in accept else 'jpeg'
+
+    def etag(self, source: str, size: str, fmt: str) -> str:
+        stat = os.stat(source)
+        key = f"{source}\0{stat.st_mtime_ns}\0{stat.st_size}\0{size}\0{fmt}"
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            if len(self._locks) > 1024:
+                self._locks = {k: lock for k, lock in self._locks.items() if lock.locked()}
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _render(self, source: str, size: str, fmt: str) -> bytes:
+        pil_format, _, options = FORMATS[fmt]
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            return buffer.getvalue()
+
+    def get(self, image_path: str, size: str, accept: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+        """
+        Ambil thumbnail (buat dulu jika belum ada di cache)
+
+        Args:
+            image_path: Path relatif terhadap source_dir (path_gambar)
+            size: Salah satu SIZES
+            accept: Header Accept browser
+
+        Returns:
+            Tuple (path file cache, mimetype, etag) atau None jika foto asli
+            tidak ada
+        """
+        source = self.resolve_source(image_path)
+        if source is None or size not in SIZES:
+            return None
+        fmt = self.pick_format(accept)
+        etag = self.etag(source, size, fmt)
+        cache_path = os.path.join(self.cache_dir, etag[:2], f"{etag}.{fmt}")
+        mimetype = FORMATS[fmt][1]
+        if os.path.exists(cache_path):
+            return cache_path, mimetype, etag
+
+        with self._lock_for(etag):
+            if not os.path.exists(cache_path):
+                data = self._render(source, size, fmt)
+                directory = os.path.dirname(cache_path)
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix='.thumb_', dir=directory)
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, cache_path)
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+        return cache_path, mimetype, etag
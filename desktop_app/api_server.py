@@ -1,67 +1,97 @@
 """
 Flask API for Face Recognition - untuk digunakan oleh Flutter Mobile App
 """
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
-import cv2
-import numpy as np
 import base64
-from PIL import Image, ExifTags
+import binascii
 import io
 import os
-from face_recognition_service import FaceRecognitionService
-from werkzeug.security import check_password_hash
+import json
+import re
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+from face_recognition_service import get_face_service
+from face_templates import EMBEDDING_MODEL_VERSION
+from frames import decode_image
+from request_profiler import annotate, stage
+import fast_json
+from auth_service import AuthService
+from bulk_enrollment import run_bulk_enrollment
 from flask_jwt_extended import (
-    JWTManager, create_access_token, jwt_required, get_jwt_identity
+    JWTManager, create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 )
 
 app = Flask(__name__)
 app.config['JWT_SECRET_KEY'] = 'memacak-tanah-menjunjung-tinggi'  
+# Access token pendek, refresh token panjang: mobile cukup refresh, tidak login ulang
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.getenv('JWT_ACCESS_MINUTES', '60')))
+app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.getenv('JWT_REFRESH_DAYS', '30')))
+
+# Batas sinkronisasi offline
+MAX_SYNC_ITEMS = int(os.getenv('MAX_SYNC_ITEMS', '200'))
+MAX_SYNC_BYTES = int(os.getenv('MAX_SYNC_BYTES', str(64 * 1024 * 1024)))
+MAX_SYNC_AGE = timedelta(days=int(os.getenv('MAX_SYNC_AGE_DAYS', '7')))
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# client_id dipakai di nama file bukti: hanya huruf, angka, _ dan - (UUID/hex)
+CLIENT_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+# Thumbnail audit untuk mode embedding on-device
+MAX_THUMBNAIL_BYTES = int(os.getenv('MAX_THUMBNAIL_BYTES', str(32 * 1024)))
 CORS(app)
 jwt = JWTManager(app)
+# jsonify lewat orjson + kompresi gzip/brotli sesuai Accept-Encoding
+fast_json.init_app(app)
+
+# Initialize face recognition service (satu instance per process/worker)
+face_service = get_face_service()
+auth_service = AuthService()
+
+# Endpoint yang diprofil jika PROFILE_SAMPLE_RATE / PROFILE_SLOW_MS diset
+PROFILE_ENDPOINTS = set(filter(None, os.getenv('PROFILE_ENDPOINTS', '/api/absensi,/api/absensi/batch').split(',')))
+
+@app.before_request
+def refresh_shared_gallery():
+    """Ikuti generasi shared gallery terbaru (cukup satu stat per request)"""
+    face_service.refresh_shared_gallery()
+
+@app.before_request
+def start_request_profile():
+    """Mulai profil request (opt-in), lihat request_profiler.py"""
+    if face_service.profiler.enabled and request.path in PROFILE_ENDPOINTS:
+        g.request_profile = face_service.profiler.begin(request.path)
+        annotate(content_length=request.content_length)
 
-# Initialize face recognition service
-face_service = FaceRecognitionService()
+@app.after_request
+def record_profile_status(response):
+    g.profile_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        face_service.profiler.end(profile, status=g.pop('profile_status', 500))
+
+def decode_base64_payload(base64_string):
+    """Decode base64 (dengan atau tanpa header data:image/...;base64,) menjadi bytes"""
+    # Remove header jika ada (data:image/jpeg;base64,)
+    if ',' in base64_string:
+        base64_string = base64_string.split(',')[1]
+    try:
+        return base64.b64decode(base64_string)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Failed to decode image: {str(e)}")
 
 def decode_base64_image(base64_string):
     """
-    Decode base64 string menjadi numpy array image, auto-rotate sesuai EXIF
+    Decode base64 string menjadi Frame RGB, auto-rotate sesuai EXIF.
+    Buffer frame berasal dari pool: release() setelah selesai dipakai.
     """
     try:
-        # Remove header jika ada (data:image/jpeg;base64,)
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
-        
-        # Decode base64
-        image_data = base64.b64decode(base64_string)
-        
-        # Convert ke PIL Image
-        image = Image.open(io.BytesIO(image_data))
-
-        # --- Tambahan: auto-rotate sesuai EXIF ---
-        try:
-            for orientation in ExifTags.TAGS.keys():
-                if ExifTags.TAGS[orientation] == 'Orientation':
-                    break
-            exif = image._getexif()
-            if exif is not None:
-                orientation_value = exif.get(orientation, None)
-                if orientation_value == 3:
-                    image = image.rotate(180, expand=True)
-                elif orientation_value == 6:
-                    image = image.rotate(270, expand=True)
-                elif orientation_value == 8:
-                    image = image.rotate(90, expand=True)
-        except Exception:
-            pass  # Jika tidak ada EXIF, lanjut saja
-
-        # Convert ke numpy array (BGR untuk OpenCV)
-        image_array = np.array(image)
-        if len(image_array.shape) == 3:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
-        
-        return image_array
-    except Exception as e:
+        return decode_image(decode_base64_payload(base64_string))
+    except ValueError as e:
         raise ValueError(f"Failed to decode image: {str(e)}")
 
 @app.route('/api/health', methods=['GET'])
@@ -70,7 +100,10 @@ def health_check():
     return jsonify({
         'status': 'success',
         'message': 'Face Recognition API is running',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'embedding_model': EMBEDDING_MODEL_VERSION,
+        'tenant_id': face_service.tenant_id,
+        'site_id': face_service.site_id
     })
 
 @app.route('/api/login', methods=['POST'])
@@ -91,41 +124,39 @@ def login():
         username = data['username']
         password = data['password']
 
-        # Query user dari database
-        cursor = face_service.conn.cursor()
-        cursor.execute(
-            "SELECT id, nama, departemen, posisi, password_hash FROM karyawan WHERE username = %s",
-            (username,)
-        )
-        user = cursor.fetchone()
-        if not user:
-            return jsonify({'status': 'error', 'message': 'User not found'}), 401
-
-        user_id, nama, departemen, posisi, password_hash = user
-
-        # Verifikasi password
-        if not check_password_hash(password_hash, password):
-            return jsonify({'status': 'error', 'message': 'Invalid password'}), 401
+        # Query user (prepared statement via pool) + verifikasi password di thread pool KDF
+        result = auth_service.authenticate(username, password)
+        if result['status'] != 'success':
+            response = jsonify({'status': 'error', 'message': result['message']})
+            if 'retry_after' in result:
+                response.headers['Retry-After'] = str(result['retry_after'])
+            return response, result['http_status']
 
         # Sukses login
-        access_token = create_access_token(identity=username)
         return jsonify({
             'status': 'success',
             'message': 'Login successful',
-            'access_token': access_token,
-            'data': {
-                'id': user_id,
-                'nama': nama,
-                'departemen': departemen,
-                'posisi': posisi,
-                'username': username
-            }
+            'access_token': create_access_token(identity=username),
+            'refresh_token': create_refresh_token(identity=username),
+            'data': result['data']
         }), 200
 
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Login failed: {str(e)}'}), 500
     
 
+@app.route('/api/token/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_token():
+    """
+    Tukar refresh token (header Authorization: Bearer <refresh_token>)
+    dengan access token baru tanpa verifikasi password ulang
+    """
+    return jsonify({
+        'status': 'success',
+        'access_token': create_access_token(identity=get_jwt_identity())
+    }), 200
+
 @app.route('/api/register', methods=['POST'])
 def register_employee():
     """
@@ -136,7 +167,11 @@ def register_employee():
         "name": "string",
         "departemen": "string", 
         "posisi": "string",
-        "image": "base64_string"
+        "username": "string",
+        "password": "string",
+        "image": "base64_string",
+        "images": ["base64_string", ...]  (optional, multi-sample),
+        "allow_duplicate": false  (optional, daftarkan meskipun wajah mirip karyawan lain)
     }
     """
     try:
@@ -146,30 +181,47 @@ def register_employee():
             return jsonify({'status': 'error', 'message': 'No data provided'}), 400
         
         # Validasi required fields
-        required_fields = ['name', 'departemen', 'posisi', 'image']
+        required_fields = ['name', 'departemen', 'posisi', 'username', 'password']
         for field in required_fields:
             if field not in data or not data[field]:
                 return jsonify({
                     'status': 'error', 
                     'message': f'Field {field} is required'
                 }), 400
+
+        images = data.get('images') or ([data['image']] if data.get('image') else [])
+        if not images:
+            return jsonify({'status': 'error', 'message': 'Field image is required'}), 400
         
         # Decode image
+        frames = []
         try:
-            image_array = decode_base64_image(data['image'])
+            for image in images:
+                frames.append(decode_base64_image(image))
         except ValueError as e:
+            for frame in frames:
+                frame.release()
             return jsonify({'status': 'error', 'message': str(e)}), 400
         
         # Register employee
-        result = face_service.register_employee(
-            name=data['name'],
-            departemen=data['departemen'],
-            posisi=data['posisi'],
-            image_data=image_array
-        )
+        try:
+            result = face_service.register_employee(
+                name=data['name'],
+                departemen=data['departemen'],
+                posisi=data['posisi'],
+                image_data=frames,
+                username=data['username'],
+                password=data['password'],
+                allow_duplicate=bool(data.get('allow_duplicate'))
+            )
+        finally:
+            for frame in frames:
+                frame.release()
         
         if result['status'] == 'success':
             return jsonify(result), 201
+        elif result['status'] == 'duplicate':
+            return jsonify(result), 409
         else:
             return jsonify(result), 400
             
@@ -179,27 +231,94 @@ def register_employee():
             'message': f'Registration failed: {str(e)}'
         }), 500
 
+@app.route('/api/register/bulk', methods=['POST'])
+@jwt_required()
+def register_employees_bulk():
+    """
+    Register banyak karyawan sekaligus
+
+    Multipart form:
+    - photos: arsip .zip berisi foto karyawan
+    - metadata: file CSV (nama,departemen,posisi,username,password,foto)
+    - workers: jumlah process encoding (optional)
+    - allow_duplicates: "true" untuk tetap mendaftarkan wajah yang mirip (optional)
+    """
+    try:
+        photos = request.files.get('photos')
+        metadata = request.files.get('metadata')
+        if not photos or not metadata:
+            return jsonify({
+                'status': 'error',
+                'message': 'Files photos (.zip) and metadata (.csv) are required'
+            }), 400
+
+        workers = request.form.get('workers', type=int)
+        allow_duplicates = request.form.get('allow_duplicates', 'false').lower() in ('1', 'true', 'yes')
+        with tempfile.TemporaryDirectory(prefix="bulk_upload_") as tmp_dir:
+            archive_path = os.path.join(tmp_dir, 'photos.zip')
+            photos.save(archive_path)
+            metadata_text = io.TextIOWrapper(metadata.stream, encoding='utf-8-sig', newline='')
+            report = run_bulk_enrollment(face_service, archive_path, metadata_text, workers=workers,
+                                         allow_duplicates=allow_duplicates)
+
+        success = sum(1 for row in report if row['status'] == 'success')
+        return jsonify({
+            'status': 'success' if success == len(report) else 'partial',
+            'message': f'{success}/{len(report)} employees registered',
+            'data': report,
+            'count': success
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Bulk registration failed: {str(e)}'
+        }), 500
+
 @app.route('/api/absensi', methods=['POST'])
 @jwt_required()
 def do_attendance():
     """
     Lakukan absensi berdasarkan foto wajah
     
-    Request body:
+    Request body (foto):
     {
         "image": "base64_string"
     }
+
+    Request body (embedding on-device):
+    {
+        "embedding": [128 float],
+        "embedding_model": "dlib_face_recognition_resnet_model_v1",
+        "thumbnail": "base64_jpeg" (optional)
+    }
     """
     try:
         data = request.get_json()
-        if not data or 'image' not in data:
-            return jsonify({'status': 'error', 'message': 'Image required'}), 400
+        if not data or ('image' not in data and 'embedding' not in data):
+            return jsonify({'status': 'error', 'message': 'Image or embedding required'}), 400
 
         username = get_jwt_identity()
-        image = decode_base64_image(data['image'])
 
-        # Panggil service dengan username
-        result = face_service.do_absensi(image, username=username)
+        if 'embedding' in data:
+            thumbnail = None
+            if data.get('thumbnail'):
+                try:
+                    thumbnail = decode_thumbnail(data['thumbnail'])
+                except ValueError as e:
+                    return jsonify({'status': 'error', 'message': str(e)}), 400
+            result = face_service.do_absensi_embedding(
+                data['embedding'], username, data.get('embedding_model'), thumbnail=thumbnail
+            )
+        else:
+            with stage('decode_image'):
+                frame = decode_base64_image(data['image'])
+            with frame:
+                # Panggil service dengan username
+                result = face_service.do_absensi(frame, username=username)
+
         if result.get('status') == 'success':
             return jsonify(result), 200
         else:
@@ -207,14 +326,151 @@ def do_attendance():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def decode_thumbnail(base64_string):
+    """Decode thumbnail JPEG base64 tanpa decode gambar, validasi ukuran + signature"""
+    if ',' in base64_string:
+        base64_string = base64_string.split(',')[1]
+    try:
+        thumbnail = base64.b64decode(base64_string, validate=True)
+    except Exception:
+        raise ValueError('Invalid thumbnail encoding')
+    if len(thumbnail) > MAX_THUMBNAIL_BYTES:
+        raise ValueError(f'Thumbnail larger than {MAX_THUMBNAIL_BYTES} bytes')
+    if not thumbnail.startswith(b'\xff\xd8'):
+        raise ValueError('Thumbnail must be a JPEG image')
+    return thumbnail
+
+class BodyTooLarge(ValueError):
+    pass
+
+def read_json_body(max_bytes):
+    """
+    Baca body JSON, mendukung Content-Encoding: gzip/deflate.
+    Body mentah dan hasil dekompresi sama-sama dibatasi max_bytes (proteksi
+    zip bomb); body mentah yang lebih besar -> BodyTooLarge.
+    """
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise BodyTooLarge(f'Request body larger than {max_bytes} bytes')
+    # Body chunked tanpa Content-Length: baca paling banyak max_bytes + 1
+    chunks, size = [], 0
+    while size <= max_bytes:
+        chunk = request.stream.read(min(1024 * 1024, max_bytes + 1 - size))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    if size > max_bytes:
+        raise BodyTooLarge(f'Request body larger than {max_bytes} bytes')
+    raw = b''.join(chunks)
+    encoding = request.headers.get('Content-Encoding', '').lower()
+    if encoding in ('gzip', 'deflate'):
+        # wbits 47 = auto-detect header gzip/zlib
+        decompressor = zlib.decompressobj(47)
+        raw = decompressor.decompress(raw, max_bytes)
+        if decompressor.unconsumed_tail:
+            raise ValueError('Decompressed body too large')
+    elif encoding not in ('', 'identity'):
+        raise ValueError(f'Unsupported Content-Encoding: {encoding}')
+    if len(raw) > max_bytes:
+        raise ValueError('Body too large')
+    return json.loads(raw)
+
+def parse_sync_timestamp(value):
+    """Parse timestamp ISO 8601 dari client (waktu lokal server) dan validasi rentangnya"""
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    now = datetime.now()
+    if timestamp > now + MAX_CLOCK_SKEW:
+        raise ValueError('Timestamp is in the future')
+    if timestamp < now - MAX_SYNC_AGE:
+        raise ValueError('Timestamp is too old to sync')
+    return timestamp
+
+@app.route('/api/absensi/batch', methods=['POST'])
+@jwt_required()
+def do_attendance_batch():
+    """
+    Sinkronisasi absensi offline dalam satu request (boleh gzip)
+
+    Request body:
+    {
+        "items": [
+            {
+                "client_id": "uuid dari aplikasi",
+                "timestamp": "2025-08-13T08:30:45",
+                "image": "base64_string"
+            }
+        ]
+    }
+    """
+    try:
+        try:
+            data = read_json_body(MAX_SYNC_BYTES)
+        except BodyTooLarge as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 413
+        except (ValueError, zlib.error) as e:
+            return jsonify({'status': 'error', 'message': f'Invalid body: {str(e)}'}), 400
+
+        items = data.get('items') if isinstance(data, dict) else None
+        if not items or not isinstance(items, list):
+            return jsonify({'status': 'error', 'message': 'Items required'}), 400
+        if len(items) > MAX_SYNC_ITEMS:
+            return jsonify({'status': 'error', 'message': f'Maximum {MAX_SYNC_ITEMS} items per batch'}), 413
+
+        results = [None] * len(items)
+        valid_items, positions = [], []
+        for i, item in enumerate(items):
+            client_id = item.get('client_id') if isinstance(item, dict) else None
+            if not client_id or not item.get('image') or not item.get('timestamp'):
+                results[i] = {'client_id': client_id or None, 'status': 'error',
+                              'message': 'client_id, timestamp and image are required'}
+                continue
+            if not isinstance(client_id, str) or not CLIENT_ID_PATTERN.fullmatch(client_id):
+                results[i] = {'client_id': None, 'status': 'error',
+                              'message': 'client_id must be 1-64 characters of A-Z, a-z, 0-9, _ or -'}
+                continue
+            try:
+                valid_items.append({
+                    'client_id': client_id,
+                    'timestamp': parse_sync_timestamp(item['timestamp']),
+                    # Decode gambar ditunda ke service: satu buffer frame dipakai ulang per item
+                    'image': decode_base64_payload(item['image'])
+                })
+                positions.append(i)
+            except (TypeError, ValueError) as e:
+                # TypeError: timestamp/image bukan string
+                results[i] = {'client_id': client_id, 'status': 'error', 'message': str(e)}
+
+        if valid_items:
+            for i, result in zip(positions, face_service.do_absensi_batch(valid_items, get_jwt_identity())):
+                results[i] = result
+
+        summary = {status: sum(1 for r in results if r['status'] == status)
+                   for status in ('success', 'duplicate', 'error')}
+        return jsonify({
+            'status': 'success',
+            'summary': summary,
+            'data': results
+        }), 200
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/employees', methods=['GET'])
 @jwt_required()
 def get_employees():
     """
-    Get daftar semua karyawan
+    Get daftar karyawan site server ini
+
+    Query parameters:
+    - site: site_id lain dalam tenant, atau "all" untuk semua site (optional)
     """
     try:
-        employees = face_service.get_all_employees()
+        site = request.args.get('site')
+        if face_service.json_passthrough:
+            count, raw = face_service.get_all_employees_json(site_id=site, all_sites=site == 'all')
+            return fast_json.raw_json_response(app, {'status': 'success', 'count': count}, 'data', raw), 200
+        employees = face_service.get_all_employees(site_id=site, all_sites=site == 'all')
         return jsonify({
             'status': 'success',
             'data': employees,
@@ -236,12 +492,20 @@ def get_attendance_logs():
     Query parameters:
     - start_date: YYYY-MM-DD (optional)
     - end_date: YYYY-MM-DD (optional)
+    - site: site_id lain dalam tenant, atau "all" untuk semua site (optional)
     """
     try:
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        site = request.args.get('site')
+
+        if face_service.json_passthrough:
+            count, raw = face_service.get_attendance_logs_json(
+                start_date, end_date, site_id=site, all_sites=site == 'all'
+            )
+            return fast_json.raw_json_response(app, {'status': 'success', 'count': count}, 'data', raw), 200
         
-        logs = face_service.get_attendance_logs(start_date, end_date)
+        logs = face_service.get_attendance_logs(start_date, end_date, site_id=site, all_sites=site == 'all')
         
         return jsonify({
             'status': 'success',
@@ -255,20 +519,38 @@ def get_attendance_logs():
             'message': f'Failed to get attendance logs: {str(e)}'
         }), 500
 
+@app.route('/api/metrics', methods=['GET'])
+@jwt_required()
+def get_metrics():
+    """Metrik runtime worker ini (liveness pre-check, stage detector wajah)"""
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'pid': os.getpid(),
+            'liveness': face_service.liveness.metrics(),
+            'detector': face_service.detector.metrics()
+        }
+    }), 200
+
 @app.route('/api/reload-faces', methods=['POST'])
 @jwt_required()
 def reload_faces():
     """
     Reload known faces dari database
+
+    Default hanya karyawan yang berubah sejak version gallery (feed
+    karyawan_changes); ?full=true membaca ulang semua file encoding
     """
     try:
-        success = face_service.load_known_faces()
+        full = request.args.get('full', 'false').lower() in ('1', 'true', 'yes')
+        success = face_service.load_known_faces(force=full)
         
         if success:
             return jsonify({
                 'status': 'success',
                 'message': 'Known faces reloaded successfully',
-                'count': len(face_service.known_face_encodings)
+                'count': len(face_service.known_face_encodings),
+                'version': face_service.gallery.version
             }), 200
         else:
             return jsonify({
@@ -307,8 +589,11 @@ if __name__ == '__main__':
     print("🚀 Starting Face Recognition API...")
     print("📱 Flutter endpoints available:")
     print("   POST /api/register      - Register new employee")
-    print("   POST /api/login       - Record attendance")
+    print("   POST /api/register/bulk - Register employees from zip + CSV")
+    print("   POST /api/login         - Login, returns access + refresh token")
+    print("   POST /api/token/refresh - Exchange refresh token for access token")
     print("   POST /api/absensi       - Record attendance")
+    print("   POST /api/absensi/batch - Sync queued offline attendance")
     print("   GET  /api/employees     - Get all employees")
     print("   GET  /api/attendance-logs - Get attendance logs")
     print("   POST /api/reload-faces  - Reload known faces")
@@ -320,5 +605,5 @@ if __name__ == '__main__':
     # Untuk development
     app.run(debug=True, host='0.0.0.0', port=5050)
     
-    # Untuk production, gunakan gunicorn:
-    # gunicorn -w 4 -b 0.0.0.0:5050 api_server:app
+    # Untuk production, gunakan gunicorn (gallery dibagi antar worker via mmap):
+    # gunicorn -c gunicorn.conf.py api_server:app
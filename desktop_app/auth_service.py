@@ -0,0 +1,178 @@
+"""
+Auth Service - verifikasi login karyawan untuk API server
+
+check_password_hash memakai KDF yang sengaja lambat, jadi:
+- hashing dijalankan di thread pool terbatas (hashlib melepas GIL), dengan
+  antrian terbatas supaya lonjakan login ditolak cepat, bukan menumpuk
+- hasil verifikasi yang sukses di-cache sebentar (HMAC dengan secret acak
+  per process) sehingga login ulang dengan password yang sama tidak
+  menjalankan KDF lagi selama hash di database belum berubah
+- percobaan yang butuh KDF dibatasi per username (token bucket)
+- query user memakai prepared statement lewat connection pool
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Tuple
+
+from werkzeug.security import check_password_hash
+
+from desktop_database_config import DesktopDatabaseConfig
+
+LOGIN_QUERY = (
+    "SELECT id, nama, departemen, posisi, password_hash, site_id FROM karyawan "
+    "WHERE username = $1 AND tenant_id = $2"
+)
+
+
+class LoginThrottle:
+    """Token bucket per username"""
+
+    def __init__(self, capacity: int = 5, refill_seconds: float = 12.0):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> Tuple[bool, float]:
+        """
+        Ambil satu token untuk key
+
+        Returns:
+            Tuple (diizinkan, detik sampai token berikutnya tersedia)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) / self.refill_seconds)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False, (1 - tokens) * self.refill_seconds
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > 10000:
+                self._prune(now)
+            return True, 0.0
+
+    def _prune(self, now: float) -> None:
+        """Buang bucket yang sudah terisi penuh lagi (sama dengan belum pernah dipakai)"""
+        full_after = self.capacity * self.refill_seconds
+        self._buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+            if now - updated < full_after
+        }
+
+
+class AuthService:
+    def __init__(self, hash_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 cache_ttl: float = 600.0, tenant_id: Optional[str] = None):
+        """
+        Args:
+            tenant_id: Tenant yang dilayani server ini (default env TENANT_ID)
+            hash_workers: Jumlah thread untuk KDF (default: jumlah CPU)
+            max_pending: Maksimal verifikasi yang berjalan + antri
+            cache_ttl: Umur cache verifikasi sukses (detik)
+        """
+        self.tenant_id = tenant_id or os.getenv('TENANT_ID', 'default')
+        hash_workers = hash_workers or int(os.getenv('LOGIN_HASH_WORKERS', os.cpu_count() or 2))
+        self.executor = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix='login-kdf')
+        self._slots = threading.BoundedSemaphore(max_pending or hash_workers * 4)
+        self.cache_ttl = cache_ttl
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._cache_secret = secrets.token_bytes(32)
+        self.throttle = LoginThrottle(
+            capacity=int(os.getenv('LOGIN_THROTTLE_CAPACITY', '5')),
+            refill_seconds=float(os.getenv('LOGIN_THROTTLE_REFILL', '12'))
+        )
+
+    def _cache_key(self, password_hash: str, password: str) -> bytes:
+        return hmac.new(self._cache_secret, f"{password_hash}\0{password}".encode(), hashlib.sha256).digest()
+
+    def _cached(self, username: str, password_hash: str, password: str) -> bool:
+        with self._cache_lock:
+            entry = self._cache.get(username)
+        if entry is None:
+            return False
+        digest, expires = entry
+        if expires < time.monotonic():
+            with self._cache_lock:
+                self._cache.pop(username, None)
+            return False
+        return hmac.compare_digest(digest, self._cache_key(password_hash, password))
+
+    def _remember(self, username: str, password_hash: str, password: str) -> None:
+        with self._cache_lock:
+            self._cache[username] = (self._cache_key(password_hash, password), time.monotonic() + self.cache_ttl)
+
+    def fetch_user(self, username: str) -> Optional[Tuple]:
+        """Ambil (id, nama, departemen, posisi, password_hash, site_id) via prepared statement"""
+        with DesktopDatabaseConfig.pooled_connection() as conn:
+            cursor = DesktopDatabaseConfig.execute_prepared(
+                conn, 'login_lookup', LOGIN_QUERY, (username, self.tenant_id)
+            )
+            return cursor.fetchone()
+
+    def verify_password(self, password_hash: str, password: str, timeout: float = 10.0) -> Optional[bool]:
+        """
+        Jalankan check_password_hash di thread pool
+
+        Slot dilepas saat KDF selesai (bukan saat menyerah menunggu), jadi
+        semaphore tetap membatasi KDF yang antre/berjalan di pool.
+
+        Returns:
+            True/False hasil verifikasi, None jika pool penuh atau KDF tidak
+            selesai dalam timeout (server sibuk)
+        """
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self.executor.submit(check_password_hash, password_hash, password)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return None
+
+    def authenticate(self, username: str, password: str) -> Dict:
+        """
+        Verifikasi username + password
+
+        Returns:
+            Dict dengan status, http_status, dan data user jika sukses
+        """
+        user = self.fetch_user(username)
+        if not user:
+            return {'status': 'error', 'message': 'User not found', 'http_status': 401}
+
+        user_id, nama, departemen, posisi, password_hash, site_id = user
+        data = {'id': user_id, 'nama': nama, 'departemen': departemen, 'posisi': posisi, 'username': username,
+                'site_id': site_id}
+
+        if self._cached(username, password_hash, password):
+            return {'status': 'success', 'data': data, 'http_status': 200}
+
+        allowed, retry_after = self.throttle.acquire(username)
+        if not allowed:
+            return {
+                'status': 'error',
+                'message': 'Too many login attempts, try again later',
+                'http_status': 429,
+                'retry_after': int(retry_after) + 1
+            }
+
+        verified = self.verify_password(password_hash, password)
+        if verified is None:
+            return {'status': 'error', 'message': 'Server busy, try again', 'http_status': 503, 'retry_after': 1}
+        if not verified:
+            return {'status': 'error', 'message': 'Invalid password', 'http_status': 401}
+
+        self._remember(username, password_hash, password)
+        return {'status': 'success', 'data': data, 'http_status': 200}
@@ -0,0 +1,151 @@
+"""
+Benchmark alokasi memori per request pada jalur decode + konversi warna
+
+Membandingkan jalur lama (decode PIL + np.array + konversi ke BGR di API,
+lalu BGR -> RGB lagi di service) dengan jalur Frame (cv2.imdecode + satu
+konversi ke buffer pool), serta preview kamera desktop lama (cvtColor +
+resize PIL per frame) dengan buffer yang dipakai ulang. Deteksi/encoding wajah
+tidak ikut diukur karena sama di kedua jalur.
+
+Usage:
+    python bench_allocations.py
+    python bench_allocations.py --width 1920 --height 1080 --requests 50
+    python bench_allocations.py --image foto.jpg
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from frames import BufferPool, decode_image
+
+
+def synthetic_jpeg(width: int, height: int) -> bytes:
+    """JPEG sintetis dengan gradien + noise (ukuran file mirip foto kamera)"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                      np.full((height, width), 128, np.float32)], axis=2)
+    image += rng.normal(0, 12, image.shape).astype(np.float32)
+    ok, encoded = cv2.imencode('.jpg', np.clip(image, 0, 255).astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def legacy_request(data: bytes) -> None:
+    """Jalur lama: PIL decode -> RGB array -> BGR (API) -> RGB (service)"""
+    import io
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    bgr = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    rgb.sum(dtype=np.uint64)
+
+
+def legacy_request_cv2(data: bytes) -> None:
+    """Jalur lama tanpa Pillow: decode -> RGB -> BGR (API) -> RGB (service)"""
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    rgb_api = cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB)
+    bgr = cv2.cvtColor(rgb_api, cv2.COLOR_RGB2BGR)
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    rgb.sum(dtype=np.uint64)
+
+
+def frame_request(pool: BufferPool) -> Callable[[bytes], None]:
+    def run(data: bytes) -> None:
+        with decode_image(data, pool=pool) as frame:
+            frame.rgb().sum(dtype=np.uint64)
+    return run
+
+
+def legacy_preview(frame: np.ndarray) -> None:
+    """Preview lama: cvtColor baru + resize per frame"""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    cv2.resize(rgb, (640, 480), interpolation=cv2.INTER_LANCZOS4)
+
+
+class ReusedPreview:
+    """Preview baru: buffer RGB dan display dipakai ulang (seperti main.py)"""
+
+    def __init__(self):
+        self._rgb = None
+        self._display = None
+
+    def __call__(self, frame: np.ndarray) -> None:
+        if self._rgb is None or self._rgb.shape != frame.shape:
+            self._rgb = np.empty_like(frame)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        self._display = cv2.resize(rgb, (640, 480), dst=self._display, interpolation=cv2.INTER_AREA)
+
+
+def measure(fn: Callable, arg, requests: int, warmup: int = 3) -> Dict[str, float]:
+    """
+    Alokasi Python/numpy per request (tracemalloc) dan latency
+
+    Returns:
+        Dict peak_mb (memori baru yang dialokasikan sekaligus per request) dan
+        ms (median latency)
+    """
+    for _ in range(warmup):
+        fn(arg)
+    peaks, timings = [], []
+    tracemalloc.start()
+    for _ in range(requests):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {
+        'peak_mb': statistics.mean(peaks) / 1e6,
+        'ms': statistics.median(timings)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark alokasi decode/konversi warna")
+    parser.add_argument('--image', help="File JPEG/PNG (default gambar sintetis)")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--requests', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthetic_jpeg(args.width, args.height)
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    print(f"Gambar {frame.shape[1]}x{frame.shape[0]}, {len(data) / 1e3:.0f} kB, {args.requests} request")
+
+    pool = BufferPool()
+    cases = []
+    try:
+        import PIL  # noqa: F401
+        cases.append(('API lama (PIL)', legacy_request, data))
+    except ImportError:
+        pass
+    cases += [
+        ('API lama (cv2)', legacy_request_cv2, data),
+        ('API Frame + pool', frame_request(pool), data),
+        ('Preview lama', legacy_preview, frame),
+        ('Preview buffer reuse', ReusedPreview(), frame)
+    ]
+
+    print(f"{'jalur':<22} {'peak MB/req':>12} {'median ms':>10}")
+    for name, fn, arg in cases:
+        result = measure(fn, arg, args.requests)
+        print(f"{name:<22} {result['peak_mb']:>12.2f} {result['ms']:>10.2f}")
+    print(f"pool: {pool.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
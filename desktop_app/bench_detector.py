@@ -0,0 +1,94 @@
+"""
+Benchmark detector wajah: detection rate vs latency per konfigurasi
+
+Semua foto sampel diasumsikan berisi wajah (mis. foto check-in site yang
+sering gagal), jadi detection rate = fraksi foto dengan minimal satu wajah.
+Untuk konfigurasi bertingkat, distribusi stage yang menemukan wajah ikut
+ditampilkan supaya terlihat seberapa sering eskalasi terjadi.
+
+Usage:
+    python bench_detector.py sampel_foto/
+    python bench_detector.py sampel_foto/ --configs hog hog@0.5,hog cnn@0.5 yunet auto --threads 2
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+import cv2
+
+from face_detector import FaceDetector
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+DEFAULT_CONFIGS = ['hog', 'hog@0.5', 'hog@0.5,hog', 'cnn@0.5', 'auto']
+
+
+def load_images(directory: str, max_side: int) -> List[tuple]:
+    """Semua gambar (rekursif) sebagai RGB, diperkecil ke max_side jika lebih besar"""
+    images = []
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, filename)
+            bgr = cv2.imread(path)
+            if bgr is None:
+                continue
+            scale = max_side / max(bgr.shape[:2])
+            if scale < 1:
+                bgr = cv2.resize(bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            images.append((path, cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)))
+    return images
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark detector wajah")
+    parser.add_argument('dataset', help="Direktori foto sampel (boleh bersubdirektori)")
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS, help="Nilai FACE_DETECTOR yang dibandingkan")
+    parser.add_argument('--threads', type=int, default=None, help="FACE_DETECTOR_THREADS")
+    parser.add_argument('--max-side', type=int, default=1280, help="Resolusi maksimal (seperti frame kamera/API)")
+    parser.add_argument('--misses', action='store_true', help="Tampilkan foto yang gagal dideteksi")
+    args = parser.parse_args(argv)
+
+    images = load_images(args.dataset, args.max_side)
+    if not images:
+        print("❌ Tidak ada gambar di dataset", file=sys.stderr)
+        return 1
+    print(f"{len(images)} gambar, max side {args.max_side}px")
+
+    print(f"{'config':<22} {'detected':>9} {'mean ms':>8} {'p95 ms':>8}  stage hits")
+    for config in args.configs:
+        try:
+            detector = FaceDetector(config, threads=args.threads)
+        except ValueError as e:
+            print(f"{config:<22} dilewati: {e}")
+            continue
+        # Warm-up: load model dlib/YuNet tidak ikut diukur
+        detector.locate(images[0][1])
+        warmup = detector.metrics()['stages']
+
+        timings, detected, misses = [], 0, []
+        for path, rgb in images:
+            start = time.perf_counter()
+            locations = detector.locate(rgb)
+            timings.append((time.perf_counter() - start) * 1000)
+            if locations:
+                detected += 1
+            else:
+                misses.append(path)
+
+        timings.sort()
+        stages = detector.metrics()['stages']
+        hits = ' '.join(f"{name}={s['hits'] - warmup[name]['hits']}" for name, s in stages.items())
+        print(f"{config:<22} {detected / len(images):>9.1%} {statistics.mean(timings):>8.1f} "
+              f"{timings[int(0.95 * (len(timings) - 1))]:>8.1f}  {hits}")
+        if args.misses:
+            for path in misses:
+                print(f"    miss: {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Benchmark tahap sesudah deteksi: frame penuh vs FaceCrop
+
+Membandingkan jalur lama (landmark + encoding + liveness pada frame penuh,
+lalu crop ulang + konversi BGR untuk bukti) dengan jalur FaceCrop (satu crop
+per wajah dipakai untuk semuanya, bukti ditulis dari buffer crop yang sama)
+per tahap: waktu (median) dan memori baru per request (peak tracemalloc,
+mencakup array numpy/OpenCV; alokasi internal dlib tidak terlihat).
+
+Deteksi tidak diukur karena sama di kedua jalur. Tanpa face_recognition,
+tahap encode dilewati; lokasi wajah diambil dari FaceDetector jika --image
+diberikan, selain itu box sintetis di tengah gambar.
+
+Usage:
+    python bench_face_crop.py                          # 12 MP sintetis (4000x3000)
+    python bench_face_crop.py --image selfie_12mp.jpg --requests 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from bench_allocations import synthetic_jpeg
+from face_templates import face_quality
+from frames import FaceCrop, decode_image
+from liveness import texture_scores
+
+# Sama dengan face_recognition_service.EVIDENCE_MARGIN (modul itu butuh face_recognition)
+EVIDENCE_MARGIN = 20
+
+
+def measure(fn: Callable, requests: int, setup: Optional[Callable] = None, warmup: int = 2) -> Dict[str, float]:
+    """
+    Median ms dan rata-rata peak MB baru per panggilan
+
+    Args:
+        setup: Jika ada, fn(setup()) dipanggil; setup tidak ikut diukur
+    """
+    call = (lambda: fn(setup())) if setup else fn
+    for _ in range(warmup):
+        call()
+    peaks, timings = [], []
+    tracemalloc.start()
+    for _ in range(requests):
+        arg = setup() if setup else None
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        fn(arg) if setup else fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {'ms': statistics.median(timings), 'peak_mb': statistics.mean(peaks) / 1e6}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark encoding frame penuh vs FaceCrop")
+    parser.add_argument('--image', help="Foto dengan satu wajah (default JPEG sintetis)")
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--face-size', type=int, default=700, help="Sisi box wajah sintetis (px)")
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            data = f.read()
+    else:
+        data = synthetic_jpeg(args.width, args.height)
+    frame = decode_image(data, pool=None)
+    height, width = frame.shape[:2]
+
+    try:
+        import face_recognition
+    except ImportError:
+        face_recognition = None
+
+    if args.image:
+        from face_detector import FaceDetector
+        locations = FaceDetector().locate(frame.rgb())
+        if not locations:
+            print("❌ Wajah tidak terdeteksi di gambar", file=sys.stderr)
+            return 1
+        location = locations[0]
+    else:
+        top, left = (height - args.face_size) // 2, (width - args.face_size) // 2
+        location = (top, left + args.face_size, top + args.face_size, left)
+    print(f"Gambar {width}x{height} ({width * height / 1e6:.1f} MP), wajah {location}, {args.requests} request")
+    if face_recognition is None:
+        print("⚠️ face_recognition tidak terpasang: tahap encode dilewati")
+
+    evidence_path = os.path.join(tempfile.mkdtemp(prefix='bench_crop_'), 'evidence.jpg')
+    rgb = frame.rgb()
+
+    def legacy_evidence():
+        top, right, bottom, left = location
+        crop = frame.crop_bgr(max(0, top - EVIDENCE_MARGIN), min(width, right + EVIDENCE_MARGIN),
+                              min(height, bottom + EVIDENCE_MARGIN), max(0, left - EVIDENCE_MARGIN))
+        cv2.imwrite(evidence_path, crop)
+
+    def crop_evidence(face_crop: FaceCrop):
+        # bgr() mengonversi in-place sekali, jadi tiap panggilan butuh crop baru (setup)
+        cv2.imwrite(evidence_path, face_crop.bgr(EVIDENCE_MARGIN))
+
+    crop = FaceCrop(frame, location)
+    new_crop = lambda: FaceCrop(frame, location)
+    # (tahap, jalur lama, jalur crop, setup jalur crop)
+    stages = [
+        ('crop', None, new_crop, None),
+        ('liveness', lambda: texture_scores(rgb, location), lambda: texture_scores(crop.rgb(), crop.location), None),
+        ('quality', lambda: face_quality(rgb, location), lambda: face_quality(crop.rgb(), crop.location), None),
+        ('evidence', legacy_evidence, crop_evidence, new_crop),
+    ]
+    if face_recognition is not None:
+        stages.insert(1, (
+            'encode',
+            lambda: face_recognition.face_encodings(rgb, [location]),
+            lambda: face_recognition.face_encodings(crop.rgb(), [crop.location]),
+            None
+        ))
+        legacy_encoding = face_recognition.face_encodings(rgb, [location])
+        crop_encoding = face_recognition.face_encodings(crop.rgb(), [crop.location])
+        if legacy_encoding and crop_encoding:
+            print(f"Selisih encoding frame penuh vs crop: {np.linalg.norm(legacy_encoding[0] - crop_encoding[0]):.6f}")
+
+    print(f"crop {crop.shape[1]}x{crop.shape[0]} ({crop.pixels.nbytes / 1e6:.2f} MB)")
+    print(f"{'tahap':<10} {'lama ms':>9} {'crop ms':>9} {'lama MB':>9} {'crop MB':>9}")
+    totals = {'legacy_ms': 0.0, 'crop_ms': 0.0}
+    for name, legacy, cropped, setup in stages:
+        old = measure(legacy, args.requests) if legacy else {'ms': 0.0, 'peak_mb': 0.0}
+        new = measure(cropped, args.requests, setup=setup)
+        totals['legacy_ms'] += old['ms']
+        totals['crop_ms'] += new['ms']
+        print(f"{name:<10} {old['ms']:>9.2f} {new['ms']:>9.2f} {old['peak_mb']:>9.2f} {new['peak_mb']:>9.2f}")
+    print(f"{'total':<10} {totals['legacy_ms']:>9.2f} {totals['crop_ms']:>9.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Benchmark serialisasi + kompresi response log absensi
+
+Membandingkan jalur lama (dict per baris dari RealDictCursor, konversi jam
+ke string per baris, encoder json stdlib seperti default Flask) dengan
+fast_json (tuple -> dict lewat rows_to_dicts, orjson dengan date/time
+native), lalu ukuran dan waktu kompresi gzip/brotli dari hasil encode.
+
+Dengan --postgres, jalur fast_json (fetch tuple + encode di Python)
+dibandingkan end-to-end dengan mode PG_JSON_PASSTHROUGH (json_agg di
+PostgreSQL, bytes diteruskan apa adanya) pada tabel temporary berisi
+--rows baris sintetis. Koneksi memakai env DB_HOST/DB_NAME/DB_USER/...
+
+Usage:
+    python bench_json.py
+    python bench_json.py --rows 50000 --repeat 5
+    python bench_json.py --rows 50000 --postgres
+"""
+import argparse
+import datetime
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Callable, List, Optional
+
+import fast_json
+
+COLUMNS = ('nama', 'departemen', 'posisi', 'tanggal', 'jam', 'path_gambar', 'site_id', 'created_at')
+
+
+class FakeCursor:
+    """Cursor hasil fetch: description + baris tuple"""
+
+    def __init__(self, rows):
+        self.description = [(name,) for name in COLUMNS]
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+def make_rows(count: int) -> List[tuple]:
+    rng = random.Random(0)
+    start = datetime.date(2024, 1, 1)
+    departemen = ['IT', 'HR', 'Finance', 'Production', 'Warehouse']
+    rows = []
+    for i in range(count):
+        tanggal = start + datetime.timedelta(days=rng.randrange(90))
+        jam = datetime.time(rng.randrange(6, 18), rng.randrange(60), rng.randrange(60))
+        nama = f"Karyawan {rng.randrange(3000):04d}"
+        rows.append((
+            nama, rng.choice(departemen), 'Staff', tanggal, jam,
+            f"{nama}_{tanggal}_{jam.strftime('%H-%M-%S')}.jpg", 'default',
+            datetime.datetime.combine(tanggal, jam)
+        ))
+    return rows
+
+
+def legacy_encode(rows: List[tuple]) -> bytes:
+    """Jalur lama dashboard: dict per baris, jam -> str, json stdlib (sort_keys seperti Flask)"""
+    logs = [dict(zip(COLUMNS, row)) for row in rows]  # RealDictCursor
+    for log in logs:
+        if isinstance(log['jam'], datetime.time):
+            log['jam'] = log['jam'].strftime('%H:%M:%S')
+
+    def default(obj):
+        if isinstance(obj, (datetime.date, datetime.datetime)):
+            return obj.isoformat()
+        raise TypeError(type(obj).__name__)
+
+    return json.dumps({'success': True, 'data': logs}, default=default, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def fast_encode(rows: List[tuple]) -> bytes:
+    return fast_json.dumps({'success': True, 'data': fast_json.rows_to_dicts(FakeCursor(rows))})
+
+
+BENCH_QUERY = """
+    SELECT nama, departemen, posisi, tanggal, jam, path_gambar, site_id, created_at
+    FROM bench_log_absensi
+    ORDER BY tanggal DESC, jam DESC
+"""
+
+
+def seed_postgres(conn, count: int) -> None:
+    """Tabel temporary dengan struktur kolom log_absensi"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TEMP TABLE bench_log_absensi AS
+        SELECT
+            'Karyawan ' || lpad((i % 3000)::text, 4, '0') AS nama,
+            (ARRAY['IT', 'HR', 'Finance', 'Production', 'Warehouse'])[1 + i % 5] AS departemen,
+            'Staff' AS posisi,
+            DATE '2024-01-01' + (i % 90) AS tanggal,
+            TIME '06:00' + (i % 43200) * INTERVAL '1 second' AS jam,
+            'Karyawan_' || i || '.jpg' AS path_gambar,
+            'default' AS site_id,
+            TIMESTAMP '2024-01-01 06:00' + i * INTERVAL '1 minute' AS created_at
+        FROM generate_series(1, %s) AS i
+    """, (count,))
+    cursor.execute("ANALYZE bench_log_absensi")
+
+
+def postgres_tuples(conn) -> bytes:
+    """Jalur fast_json: fetch tuple, dict di Python, encode orjson"""
+    cursor = conn.cursor()
+    cursor.execute(BENCH_QUERY)
+    logs = fast_json.rows_to_dicts(cursor)
+    return fast_json.dumps({'status': 'success', 'count': len(logs), 'data': logs})
+
+
+def postgres_passthrough(conn) -> bytes:
+    """Mode PG_JSON_PASSTHROUGH: array JSON dibuat PostgreSQL"""
+    cursor = conn.cursor()
+    cursor.execute(fast_json.json_agg_sql(BENCH_QUERY))
+    count, raw = cursor.fetchone()
+    return fast_json.raw_json_body({'status': 'success', 'count': count}, 'data', raw)
+
+
+def bench_postgres(rows: int, repeat: int) -> None:
+    import os
+    import psycopg2
+
+    conn = psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'absensi_db'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', 'postgres'),
+        port=os.getenv('DB_PORT', '5432')
+    )
+    try:
+        seed_postgres(conn, rows)
+        print(f"{'postgres end-to-end':<22} {'ms':>8} {'KB':>8}")
+        for name, fn in (('tuple + fast_json', postgres_tuples), ('json_agg passthrough', postgres_passthrough)):
+            fn(conn)  # warm-up cache
+            body, ms = timed(fn, conn, repeat)
+            print(f"{name:<22} {ms:>8.1f} {len(body) / 1024:>8.0f}")
+    finally:
+        conn.close()
+
+
+def timed(fn: Callable, arg, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark serialisasi JSON")
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--postgres', action='store_true', help="Bandingkan juga dengan json_agg passthrough")
+    args = parser.parse_args(argv)
+
+    rows = make_rows(args.rows)
+    encoder = 'orjson' if fast_json.orjson is not None else 'json (orjson tidak terpasang)'
+    print(f"{args.rows} baris, encoder fast_json: {encoder}")
+
+    legacy, legacy_ms = timed(legacy_encode, rows, args.repeat)
+    fast, fast_ms = timed(fast_encode, rows, args.repeat)
+    print(f"{'encode':<18} {'ms':>8} {'KB':>8}")
+    print(f"{'lama (stdlib)':<18} {legacy_ms:>8.1f} {len(legacy) / 1024:>8.0f}")
+    print(f"{'fast_json':<18} {fast_ms:>8.1f} {len(fast) / 1024:>8.0f}   ({legacy_ms / fast_ms:.1f}x)")
+
+    encodings = ['gzip'] + (['br'] if fast_json.brotli is not None else [])
+    print(f"{'kompresi':<18} {'ms':>8} {'KB':>8}")
+    for encoding in encodings:
+        compressed, ms = timed(lambda data: fast_json.compress(data, encoding), fast, args.repeat)
+        print(f"{encoding:<18} {ms:>8.1f} {len(compressed) / 1024:>8.0f}   ({len(compressed) / len(fast):.1%})")
+
+    if args.postgres:
+        bench_postgres(args.rows, args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark waktu startup FaceRecognitionService
+
+Setiap fase dijalankan di process baru supaya cache import/model tidak
+terbawa antar pengukuran:
+    import          - import face_recognition_service (tanpa model dlib)
+    service_cold    - FaceRecognitionService() tanpa snapshot gallery
+    service_warm    - FaceRecognitionService() dengan snapshot gallery valid
+    model_load      - load model dlib saat pertama kali dipakai
+    shared_call     - panggilan wrapper lama kedua (instance dipakai ulang)
+
+Usage:
+    python bench_startup.py --repeat 5
+    python bench_startup.py --json
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = ['import', 'service_cold', 'service_warm', 'model_load', 'shared_call']
+
+
+def run_phase(phase: str) -> float:
+    """Ukur satu fase di process ini, return durasi dalam milidetik"""
+    if phase == 'import':
+        start = time.perf_counter()
+        import face_recognition_service  # noqa: F401
+        return (time.perf_counter() - start) * 1000
+
+    from face_recognition_service import FaceRecognitionService, GALLERY_SNAPSHOT, _fr, load_known_faces
+
+    if phase == 'service_cold':
+        # Snapshot per tenant/site: gallery_snapshot_<tenant>_<site>.npz
+        name, ext = os.path.splitext(GALLERY_SNAPSHOT)
+        for snapshot in glob.glob(os.path.join("data_wajah", f"{name}_*{ext}")):
+            os.remove(snapshot)
+        start = time.perf_counter()
+        FaceRecognitionService()
+        return (time.perf_counter() - start) * 1000
+
+    if phase == 'service_warm':
+        start = time.perf_counter()
+        FaceRecognitionService()
+        return (time.perf_counter() - start) * 1000
+
+    if phase == 'model_load':
+        start = time.perf_counter()
+        _fr()
+        return (time.perf_counter() - start) * 1000
+
+    if phase == 'shared_call':
+        load_known_faces()
+        start = time.perf_counter()
+        load_known_faces()
+        return (time.perf_counter() - start) * 1000
+
+    raise ValueError(f"Unknown phase: {phase}")
+
+
+def measure(phase: str) -> float:
+    """Jalankan satu fase di subprocess baru"""
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--phase', phase],
+        stderr=subprocess.DEVNULL, text=True
+    )
+    return float(output.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark startup FaceRecognitionService")
+    parser.add_argument('--repeat', type=int, default=3, help="Jumlah pengulangan per fase")
+    parser.add_argument('--json', action='store_true', help="Output dalam format JSON")
+    parser.add_argument('--phase', choices=PHASES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.phase:
+        print(f"{run_phase(args.phase):.3f}")
+        return 0
+
+    results = {}
+    for phase in PHASES:
+        samples = [measure(phase) for _ in range(args.repeat)]
+        results[f"startup_{phase}_ms"] = {
+            'median': statistics.median(samples),
+            'min': min(samples),
+            'max': max(samples)
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for metric, value in results.items():
+            print(f"{metric:<28} median={value['median']:9.1f}  min={value['min']:9.1f}  max={value['max']:9.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
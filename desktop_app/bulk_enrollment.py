@@ -0,0 +1,146 @@
+"""
+Bulk Enrollment - registrasi banyak karyawan sekaligus
+Input: direktori atau arsip .zip berisi foto + CSV metadata
+
+Format CSV (header wajib):
+    nama,departemen,posisi,username,password,foto
+
+Kolom `foto` berisi nama file relatif terhadap direktori/arsip foto. Beberapa
+foto untuk satu karyawan (template multi-sample) dipisah dengan `;`. Kolom
+optional `site_id` mendaftarkan karyawan ke site lain (default: SITE_ID).
+
+Usage:
+    python bulk_enrollment.py --photos foto_karyawan.zip --metadata karyawan.csv
+    python bulk_enrollment.py --photos ./foto --metadata karyawan.csv --workers 8 --report hasil.csv
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tempfile
+import zipfile
+from typing import Dict, List, Optional
+
+REPORT_FIELDS = ['row', 'nama', 'username', 'status', 'message']
+
+
+def extract_archive(archive_path: str, target_dir: str) -> str:
+    """
+    Ekstrak arsip .zip foto ke target_dir
+
+    Returns:
+        Path direktori hasil ekstrak
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            # Tolak path traversal (../) di dalam arsip
+            member_path = os.path.realpath(os.path.join(target_dir, member.filename))
+            if not member_path.startswith(os.path.realpath(target_dir) + os.sep):
+                raise ValueError(f"Unsafe path in archive: {member.filename}")
+        archive.extractall(target_dir)
+    return target_dir
+
+
+def load_metadata(metadata, photo_dir: str) -> List[Dict]:
+    """
+    Baca CSV metadata dan resolve path foto
+
+    Args:
+        metadata: Path file CSV atau file-like object (text)
+        photo_dir: Direktori tempat foto berada
+
+    Returns:
+        List record siap untuk FaceRecognitionService.register_employees_bulk;
+        baris dengan foto di luar photo_dir diberi key `error`
+    """
+    if isinstance(metadata, str):
+        with open(metadata, newline='', encoding='utf-8-sig') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = list(csv.DictReader(metadata))
+
+    photo_root = os.path.realpath(photo_dir) + os.sep
+    records = []
+    for row in rows:
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        fotos = [foto.strip() for foto in row.pop('foto', '').split(';') if foto.strip()]
+        row['image_path'] = [os.path.join(photo_dir, foto) for foto in fotos]
+        # Tolak path traversal (../ atau path absolut) di kolom foto
+        unsafe = [foto for foto, path in zip(fotos, row['image_path'])
+                  if not os.path.realpath(path).startswith(photo_root)]
+        if unsafe:
+            row['error'] = f"Unsafe photo path: {', '.join(unsafe)}"
+        records.append(row)
+    return records
+
+
+def run_bulk_enrollment(service, photos: str, metadata, workers: Optional[int] = None,
+                        allow_duplicates: bool = False) -> List[Dict]:
+    """
+    Jalankan bulk enrollment dari direktori/arsip foto + CSV metadata
+
+    Args:
+        service: Instance FaceRecognitionService
+        photos: Path direktori foto atau arsip .zip
+        metadata: Path file CSV atau file-like object (text)
+        workers: Jumlah process encoding
+        allow_duplicates: Daftarkan juga wajah yang mirip karyawan lain
+
+    Returns:
+        Report per baris CSV
+    """
+    if os.path.isdir(photos):
+        records = load_metadata(metadata, photos)
+        return service.register_employees_bulk(records, workers=workers, allow_duplicates=allow_duplicates)
+
+    if not zipfile.is_zipfile(photos):
+        raise ValueError("Photos must be a directory or a .zip archive")
+
+    with tempfile.TemporaryDirectory(prefix="bulk_enroll_") as tmp_dir:
+        extract_archive(photos, tmp_dir)
+        records = load_metadata(metadata, tmp_dir)
+        return service.register_employees_bulk(records, workers=workers, allow_duplicates=allow_duplicates)
+
+
+def write_report(report: List[Dict], output) -> None:
+    """Tulis report ke CSV (path atau file-like object)"""
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            write_report(report, f)
+        return
+    writer = csv.DictWriter(output, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(report)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk enrollment karyawan dari foto + CSV metadata")
+    parser.add_argument('--photos', required=True, help="Direktori foto atau arsip .zip")
+    parser.add_argument('--metadata', required=True, help="File CSV metadata karyawan")
+    parser.add_argument('--workers', type=int, default=None, help="Jumlah process encoding (default: jumlah CPU)")
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help="Jangan tolak wajah yang mirip karyawan terdaftar")
+    parser.add_argument('--report', default=None, help="Path output report CSV (default: stdout)")
+    args = parser.parse_args(argv)
+
+    from face_recognition_service import get_face_service
+
+    service = get_face_service()
+    report = run_bulk_enrollment(service, args.photos, args.metadata, workers=args.workers,
+                                 allow_duplicates=args.allow_duplicates)
+
+    if args.report:
+        write_report(report, args.report)
+    else:
+        buffer = io.StringIO()
+        write_report(report, buffer)
+        print(buffer.getvalue(), end='')
+
+    success = sum(1 for row in report if row['status'] == 'success')
+    print(f"✅ {success}/{len(report)} karyawan berhasil didaftarkan", file=sys.stderr)
+    return 0 if success == len(report) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
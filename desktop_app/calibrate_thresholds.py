@@ -0,0 +1,170 @@
+"""
+Kalibrasi offline threshold matching (tolerance + margin) per site dari log
+jarak (match_distances.jsonl, ditulis FaceRecognitionService)
+
+Distribusi yang dipakai:
+    genuine  - jarak kandidat terbaik pada check-in yang diterima
+    impostor - jarak ke kandidat lain (orang berbeda) pada check-in 1:N yang
+               diterima: secara definisi bukan pemilik wajah
+    gap      - selisih kandidat kedua dan pertama pada check-in genuine
+
+Entry yang diberi field "label" ("genuine"/"impostor", misalnya hasil review
+HR) selalu diutamakan. Genuine dari check-in yang diterima terpotong di
+tolerance lama, jadi FRR di bawah adalah estimasi bawah; tambahkan label
+manual untuk penolakan yang ternyata karyawan asli.
+
+Tolerance dipilih setinggi mungkin dengan FAR impostor <= --target-far,
+margin dipilih supaya paling banyak --max-margin-reject check-in genuine
+ditolak sebagai ambigu. Dengan kurang dari --min-impostor jarak impostor
+(mis. log yang isinya hanya verifikasi 1:1 API) tolerance tidak dikalibrasi
+dan nilai dari konfigurasi yang berlaku (--current) dipertahankan.
+
+Usage:
+    python calibrate_thresholds.py log_absensi/match_distances.jsonl
+    python calibrate_thresholds.py log_absensi/match_distances.jsonl --target-far 0.0005 --output match_thresholds.json
+"""
+import argparse
+import json
+import math
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from match_policy import DEFAULT_MARGIN, MatchThresholds, ThresholdConfig
+
+
+def load_distances(paths: List[str]) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Baca log jarak dan kelompokkan per site
+
+    Returns:
+        Dict site_id -> {'genuine': [...], 'impostor': [...], 'gap': [...]}
+    """
+    sites = defaultdict(lambda: {'genuine': [], 'impostor': [], 'gap': []})
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                distances = entry.get('distances') or []
+                if not distances:
+                    continue
+                bucket = sites[entry.get('site_id', 'default')]
+                label = entry.get('label')
+                if label == 'impostor':
+                    bucket['impostor'].extend(distances)
+                    continue
+                if label != 'genuine' and not entry.get('accepted'):
+                    continue
+                bucket['genuine'].append(distances[0])
+                if entry.get('mode') == '1:N' and len(distances) > 1:
+                    bucket['impostor'].extend(distances[1:])
+                    bucket['gap'].append(distances[1] - distances[0])
+    return sites
+
+
+def pick_tolerance(impostor: List[float], target_far: float, max_tolerance: float) -> float:
+    """Tolerance terbesar dengan fraksi impostor <= tolerance tidak melebihi target_far"""
+    impostor = np.sort(np.asarray(impostor))
+    allowed = int(math.floor(target_far * len(impostor)))
+    if allowed >= len(impostor):
+        return max_tolerance
+    # Tepat di bawah impostor ke-(allowed+1)
+    tolerance = math.floor((impostor[allowed] - 1e-6) * 1000) / 1000
+    return min(max_tolerance, tolerance)
+
+
+def pick_margin(gaps: List[float], max_reject: float) -> float:
+    """Margin terbesar yang menolak paling banyak max_reject check-in genuine"""
+    if not gaps:
+        return DEFAULT_MARGIN
+    return max(0.0, math.floor(float(np.quantile(gaps, max_reject)) * 1000) / 1000)
+
+
+def calibrate(distances: Dict[str, List[float]], target_far: float, max_reject: float,
+              max_tolerance: float, current: MatchThresholds, min_impostor: int) -> Dict:
+    """
+    Hitung threshold + estimasi FAR/FRR untuk satu kumpulan distribusi
+
+    Args:
+        current: Threshold yang berlaku; tolerance-nya dipakai jika jarak
+            impostor kurang dari min_impostor, margin-nya jika tidak ada gap
+    """
+    calibrated = len(distances['impostor']) >= max(1, min_impostor)
+    if calibrated:
+        tolerance = pick_tolerance(distances['impostor'], target_far, max_tolerance)
+    else:
+        tolerance = current.tolerance
+    margin = pick_margin(distances['gap'], max_reject) if distances['gap'] else current.margin
+    genuine = np.asarray(distances['genuine'])
+    impostor = np.asarray(distances['impostor'])
+    gaps = np.asarray(distances['gap'])
+    return {
+        'thresholds': MatchThresholds(tolerance, margin),
+        'calibrated': calibrated,
+        'genuine': len(genuine),
+        'impostor': len(impostor),
+        'far': float(np.mean(impostor <= tolerance)) if len(impostor) else float('nan'),
+        'frr': float(np.mean(genuine > tolerance)) if len(genuine) else float('nan'),
+        'margin_reject': float(np.mean(gaps < margin)) if len(gaps) else float('nan')
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Kalibrasi threshold matching dari log jarak")
+    parser.add_argument('logs', nargs='+', help="File match_distances.jsonl")
+    parser.add_argument('--target-far', type=float, default=0.001, help="FAR maksimal (default 0.1%%)")
+    parser.add_argument('--max-margin-reject', type=float, default=0.01,
+                        help="Fraksi genuine maksimal yang boleh ditolak aturan margin")
+    parser.add_argument('--max-tolerance', type=float, default=0.6)
+    parser.add_argument('--min-impostor', type=int, default=200,
+                        help="Minimal jarak impostor untuk mengkalibrasi tolerance")
+    parser.add_argument('--current', help="Konfigurasi threshold yang berlaku (default MATCH_THRESHOLDS_FILE)")
+    parser.add_argument('--output', help="Tulis konfigurasi (format MATCH_THRESHOLDS_FILE)")
+    args = parser.parse_args(argv)
+
+    sites = load_distances(args.logs)
+    if not sites:
+        print("❌ Log jarak kosong", file=sys.stderr)
+        return 1
+
+    combined = {'genuine': [], 'impostor': [], 'gap': []}
+    for distances in sites.values():
+        for key in combined:
+            combined[key].extend(distances[key])
+    current = ThresholdConfig.load(args.current)
+    if len(combined['impostor']) < args.min_impostor:
+        print(f"⚠️ Hanya {len(combined['impostor'])} jarak impostor (< --min-impostor {args.min_impostor}): "
+              f"tolerance tidak dikalibrasi, tetap {current.default.tolerance:.3f}")
+
+    results = {'*': calibrate(combined, args.target_far, args.max_margin_reject, args.max_tolerance,
+                              current.default, args.min_impostor)}
+    for site, distances in sorted(sites.items()):
+        if len(distances['impostor']) >= args.min_impostor:
+            results[site] = calibrate(distances, args.target_far, args.max_margin_reject, args.max_tolerance,
+                                      current.for_site(site), args.min_impostor)
+
+    print(f"{'site':<16} {'genuine':>7} {'impostor':>8} {'tol':>6} {'margin':>6} {'FAR':>7} {'FRR':>7} {'ambig':>7}")
+    for site, r in results.items():
+        t = r['thresholds']
+        print(f"{site:<16} {r['genuine']:>7} {r['impostor']:>8} {t.tolerance:>6.3f} {t.margin:>6.3f} "
+              f"{r['far']:>7.2%} {r['frr']:>7.2%} {r['margin_reject']:>7.2%}"
+              f"{'' if r['calibrated'] else '  (tolerance lama)'}")
+
+    if args.output:
+        # Site yang tidak dikalibrasi ulang mempertahankan override yang berlaku
+        sites_thresholds = dict(current.sites)
+        sites_thresholds.update({site: r['thresholds'] for site, r in results.items() if site != '*'})
+        config = ThresholdConfig(default=results['*']['thresholds'], sites=sites_thresholds)
+        with open(args.output, 'w') as f:
+            json.dump(config.to_dict(), f, indent=2)
+        print(f"✅ Threshold ditulis ke {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,8 +2,63 @@
 Database configuration
 """
 import os
+import threading
+from contextlib import contextmanager
+
+# Setiap INSERT/UPDATE/DELETE karyawan dicatat dengan version yang naik terus.
+# Advisory lock membuat version dibagikan berurutan sesuai urutan commit,
+# sehingga pembaca "version > terakhir" tidak pernah melewatkan perubahan
+# dari transaksi yang commit belakangan dengan version lebih kecil.
+KARYAWAN_CHANGES_TABLE = '''
+    CREATE TABLE IF NOT EXISTS karyawan_changes (
+        version BIGSERIAL PRIMARY KEY,
+        karyawan_id INTEGER NOT NULL,
+        op CHAR(1) NOT NULL,
+        tenant_id VARCHAR(50) NOT NULL,
+        site_id VARCHAR(50) NOT NULL,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+KARYAWAN_CHANGE_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION karyawan_change_feed() RETURNS trigger AS $$
+    DECLARE
+        changed BIGINT;
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('karyawan_changes'));
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO karyawan_changes (karyawan_id, op, tenant_id, site_id)
+            VALUES (OLD.id, 'D', OLD.tenant_id, OLD.site_id) RETURNING version INTO changed;
+            PERFORM pg_notify('karyawan_changes', OLD.tenant_id || '/' || OLD.site_id || '/' || changed);
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            -- Karyawan pindah tenant/site: partisi lama mencatat hapus
+            IF OLD.tenant_id <> NEW.tenant_id OR OLD.site_id <> NEW.site_id THEN
+                INSERT INTO karyawan_changes (karyawan_id, op, tenant_id, site_id)
+                VALUES (OLD.id, 'D', OLD.tenant_id, OLD.site_id) RETURNING version INTO changed;
+                PERFORM pg_notify('karyawan_changes', OLD.tenant_id || '/' || OLD.site_id || '/' || changed);
+            END IF;
+        END IF;
+        INSERT INTO karyawan_changes (karyawan_id, op, tenant_id, site_id)
+        VALUES (NEW.id, left(TG_OP, 1), NEW.tenant_id, NEW.site_id) RETURNING version INTO changed;
+        PERFORM pg_notify('karyawan_changes', NEW.tenant_id || '/' || NEW.site_id || '/' || changed);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+'''
+
+KARYAWAN_CHANGE_TRIGGER = '''
+    CREATE TRIGGER karyawan_change_feed
+    AFTER INSERT OR DELETE OR UPDATE OF nama, departemen, posisi, face_encoding_path, tenant_id, site_id
+    ON karyawan
+    FOR EACH ROW EXECUTE FUNCTION karyawan_change_feed()
+'''
+
 
 class DesktopDatabaseConfig:
+    _pool = None
+    _pool_lock = threading.Lock()
     
     @classmethod
     def get_connection(cls):
@@ -20,7 +75,8 @@ class DesktopDatabaseConfig:
                 database=os.getenv('DB_NAME', 'absensi_db'),
                 user=os.getenv('DB_USER', 'postgres'),
                 password=os.getenv('DB_PASSWORD', 'postgres'),
-                port=os.getenv('DB_PORT', '5432')
+                port=os.getenv('DB_PORT', '5432'),
+                connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', '10'))
             )
             print("✅ Connected to PostgreSQL")
             return conn, 'postgresql'
@@ -28,6 +84,73 @@ class DesktopDatabaseConfig:
         except Exception as e:
             raise RuntimeError(f"PostgreSQL connection failed: {e}")
 
+    @classmethod
+    def get_pool(cls):
+        """
+        Connection pool bersama (thread-safe) untuk request API yang ringan.
+        Ukuran diatur lewat DB_POOL_MIN / DB_POOL_MAX.
+        """
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    import psycopg2.extensions
+                    from psycopg2.pool import ThreadedConnectionPool
+
+                    class PreparingConnection(psycopg2.extensions.connection):
+                        """Connection yang mengingat prepared statement miliknya"""
+                        def __init__(self, *args, **kwargs):
+                            super().__init__(*args, **kwargs)
+                            self.prepared = set()
+
+                    cls._pool = ThreadedConnectionPool(
+                        int(os.getenv('DB_POOL_MIN', '1')),
+                        int(os.getenv('DB_POOL_MAX', '10')),
+                        host=os.getenv('DB_HOST', 'localhost'),
+                        database=os.getenv('DB_NAME', 'absensi_db'),
+                        user=os.getenv('DB_USER', 'postgres'),
+                        password=os.getenv('DB_PASSWORD', 'postgres'),
+                        port=os.getenv('DB_PORT', '5432'),
+                        connection_factory=PreparingConnection
+                    )
+        return cls._pool
+
+    @classmethod
+    @contextmanager
+    def pooled_connection(cls):
+        """Pinjam connection dari pool, otomatis dikembalikan (rollback jika error)"""
+        pool = cls.get_pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+
+    @staticmethod
+    def execute_prepared(conn, name: str, sql: str, params=()):
+        """
+        Jalankan statement lewat PREPARE/EXECUTE supaya plan di-cache per connection
+
+        Args:
+            conn: Connection dari pooled_connection()
+            name: Nama prepared statement
+            sql: Query dengan placeholder $1, $2, ...
+            params: Parameter query
+
+        Returns:
+            Cursor setelah EXECUTE
+        """
+        cursor = conn.cursor()
+        if name not in conn.prepared:
+            cursor.execute(f"PREPARE {name} AS {sql}")
+            conn.prepared.add(name)
+        placeholders = ', '.join(['%s'] * len(params))
+        cursor.execute(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", params)
+        return cursor
+
     @classmethod
     def init_tables(cls, conn, db_type):
         """Initialize database tables (PostgreSQL only)"""
@@ -56,5 +179,50 @@ class DesktopDatabaseConfig:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        # client_id: id dari aplikasi mobile untuk sinkronisasi offline yang idempotent
+        cursor.execute("ALTER TABLE log_absensi ADD COLUMN IF NOT EXISTS client_id VARCHAR(64)")
+        # Multi-site: setiap karyawan dan log milik satu tenant + site
+        for table in ('karyawan', 'log_absensi'):
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS tenant_id VARCHAR(50) NOT NULL DEFAULT 'default'"
+            )
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS site_id VARCHAR(50) NOT NULL DEFAULT 'default'"
+            )
+        # client_id unik per tenant (dulu global: client_id tenant lain tercatat sebagai duplicate)
+        cursor.execute("DROP INDEX IF EXISTS idx_log_absensi_client_id")
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_log_absensi_tenant_client_id ON log_absensi(tenant_id, client_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_karyawan_tenant_site ON karyawan(tenant_id, site_id, id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_log_absensi_tenant_site_tanggal "
+            "ON log_absensi(tenant_id, site_id, tanggal)"
+        )
+        # Feed perubahan karyawan untuk update gallery incremental (gallery_feed.py)
+        cursor.execute(KARYAWAN_CHANGES_TABLE)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_karyawan_changes_tenant_site "
+            "ON karyawan_changes(tenant_id, site_id, version)"
+        )
+        cursor.execute(KARYAWAN_CHANGE_FUNCTION)
+        cursor.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'karyawan_change_feed'")
+        if cursor.fetchone() is None:
+            cursor.execute(KARYAWAN_CHANGE_TRIGGER)
+        # Index trigram untuk pencarian nama di dashboard. CREATE EXTENSION
+        # butuh hak superuser; jika gagal pencarian tetap jalan tanpa index
+        cursor.execute("SAVEPOINT trgm_index")
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_log_absensi_nama_trgm "
+                "ON log_absensi USING gin (nama gin_trgm_ops)"
+            )
+            cursor.execute("RELEASE SAVEPOINT trgm_index")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT trgm_index")
+            print(f"⚠️ pg_trgm index not created: {e}")
         conn.commit()
         return cursor
@@ -0,0 +1,181 @@
+"""
+Evaluasi offline akurasi matching (FAR/FRR) single-sample vs multi-sample
+
+Dataset berupa direktori berlabel:
+    dataset/
+        john_doe/  img1.jpg img2.jpg ...
+        jane/      img1.jpg ...
+
+Per orang, `--samples` foto pertama dipakai untuk enrollment, sisanya
+menjadi probe. Probe diurutkan menjadi sesi check-in beberapa attempt
+untuk menghitung rata-rata attempt sampai check-in berhasil.
+
+Keputusan memakai kebijakan yang sama dengan produksi: top-k score_gallery
+lalu MatchThresholds.decide (tolerance + margin, ambigu ditolak). Default
+threshold diambil dari ThresholdConfig (MATCH_THRESHOLDS_FILE, --site);
+--tolerance / --margin mengevaluasi nilai lain.
+
+Usage:
+    python evaluate_matching.py dataset/ --samples 1 3 5
+    python evaluate_matching.py dataset/ --site plant-a --tolerance 0.40 0.45 0.50 --margin 0.0 0.02 0.04
+"""
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import face_recognition
+
+from face_templates import build_face_template, face_quality, parse_face_template, score_gallery
+from match_policy import MatchThresholds, ThresholdConfig
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+# decide() hanya melihat kandidat pertama dan kedua
+SCORE_K = 2
+
+
+def encode_dataset(dataset_dir: str) -> Dict[str, List[Tuple[np.ndarray, float]]]:
+    """
+    Encode semua foto di dataset
+
+    Returns:
+        Dict nama -> list (encoding, quality), urut sesuai nama file
+    """
+    dataset = {}
+    for person in sorted(os.listdir(dataset_dir)):
+        person_dir = os.path.join(dataset_dir, person)
+        if not os.path.isdir(person_dir):
+            continue
+        entries = []
+        for filename in sorted(os.listdir(person_dir)):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = face_recognition.load_image_file(os.path.join(person_dir, filename))
+            locations = face_recognition.face_locations(image)
+            if len(locations) != 1:
+                continue
+            encoding = face_recognition.face_encodings(image, locations)[0]
+            entries.append((encoding, face_quality(image, locations[0])))
+        if entries:
+            dataset[person] = entries
+    return dataset
+
+
+def build_gallery(dataset: Dict, samples: int):
+    """Enroll `samples` foto pertama per orang, sisanya dikembalikan sebagai probe"""
+    names, centroids, gallery_samples, gallery_quality, probes = [], [], [], [], {}
+    for person, entries in dataset.items():
+        if len(entries) <= samples:
+            continue
+        enrolled, rest = entries[:samples], entries[samples:]
+        template = build_face_template([e for e, _ in enrolled], [q for _, q in enrolled])
+        person_samples, person_quality, centroid = parse_face_template(template)
+        names.append(person)
+        centroids.append(centroid)
+        gallery_samples.append(person_samples)
+        gallery_quality.append(person_quality)
+        probes[person] = [e for e, _ in rest]
+    matrix = np.vstack(centroids) if centroids else np.empty((0, 128))
+    return names, matrix, gallery_samples, gallery_quality, probes
+
+
+def decide(encoding: np.ndarray, centroids: np.ndarray, samples: List[np.ndarray], quality: List[np.ndarray],
+           thresholds: MatchThresholds) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Keputusan 1:N seperti FaceRecognitionService._identify_encoding
+
+    Returns:
+        Tuple (index karyawan yang diterima atau None, alasan penolakan)
+    """
+    candidates = score_gallery(encoding, centroids, samples, quality, k=SCORE_K)
+    accepted, reason = thresholds.decide([distance for _, distance in candidates])
+    return (candidates[0][0] if accepted else None), reason
+
+
+def evaluate(dataset: Dict, samples: int, thresholds: MatchThresholds, max_attempts: int) -> Dict:
+    """
+    Hitung FAR, FRR dan rata-rata attempt per check-in berhasil
+
+    FRR: probe genuine yang ditolak (di atas tolerance atau ambigu) atau
+    salah dikenali.
+    FAR: probe yang diterima sebagai orang lain ketika identitas aslinya
+    dikeluarkan dari gallery (skenario impostor).
+    """
+    names, centroids, gallery_samples, gallery_quality, probes = build_gallery(dataset, samples)
+    genuine_total = genuine_reject = genuine_ambiguous = impostor_total = impostor_accept = 0
+    attempts_per_success, failed_sessions = [], 0
+
+    for owner, person in enumerate(names):
+        keep = np.arange(len(names)) != owner
+        impostor_samples = [s for i, s in enumerate(gallery_samples) if i != owner]
+        impostor_quality = [q for i, q in enumerate(gallery_quality) if i != owner]
+
+        outcomes = []
+        for encoding in probes[person]:
+            idx, reason = decide(encoding, centroids, gallery_samples, gallery_quality, thresholds)
+            success = idx == owner
+            outcomes.append(success)
+            genuine_total += 1
+            genuine_reject += 0 if success else 1
+            genuine_ambiguous += 1 if reason == 'ambiguous' else 0
+
+            idx, _ = decide(encoding, centroids[keep], impostor_samples, impostor_quality, thresholds)
+            impostor_total += 1
+            impostor_accept += 0 if idx is None else 1
+
+        # Sesi check-in: retry sampai berhasil, maksimal max_attempts
+        for start in range(0, len(outcomes), max_attempts):
+            session = outcomes[start:start + max_attempts]
+            if True in session:
+                attempts_per_success.append(session.index(True) + 1)
+            else:
+                failed_sessions += 1
+
+    return {
+        'samples': samples,
+        'tolerance': thresholds.tolerance,
+        'margin': thresholds.margin,
+        'identities': len(names),
+        'probes': genuine_total,
+        'far': impostor_accept / impostor_total if impostor_total else 0.0,
+        'frr': genuine_reject / genuine_total if genuine_total else 0.0,
+        'ambiguous': genuine_ambiguous / genuine_total if genuine_total else 0.0,
+        'avg_attempts': float(np.mean(attempts_per_success)) if attempts_per_success else float('nan'),
+        'failed_sessions': failed_sessions
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluasi FAR/FRR matching wajah secara offline")
+    parser.add_argument('dataset', help="Direktori dataset berlabel (satu subdirektori per orang)")
+    parser.add_argument('--samples', type=int, nargs='+', default=[1, 3, 5], help="Jumlah sample enrollment")
+    parser.add_argument('--site', help="Threshold site ini dari ThresholdConfig (default: threshold default)")
+    parser.add_argument('--tolerance', type=float, nargs='+', help="Tolerance yang dievaluasi (default dari config)")
+    parser.add_argument('--margin', type=float, nargs='+', help="Margin yang dievaluasi (default dari config)")
+    parser.add_argument('--max-attempts', type=int, default=3, help="Maksimal attempt per sesi check-in")
+    args = parser.parse_args(argv)
+
+    dataset = encode_dataset(args.dataset)
+    if not dataset:
+        print("❌ Dataset kosong atau tidak ada wajah terdeteksi", file=sys.stderr)
+        return 1
+
+    configured = ThresholdConfig.load().for_site(args.site)
+    tolerances = args.tolerance or [configured.tolerance]
+    margins = args.margin if args.margin is not None else [configured.margin]
+
+    print(f"{'samples':>7} {'tol':>5} {'margin':>6} {'ids':>5} {'probes':>6} {'FAR':>7} {'FRR':>7} "
+          f"{'ambig':>7} {'attempts':>8} {'failed':>6}")
+    for samples in args.samples:
+        for tolerance in tolerances:
+            for margin in margins:
+                r = evaluate(dataset, samples, MatchThresholds(tolerance, margin), args.max_attempts)
+                print(f"{r['samples']:>7} {r['tolerance']:>5.2f} {r['margin']:>6.3f} {r['identities']:>5} "
+                      f"{r['probes']:>6} {r['far']:>7.2%} {r['frr']:>7.2%} {r['ambiguous']:>7.2%} "
+                      f"{r['avg_attempts']:>8.2f} {r['failed_sessions']:>6}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Face Dedup - deteksi identitas ganda / hampir sama di gallery
+
+Pasangan kandidat dicari lewat jarak antar centroid yang dihitung per blok
+matriks (||a||² + ||b||² - 2ab), sehingga memori tetap kecil dan tidak ada
+loop N² di Python. Kandidat lalu di-refine dengan jarak sample terdekat
+antar kedua template, dan pasangan yang lolos digabung menjadi cluster.
+
+Usage:
+    python face_dedup.py
+    python face_dedup.py --threshold 0.35 --report duplikat.csv --site-only
+"""
+import argparse
+import csv
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from face_templates import CENTROID_SLACK
+
+DUPLICATE_DISTANCE = 0.38
+BLOCK_SIZE = 1024
+
+REPORT_FIELDS = ['cluster', 'nama', 'departemen', 'posisi', 'site_id', 'nearest', 'distance']
+
+
+def candidate_pairs(a: np.ndarray, b: Optional[np.ndarray] = None, threshold: float = DUPLICATE_DISTANCE,
+                    block_size: int = BLOCK_SIZE) -> List[Tuple[int, int, float]]:
+    """
+    Semua pasangan centroid dengan jarak <= threshold
+
+    Args:
+        a: Matriks centroid (N, 128)
+        b: Matriks centroid kedua (M, 128); None = pasangan di dalam a sendiri
+            (i < j saja)
+        threshold: Batas jarak
+        block_size: Jumlah baris per blok perhitungan
+
+    Returns:
+        List (index di a, index di b, jarak)
+    """
+    same = b is None
+    b = a if same else b
+    if len(a) == 0 or len(b) == 0:
+        return []
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    a_norms = np.einsum('ij,ij->i', a, a)
+    b_norms = np.einsum('ij,ij->i', b, b)
+    limit = threshold * threshold
+
+    pairs = []
+    for i in range(0, len(a), block_size):
+        block = a[i:i + block_size]
+        start = i if same else 0
+        for j in range(start, len(b), block_size):
+            squared = a_norms[i:i + block_size, None] + b_norms[None, j:j + block_size] - 2.0 * block @ b[j:j + block_size].T
+            rows, cols = np.nonzero(squared <= limit)
+            rows += i
+            cols += j
+            if same:
+                keep = rows < cols
+                rows, cols = rows[keep], cols[keep]
+            distances = np.sqrt(np.maximum(squared[rows - i, cols - j], 0.0))
+            pairs.extend(zip(rows.tolist(), cols.tolist(), distances.tolist()))
+    return pairs
+
+
+def sample_distance(samples_a: np.ndarray, samples_b: np.ndarray) -> float:
+    """Jarak terdekat antar sample dua template"""
+    diff = samples_a[:, None, :] - samples_b[None, :, :]
+    return float(np.sqrt((diff * diff).sum(axis=2)).min())
+
+
+def find_duplicates(centroids: np.ndarray, samples: List[np.ndarray],
+                    other_centroids: Optional[np.ndarray] = None, other_samples: Optional[List[np.ndarray]] = None,
+                    threshold: float = DUPLICATE_DISTANCE,
+                    block_size: int = BLOCK_SIZE) -> List[Tuple[int, int, float]]:
+    """
+    Pasangan template yang hampir sama (centroid shortlist, lalu refine sample)
+
+    Args:
+        centroids, samples: Gallery yang diperiksa
+        other_centroids, other_samples: Gallery pembanding; None = cari
+            duplikat di dalam gallery pertama sendiri
+        threshold: Batas jarak sample terdekat untuk dianggap duplikat
+
+    Returns:
+        List (index, index pembanding, jarak sample terdekat)
+    """
+    if other_centroids is None:
+        other_centroids, other_samples = None, samples
+    duplicates = []
+    for i, j, _ in candidate_pairs(centroids, other_centroids, threshold + CENTROID_SLACK, block_size):
+        distance = sample_distance(samples[i], other_samples[j])
+        if distance <= threshold:
+            duplicates.append((i, j, distance))
+    return duplicates
+
+
+def cluster_pairs(pairs: List[Tuple[int, int, float]]) -> List[List[int]]:
+    """Gabungkan pasangan duplikat menjadi cluster (union-find)"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters = {}
+    for x in parent:
+        clusters.setdefault(find(x), []).append(x)
+    return sorted((sorted(members) for members in clusters.values()), key=lambda members: members[0])
+
+
+def dedup_report(gallery, threshold: float = DUPLICATE_DISTANCE) -> List[Dict]:
+    """
+    Cari duplikat di seluruh gallery
+
+    Args:
+        gallery: FaceGallery
+
+    Returns:
+        Baris report per karyawan yang masuk cluster duplikat
+    """
+    pairs = find_duplicates(gallery.centroids, gallery.samples, threshold=threshold)
+    nearest = {}
+    for i, j, distance in pairs:
+        for a, b in ((i, j), (j, i)):
+            if a not in nearest or distance < nearest[a][1]:
+                nearest[a] = (b, distance)
+
+    report = []
+    for number, members in enumerate(cluster_pairs(pairs), start=1):
+        for idx in members:
+            meta = gallery.data[idx]
+            other, distance = nearest[idx]
+            report.append({
+                'cluster': number,
+                'nama': meta.get('nama'),
+                'departemen': meta.get('departemen'),
+                'posisi': meta.get('posisi'),
+                'site_id': meta.get('site_id'),
+                'nearest': gallery.data[other].get('nama'),
+                'distance': round(distance, 4)
+            })
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Laporan wajah duplikat di gallery")
+    parser.add_argument('--threshold', type=float, default=DUPLICATE_DISTANCE)
+    parser.add_argument('--site-only', action='store_true', help="Hanya gallery site ini (default seluruh tenant)")
+    parser.add_argument('--report', help="Tulis report CSV")
+    args = parser.parse_args(argv)
+
+    from face_recognition_service import get_face_service
+
+    service = get_face_service()
+    if args.site_only:
+        gallery = service.gallery
+    else:
+        service.load_global_faces()
+        gallery = service.global_gallery
+
+    report = dedup_report(gallery, args.threshold)
+    clusters = len({row['cluster'] for row in report})
+    print(f"🔍 {len(gallery)} karyawan diperiksa, {clusters} cluster duplikat ({len(report)} karyawan)")
+    for row in report:
+        print(f"  [{row['cluster']}] {row['nama']} ({row['site_id']}) ~ {row['nearest']} d={row['distance']}")
+
+    if args.report:
+        with open(args.report, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(report)
+        print(f"📄 Report: {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
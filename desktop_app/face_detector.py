@@ -0,0 +1,196 @@
+"""
+Face Detector - backend deteksi wajah yang bisa dikonfigurasi
+
+Backend:
+    hog    - dlib HOG (default face_recognition), cepat di CPU, sering gagal
+             pada cahaya buruk / wajah miring
+    cnn    - dlib CNN (mmod), jauh lebih robust tapi mahal di CPU
+    yunet  - OpenCV DNN YuNet (cv2.FaceDetectorYN), robust dan cepat di CPU,
+             butuh file model ONNX (env YUNET_MODEL)
+
+Deteksi berjalan sebagai urutan stage "backend@scale": stage berikutnya
+hanya dicoba jika stage sebelumnya tidak menemukan wajah, sehingga kasus
+normal tetap semurah HOG di gambar yang diperkecil.
+
+Konfigurasi lewat environment:
+    FACE_DETECTOR               hog | cnn | yunet | auto | daftar stage,
+                                mis. "hog@0.5,hog,cnn@0.5" (default hog)
+    FACE_DETECTOR_THREADS       jumlah thread CPU untuk OpenCV/BLAS
+    FACE_DETECTOR_CONCURRENCY   maksimal deteksi cnn/yunet bersamaan per process
+    YUNET_MODEL                 path face_detection_yunet_*.onnx
+    YUNET_SCORE                 score threshold YuNet (default 0.8)
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BACKENDS = ('hog', 'cnn', 'yunet')
+YUNET_MODEL = "face_detection_yunet_2023mar.onnx"
+
+Location = Tuple[int, int, int, int]
+
+
+def parse_stages(spec: str, yunet_available: bool) -> List[Tuple[str, float]]:
+    """
+    Parse konfigurasi FACE_DETECTOR menjadi list (backend, scale)
+
+    'auto': HOG di setengah resolusi, HOG resolusi penuh, lalu YuNet jika
+    model tersedia (selain itu CNN di setengah resolusi).
+    """
+    spec = spec.strip().lower()
+    if spec == 'auto':
+        last = ('yunet', 1.0) if yunet_available else ('cnn', 0.5)
+        return [('hog', 0.5), ('hog', 1.0), last]
+
+    stages = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        backend, _, scale = part.partition('@')
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown face detector backend {backend!r}")
+        scale = float(scale) if scale else 1.0
+        if not 0 < scale <= 1:
+            raise ValueError(f"Detector scale must be in (0, 1], got {scale}")
+        stages.append((backend, scale))
+    if not stages:
+        raise ValueError("FACE_DETECTOR is empty")
+    return stages
+
+
+class FaceDetector:
+    def __init__(self, spec: Optional[str] = None, threads: Optional[int] = None,
+                 concurrency: Optional[int] = None, yunet_model: Optional[str] = None):
+        """
+        Args:
+            spec: Backend / urutan stage, default env FACE_DETECTOR
+            threads: Thread CPU untuk OpenCV dan BLAS (dlib CNN), default env
+                FACE_DETECTOR_THREADS (tidak diubah jika kosong)
+            concurrency: Maksimal stage mahal (cnn/yunet) yang berjalan
+                bersamaan, default env FACE_DETECTOR_CONCURRENCY (default 1)
+            yunet_model: Path model ONNX YuNet, default env YUNET_MODEL
+        """
+        threads = threads if threads is not None else int(os.getenv('FACE_DETECTOR_THREADS', '0'))
+        if threads > 0:
+            cv2.setNumThreads(threads)
+            # Harus di-set sebelum dlib di-load (import face_recognition lazy)
+            for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+                os.environ.setdefault(var, str(threads))
+        self.threads = threads
+
+        self.yunet_model = yunet_model or os.getenv('YUNET_MODEL', YUNET_MODEL)
+        self.yunet_score = float(os.getenv('YUNET_SCORE', '0.8'))
+        yunet_available = os.path.isfile(self.yunet_model) and hasattr(cv2, 'FaceDetectorYN')
+        self.spec = spec or os.getenv('FACE_DETECTOR', 'hog')
+        self.stages = parse_stages(self.spec, yunet_available)
+        if any(backend == 'yunet' for backend, _ in self.stages) and not yunet_available:
+            raise ValueError(f"YuNet model not found: {self.yunet_model}")
+
+        concurrency = concurrency or int(os.getenv('FACE_DETECTOR_CONCURRENCY', '1'))
+        self._heavy = threading.BoundedSemaphore(concurrency)
+        # FaceDetectorYN menyimpan ukuran input, jadi satu instance per thread
+        self._yunet = threading.local()
+        self._lock = threading.Lock()
+        self._metrics = {self._stage_name(stage): {'calls': 0, 'hits': 0, 'total_ms': 0.0}
+                         for stage in self.stages}
+
+    @staticmethod
+    def _stage_name(stage: Tuple[str, float]) -> str:
+        backend, scale = stage
+        return backend if scale == 1.0 else f"{backend}@{scale:g}"
+
+    def locate(self, rgb: np.ndarray, escalate: bool = True) -> List[Location]:
+        """
+        Deteksi wajah
+
+        Args:
+            rgb: Gambar RGB uint8
+            escalate: False = hanya stage pertama (preview kamera)
+
+        Returns:
+            List (top, right, bottom, left) dalam koordinat gambar asli
+        """
+        stages = self.stages if escalate else self.stages[:1]
+        for stage in stages:
+            start = time.perf_counter()
+            locations = self._run_stage(rgb, *stage)
+            self._record(stage, bool(locations), (time.perf_counter() - start) * 1000)
+            if locations:
+                return locations
+        return []
+
+    def _run_stage(self, rgb: np.ndarray, backend: str, scale: float) -> List[Location]:
+        image = rgb
+        if scale < 1.0:
+            image = cv2.resize(rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        if backend == 'hog':
+            import face_recognition
+            locations = face_recognition.face_locations(image, model='hog')
+        else:
+            with self._heavy:
+                if backend == 'cnn':
+                    import face_recognition
+                    locations = face_recognition.face_locations(image, model='cnn')
+                else:
+                    locations = self._yunet_locations(image)
+
+        if scale < 1.0:
+            locations = self._rescale(locations, scale, rgb.shape)
+        return locations
+
+    def _yunet_locations(self, rgb: np.ndarray) -> List[Location]:
+        detector = getattr(self._yunet, 'detector', None)
+        if detector is None:
+            detector = cv2.FaceDetectorYN.create(self.yunet_model, "", (320, 320), self.yunet_score)
+            self._yunet.detector = detector
+        height, width = rgb.shape[:2]
+        detector.setInputSize((width, height))
+        # YuNet dilatih dengan input BGR
+        _, faces = detector.detect(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        if faces is None:
+            return []
+        # Urutkan dari score tertinggi, format (x, y, w, h, landmark..., score)
+        faces = faces[np.argsort(-faces[:, -1])]
+        locations = []
+        for x, y, w, h in faces[:, :4]:
+            top, left = max(0, int(y)), max(0, int(x))
+            bottom, right = min(height, int(y + h)), min(width, int(x + w))
+            if bottom > top and right > left:
+                locations.append((top, right, bottom, left))
+        return locations
+
+    @staticmethod
+    def _rescale(locations: List[Location], scale: float, shape: Tuple[int, ...]) -> List[Location]:
+        height, width = shape[:2]
+        return [
+            (max(0, int(top / scale)), min(width, int(right / scale)),
+             min(height, int(bottom / scale)), max(0, int(left / scale)))
+            for top, right, bottom, left in locations
+        ]
+
+    def _record(self, stage: Tuple[str, float], hit: bool, elapsed_ms: float) -> None:
+        with self._lock:
+            metrics = self._metrics[self._stage_name(stage)]
+            metrics['calls'] += 1
+            metrics['hits'] += 1 if hit else 0
+            metrics['total_ms'] += elapsed_ms
+
+    def metrics(self) -> Dict:
+        """Snapshot metrik per stage: jumlah panggilan, hit rate, latency rata-rata"""
+        with self._lock:
+            stages = {}
+            for name, m in self._metrics.items():
+                calls = m['calls']
+                stages[name] = {
+                    'calls': calls,
+                    'hits': m['hits'],
+                    'hit_rate': m['hits'] / calls if calls else 0.0,
+                    'avg_ms': m['total_ms'] / calls if calls else 0.0
+                }
+            return {'spec': self.spec, 'threads': self.threads, 'stages': stages}
@@ -0,0 +1,145 @@
+"""
+Face Gallery - data wajah yang dikenal dalam bentuk matriks numpy
+Bisa disimpan/dibaca sebagai snapshot .npz supaya startup tidak perlu
+membaca ulang semua file encoding, dan di-update per karyawan dari feed
+perubahan (apply_changes) tanpa membangun ulang seluruh gallery
+"""
+import json
+import os
+import tempfile
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+
+from face_templates import score_gallery
+
+
+class FaceGallery:
+    def __init__(self, data: Optional[List[Dict]] = None, samples: Optional[List[np.ndarray]] = None,
+                 quality: Optional[List[np.ndarray]] = None, centroids: Optional[np.ndarray] = None,
+                 version: Optional[str] = None):
+        """
+        Args:
+            data: Metadata per karyawan (id, nama, departemen, posisi, site_id)
+            samples: Sample encoding per karyawan, masing-masing (k, 128)
+            quality: Quality score per sample, sejajar dengan samples
+            centroids: Matriks centroid (N, 128), dihitung dari samples jika kosong
+            version: Version stamp database saat gallery dibangun
+        """
+        self.data = data or []
+        self.samples = samples or []
+        self.quality = quality or [np.ones(len(s)) for s in self.samples]
+        if centroids is None:
+            centroids = np.vstack([
+                np.average(s, axis=0, weights=q) for s, q in zip(self.samples, self.quality)
+            ]) if self.samples else np.empty((0, 128))
+        self.centroids = centroids
+        self.version = version
+
+    def __len__(self):
+        return len(self.data)
+
+    def score(self, encoding: np.ndarray, k: int = 2, max_distance: Optional[float] = None) -> List[Tuple[Dict, float]]:
+        """
+        Top-k karyawan terdekat, lihat score_gallery
+
+        Returns:
+            List (metadata karyawan, jarak) urut dari yang terdekat
+        """
+        candidates = score_gallery(encoding, self.centroids, self.samples, self.quality, k, max_distance)
+        return [(self.data[idx], distance) for idx, distance in candidates]
+
+    def supports_changes(self) -> bool:
+        """
+        True jika gallery bisa di-update incremental: version berupa nomor
+        feed karyawan_changes dan setiap entry menyimpan id karyawan
+        (snapshot lama dengan stamp "jumlah:id_terbesar" tidak)
+        """
+        return bool(self.version) and self.version.isdigit() and all('id' in meta for meta in self.data)
+
+    def apply_changes(self, changed_ids: Set[int], entries: List[Tuple[Dict, np.ndarray, np.ndarray]],
+                      version: str) -> 'FaceGallery':
+        """
+        Gallery baru dengan perubahan karyawan diterapkan
+
+        Karyawan yang tidak berubah memakai ulang samples dan centroid yang
+        sudah ada (gallery lama tidak diubah, jadi aman untuk thread yang
+        sedang mencocokkan dan untuk view mmap shared gallery).
+
+        Args:
+            changed_ids: Id karyawan yang berubah (ditambah, diubah, dihapus)
+            entries: Data terbaru karyawan yang masih ada, tuple (metadata, samples, quality)
+            version: Version feed setelah perubahan ini
+
+        Returns:
+            FaceGallery baru
+        """
+        keep = [i for i, meta in enumerate(self.data) if meta['id'] not in changed_ids]
+        centroids = [self.centroids[keep]] + [
+            np.average(samples, axis=0, weights=quality)[np.newaxis] for _, samples, quality in entries
+        ]
+        return FaceGallery(
+            data=[self.data[i] for i in keep] + [meta for meta, _, _ in entries],
+            samples=[self.samples[i] for i in keep] + [samples for _, samples, _ in entries],
+            quality=[self.quality[i] for i in keep] + [quality for _, _, quality in entries],
+            centroids=np.vstack(centroids),
+            version=version
+        )
+
+    def save_snapshot(self, path: str) -> None:
+        """Simpan gallery ke file .npz secara atomic (tulis tmp lalu rename)"""
+        counts = np.array([len(s) for s in self.samples], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        samples = np.vstack(self.samples) if self.samples else np.empty((0, 128))
+        quality = np.concatenate(self.quality) if self.quality else np.empty(0)
+
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.gallery_', suffix='.npz', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    version=np.array(self.version or ''),
+                    meta=np.array(json.dumps(self.data)),
+                    centroids=self.centroids,
+                    samples=samples,
+                    quality=quality,
+                    offsets=offsets
+                )
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load_snapshot(cls, path: str, expected_version: Optional[str] = None) -> Optional['FaceGallery']:
+        """
+        Baca snapshot .npz
+
+        Args:
+            path: Path file snapshot
+            expected_version: Jika diisi, snapshot dengan version berbeda diabaikan
+
+        Returns:
+            FaceGallery atau None jika snapshot tidak ada / tidak valid / usang
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as snapshot:
+                version = str(snapshot['version'])
+                if expected_version is not None and version != expected_version:
+                    return None
+                offsets = snapshot['offsets']
+                samples = snapshot['samples']
+                quality = snapshot['quality']
+                return cls(
+                    data=json.loads(str(snapshot['meta'])),
+                    samples=[samples[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)],
+                    quality=[quality[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)],
+                    centroids=snapshot['centroids'],
+                    version=version
+                )
+        except Exception as e:
+            print(f"Ignoring invalid gallery snapshot {path}: {e}")
+            return None
@@ -4,34 +4,244 @@ Core functions untuk face recognition tanpa kode UI/Tkinter
 """
 import cv2
 import os
-import face_recognition
 import datetime
+import hashlib
 import json
+import re
+import shutil
+import threading
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional, List, Dict, Tuple
 from desktop_database_config import DesktopDatabaseConfig
+from face_dedup import DUPLICATE_DISTANCE, find_duplicates
+from face_detector import FaceDetector
+from face_gallery import FaceGallery
+from gallery_feed import GalleryListener, gallery_listen_enabled
+from frames import FaceCrop, Frame, as_frame
+from liveness import LivenessChecker
+from local_store import LocalStore, Replicator, local_store_enabled
+from match_policy import DistanceLog, MatchThresholds, ThresholdConfig
+from request_profiler import RequestProfiler, annotate, stage
+from shared_gallery import SharedGallery
+from fast_json import json_agg_sql, rows_to_dicts
+from face_templates import (
+    EMBEDDING_MODEL_VERSION, EMBEDDING_SIZE, build_face_template,
+    face_quality, load_face_template, parse_face_template, template_distance
+)
 from werkzeug.security import generate_password_hash
 
+GALLERY_SNAPSHOT = "gallery_snapshot.npz"
+# Snapshot ditulis ulang setelah sekian perubahan incremental, supaya
+# startup berikutnya tidak perlu menerapkan feed yang panjang
+SNAPSHOT_EVERY_CHANGES = 100
+DISTANCE_LOG = "match_distances.jsonl"
+# Margin (px) di sekitar box wajah pada JPEG bukti absensi
+EVIDENCE_MARGIN = 20
+
+# Jumlah kandidat yang diskor per check-in (>= 2 untuk aturan margin)
+SCORE_TOP_K = 5
+
+# Partisi default: satu tenant, satu site
+DEFAULT_TENANT = "default"
+DEFAULT_SITE = "default"
+
+_face_recognition = None
+_worker_detector = None
+
+
+def _fr():
+    """
+    Import face_recognition saat pertama kali dibutuhkan.
+    Import modul ini langsung memuat model dlib (beberapa detik), jadi
+    startup service tidak perlu menunggunya.
+    """
+    global _face_recognition
+    if _face_recognition is None:
+        import face_recognition
+        _face_recognition = face_recognition
+    return _face_recognition
+
+
+def _encode_face(frame: Frame, face_location) -> Tuple[Optional[np.ndarray], FaceCrop]:
+    """
+    Landmark + encoding satu wajah dihitung pada crop-nya saja, bukan frame penuh
+
+    Returns:
+        Tuple (encoding atau None, FaceCrop untuk liveness/quality/bukti)
+    """
+    crop = FaceCrop(frame, face_location)
+    encodings = _fr().face_encodings(crop.rgb(), [crop.location])
+    return (encodings[0] if encodings else None), crop
+
+
+def _encode_enrollment_photos(task: Tuple[int, List[str], str]) -> Tuple[int, Optional[Dict], Optional[str], Optional[str]]:
+    """
+    Worker untuk bulk enrollment: deteksi + encoding wajah dan hash password.
+    Dijalankan di process terpisah, jadi tidak boleh menyentuh koneksi database.
+
+    Returns:
+        Tuple (index, template, password_hash, error)
+    """
+    global _worker_detector
+    index, image_paths, password = task
+    encodings, qualities = [], []
+    try:
+        if _worker_detector is None:
+            _worker_detector = FaceDetector()
+        for image_path in image_paths:
+            # cv2.imread (via as_frame) menerapkan EXIF orientation, sama
+            # dengan jalur register_employee; load_image_file tidak
+            frame = as_frame(image_path)
+            try:
+                face_locations = _worker_detector.locate(frame.rgb())
+                if len(face_locations) != 1:
+                    continue
+                encoding, crop = _encode_face(frame, face_locations[0])
+                if encoding is None:
+                    continue
+                encodings.append(encoding)
+                qualities.append(face_quality(crop.rgb(), crop.location))
+            finally:
+                frame.release()
+    except Exception as e:
+        return index, None, None, f"Cannot process image: {str(e)}"
+
+    if not encodings:
+        return index, None, None, "No single face detected in image(s)"
+    return index, build_face_template(encodings, qualities), generate_password_hash(password), None
+
 
 class FaceRecognitionService:
-    def __init__(self):
-        """Initialize face recognition service"""
+    # CREATE TABLE IF NOT EXISTS cukup sekali per process
+    _tables_ready = False
+
+    def __init__(self, tenant_id: Optional[str] = None, site_id: Optional[str] = None,
+                 fallback_global: Optional[bool] = None):
+        """
+        Initialize face recognition service
+
+        Args:
+            tenant_id: Tenant (perusahaan), default env TENANT_ID
+            site_id: Site/plant kiosk atau API ini, default env SITE_ID.
+                Gallery yang di-load dan dicari hanya karyawan site ini.
+            fallback_global: Jika wajah tidak dikenali di site ini, cari ke
+                seluruh site dalam tenant (default env SITE_FALLBACK_GLOBAL)
+        """
+        self.tenant_id = tenant_id or os.getenv('TENANT_ID', DEFAULT_TENANT)
+        self.site_id = site_id or os.getenv('SITE_ID', DEFAULT_SITE)
+        if fallback_global is None:
+            fallback_global = os.getenv('SITE_FALLBACK_GLOBAL', 'false').lower() in ('1', 'true', 'yes')
+        self.fallback_global = fallback_global
+
         # Inisialisasi direktori
         self.data_dir = "data_wajah"
         self.log_dir = "log_absensi"
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.log_dir, exist_ok=True)
+        self.snapshot_path = self._snapshot_path(self.site_id)
         
+        # Kiosk local-first (LOCAL_STORE=true): check-in dicatat di SQLite lokal
+        # dan dikirim ke PostgreSQL oleh replicator, gallery dari salinan lokal
+        self.local_store = LocalStore() if local_store_enabled() else None
+        self.replicator = None
+
         # Inisialisasi database
-        self.conn, self.db_type = DesktopDatabaseConfig.get_connection()
-        DesktopDatabaseConfig.init_tables(self.conn, self.db_type)
+        try:
+            self.conn, self.db_type = DesktopDatabaseConfig.get_connection()
+        except RuntimeError as e:
+            if self.local_store is None:
+                raise
+            print(f"⚠️ {e}; kiosk berjalan offline dari local store")
+            self.conn, self.db_type = None, 'postgresql'
+        if self.conn is not None and not FaceRecognitionService._tables_ready:
+            DesktopDatabaseConfig.init_tables(self.conn, self.db_type)
+            FaceRecognitionService._tables_ready = True
         
+        # Pre-check anti-spoofing sebelum encoding (LIVENESS_MODE=texture, default off)
+        self.liveness = LivenessChecker()
+        # Backend deteksi wajah (FACE_DETECTOR=auto: HOG kecil dulu, eskalasi jika gagal)
+        self.detector = FaceDetector()
+        self.thresholds = ThresholdConfig.load()
+        distance_log = os.getenv('MATCH_DISTANCE_LOG', os.path.join(self.log_dir, DISTANCE_LOG))
+        self.distance_log = DistanceLog(distance_log) if distance_log != 'off' else None
+        # Endpoint list besar mengambil array JSON jadi dari PostgreSQL (json_agg)
+        self.json_passthrough = os.getenv('PG_JSON_PASSTHROUGH', 'false').lower() in ('1', 'true', 'yes')
+        # Wajah baru sedekat ini dengan karyawan lain ditandai sebagai duplikat
+        self.duplicate_distance = float(os.getenv('ENROLL_DUPLICATE_DISTANCE', DUPLICATE_DISTANCE))
+        # Profil check-in lambat / sampling (PROFILE_SAMPLE_RATE, PROFILE_SLOW_MS), dipakai juga api_server
+        self.profiler = RequestProfiler.from_env()
+
         # Face recognition data
-        self.known_face_encodings = []
-        self.known_face_data = []
+        # SHARED_GALLERY_DIR aktif: gallery di-mmap bersama antar worker gunicorn
+        self.gallery = FaceGallery()
+        self.global_gallery = FaceGallery()
+        # Listener feed, replicator, reload API dan UI bisa memanggil load bersamaan
+        self._gallery_lock = threading.Lock()
+        self._unsaved_changes = {}
+        self.gallery_listener = None
+        shared_dir = os.getenv('SHARED_GALLERY_DIR')
+        self.shared_gallery = SharedGallery(
+            os.path.join(shared_dir, self.tenant_id, self.site_id)
+        ) if shared_dir else None
+
+        if self.local_store is not None:
+            self.replicator = Replicator(self.local_store, self.tenant_id, self.site_id,
+                                         on_gallery_change=self.load_known_faces)
+            if self.conn is not None:
+                try:
+                    # Salinan gallery lokal diperbarui dulu sebelum load pertama
+                    self.replicator.pull()
+                except Exception as e:
+                    print(f"⚠️ Gallery lokal tidak bisa diperbarui: {e}")
         self.load_known_faces()
+        if self.replicator is not None:
+            self.replicator.start()
+        if gallery_listen_enabled():
+            # NOTIFY dari trigger karyawan_changes: mode kiosk lewat replicator
+            # (salinan lokal dulu), selain itu langsung update gallery
+            on_change = self.replicator.sync_now if self.replicator is not None else self.load_known_faces
+            self.gallery_listener = GalleryListener(self.tenant_id, self.site_id, on_change)
+            self.gallery_listener.start()
+
+    def _snapshot_path(self, site_id: Optional[str]) -> str:
+        """Path snapshot per partisi; site_id None = seluruh tenant"""
+        name, ext = os.path.splitext(GALLERY_SNAPSHOT)
+        return os.path.join(self.data_dir, f"{name}_{self.tenant_id}_{site_id or 'all'}{ext}")
+
+    def _employee_file(self, username: str, suffix: str) -> str:
+        """
+        Path file karyawan (foto / encoding) per tenant + username. Nama
+        tampilan bisa kembar, jadi tidak dipakai sebagai nama file; hash
+        membedakan username yang sama setelah karakter asing diganti `_`.
+        """
+        safe = re.sub(r'[^A-Za-z0-9_-]', '_', username)[:64]
+        digest = hashlib.sha1(f"{self.tenant_id}/{username}".encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.data_dir, f"{self.tenant_id}_{safe}_{digest}{suffix}")
+
+    def _partition_filter(self, site_id: Optional[str]) -> Tuple[str, tuple]:
+        """Klausa WHERE untuk partisi gallery; site_id None = seluruh tenant"""
+        if site_id is None:
+            return "tenant_id = %s", (self.tenant_id,)
+        return "tenant_id = %s AND site_id = %s", (self.tenant_id, site_id)
+
+    @property
+    def match_thresholds(self) -> MatchThresholds:
+        """Threshold (tolerance + margin) untuk site service ini"""
+        return self.thresholds.for_site(self.site_id)
+
+    @property
+    def known_face_encodings(self) -> List[np.ndarray]:
+        """Centroid encoding per karyawan (kompatibilitas kode lama)"""
+        return list(self.gallery.centroids)
+
+    @property
+    def known_face_data(self) -> List[Dict]:
+        """Metadata per karyawan, sejajar dengan known_face_encodings"""
+        return self.gallery.data
     
-    def register_employee(self, name: str, departemen: str, posisi: str, image_data, username, password) -> Dict:
+    def register_employee(self, name: str, departemen: str, posisi: str, image_data, username, password,
+                          allow_duplicate: bool = False) -> Dict:
         """
         Register employee dengan wajah baru
         
@@ -39,340 +249,994 @@ class FaceRecognitionService:
             name: Nama karyawan
             departemen: Departemen karyawan
             posisi: Posisi karyawan
-            image_data: Data gambar (numpy array atau path file)
+            image_data: Data gambar (Frame, numpy array BGR atau path file),
+                atau list beberapa gambar untuk template multi-sample
+            allow_duplicate: Tetap daftarkan meskipun wajah mirip karyawan lain
             
         Returns:
-            Dict dengan status dan message
+            Dict dengan status ('success' | 'duplicate' | 'error') dan message
         """
+        images = image_data if isinstance(image_data, (list, tuple)) else [image_data]
+        frames, owned = [], []
         try:
-            # Convert image data ke numpy array jika diperlukan
-            if isinstance(image_data, str):
-                # Jika path file
-                frame = cv2.imread(image_data)
-            elif isinstance(image_data, np.ndarray):
-                # Jika numpy array
-                frame = image_data
-            else:
+            for image in images:
+                try:
+                    frame = as_frame(image)
+                except ValueError as e:
+                    return {"status": "error", "message": str(e)}
+                frames.append(frame)
+                if frame is not image:
+                    owned.append(frame)
+
+            if not frames:
                 return {"status": "error", "message": "Invalid image format"}
-            
-            if frame is None:
-                return {"status": "error", "message": "Cannot read image"}
-            
-            # Simpan JPG dengan nama karyawan
-            jpg_filename = os.path.join(self.data_dir, f"{name}.jpg")
-            cv2.imwrite(jpg_filename, frame)
 
-            # Deteksi wajah
-            face_locations = face_recognition.face_locations(frame)
-            if len(face_locations) == 0:
+            # Deteksi wajah per sample, frame tanpa wajah dilewati
+            encodings, qualities = [], []
+            for frame in frames:
+                rgb = frame.rgb()
+                face_locations = self.detector.locate(rgb)
+                if len(face_locations) == 0:
+                    continue
+                encoding, crop = _encode_face(frame, face_locations[0])
+                if encoding is None:
+                    continue
+                encodings.append(encoding)
+                qualities.append(face_quality(crop.rgb(), crop.location))
+
+            if len(encodings) == 0:
                 return {"status": "error", "message": "No face detected in image"}
+            if self.conn is None:
+                return {"status": "error", "message": "Pendaftaran butuh koneksi ke database server"}
+
+            template = build_face_template(encodings, qualities)
+            if not allow_duplicate:
+                similar = self.find_similar_faces(template)
+                if similar:
+                    names = ', '.join(f"{match['nama']} ({match['distance']:.2f})" for match in similar)
+                    return {
+                        "status": "duplicate",
+                        "message": f"Wajah mirip karyawan terdaftar: {names}",
+                        "data": {"matches": similar}
+                    }
 
-            face_encodings = face_recognition.face_encodings(frame, face_locations)
-            if len(face_encodings) == 0:
-                return {"status": "error", "message": "Face encoding failed"}
+            # Simpan JPG per username (sample pertama)
+            jpg_filename = self._employee_file(username, ".jpg")
+            cv2.imwrite(jpg_filename, frames[0].bgr())
 
-            encoding = face_encodings[0]
-            encoding_path = os.path.join(self.data_dir, f"{name}_encoding.json")
+            encoding_path = self._employee_file(username, "_encoding.json")
             with open(encoding_path, 'w') as f:
-                json.dump(encoding.tolist(), f)
+                json.dump(template, f)
 
             password_hash = generate_password_hash(password)
 
             cursor = self.conn.cursor()
             cursor.execute('''
-                INSERT INTO karyawan (nama, departemen, posisi, face_encoding_path, username, password_hash)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (name, departemen, posisi, encoding_path, username, password_hash))
+                INSERT INTO karyawan (nama, departemen, posisi, face_encoding_path, username, password_hash,
+                                      tenant_id, site_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ''', (name, departemen, posisi, encoding_path, username, password_hash, self.tenant_id, self.site_id))
             self.conn.commit()
-            self.load_known_faces()
-            return {"status": "success", "message": f"Employee {name} registered successfully"}
+            if self.replicator is not None:
+                # Gallery kiosk dibaca dari salinan lokal: tarik dulu (memanggil load_known_faces)
+                try:
+                    self.replicator.pull()
+                except Exception as e:
+                    print(f"⚠️ Gallery lokal belum diperbarui, dicoba lagi oleh replicator: {e}")
+            else:
+                self.load_known_faces()
+            return {
+                "status": "success",
+                "message": f"Employee {name} registered successfully",
+                "data": {"samples": len(encodings), "submitted": len(frames)}
+            }
         except Exception as e:
             return {"status": "error", "message": f"Registration failed: {str(e)}"}
+        finally:
+            for frame in owned:
+                frame.release()
     
-    def do_absensi(self, image_data, username=None) -> Dict:
+    def find_similar_faces(self, template: Dict, k: int = 3) -> List[Dict]:
+        """
+        Nearest-neighbour template baru ke gallery seluruh tenant
+
+        Jarak = sample terdekat antar kedua template (find_duplicates), sama
+        dengan cek duplikat bulk enrollment, jadi satu pasangan wajah diberi
+        keputusan yang sama di kedua jalur.
+
+        Args:
+            template: Template hasil build_face_template
+            k: Jumlah tetangga terdekat yang dikembalikan
+
+        Returns:
+            Karyawan dengan jarak <= duplicate_distance, urut dari yang terdekat
+        """
+        samples, _, centroid = parse_face_template(template)
+        self.load_global_faces()
+        gallery = self.global_gallery
+        pairs = find_duplicates(centroid[None, :], [samples], gallery.centroids, gallery.samples,
+                                threshold=self.duplicate_distance)
+        return [
+            dict({key: gallery.data[j].get(key) for key in ('nama', 'departemen', 'posisi', 'site_id')},
+                 distance=distance)
+            for _, j, distance in sorted(pairs, key=lambda pair: pair[2])[:k]
+        ]
+
+    def register_employees_bulk(self, records: List[Dict], workers: Optional[int] = None,
+                                batch_size: int = 500, allow_duplicates: bool = False) -> List[Dict]:
+        """
+        Register banyak karyawan sekaligus (onboarding site baru)
+
+        Deteksi + encoding wajah dijalankan paralel di beberapa process,
+        insert ke database dilakukan per batch dengan execute_values, dan
+        known faces hanya di-load sekali di akhir.
+
+        Args:
+            records: List dict dengan key nama, departemen, posisi, username,
+                password dan image_path (satu path atau list path untuk
+                template multi-sample); site_id optional (default site service).
+                Record dengan key `error` (mis. dari load_metadata) langsung
+                dilaporkan gagal dengan pesan tersebut
+            workers: Jumlah process encoding (default: jumlah CPU)
+            batch_size: Jumlah baris per INSERT
+            allow_duplicates: Jangan tolak wajah yang mirip karyawan lain
+                (di gallery maupun di dalam batch)
+
+        Returns:
+            List report per baris (row, nama, username, status, message)
+        """
+        from psycopg2.extras import execute_values
+
+        report = [
+            {
+                "row": i + 1,
+                "nama": rec.get("nama"),
+                "username": rec.get("username"),
+                "status": "error",
+                "message": None
+            }
+            for i, rec in enumerate(records)
+        ]
+
+        # Validasi metadata sebelum pekerjaan berat dimulai
+        required_fields = ['nama', 'departemen', 'posisi', 'username', 'password', 'image_path']
+        seen_usernames = set()
+        tasks = []
+        for i, rec in enumerate(records):
+            if rec.get('error'):
+                report[i]["message"] = rec['error']
+                continue
+            missing = [field for field in required_fields if not rec.get(field)]
+            if missing:
+                report[i]["message"] = f"Missing field(s): {', '.join(missing)}"
+                continue
+            if rec['username'] in seen_usernames:
+                report[i]["message"] = f"Duplicate username in batch: {rec['username']}"
+                continue
+            image_paths = rec['image_path'] if isinstance(rec['image_path'], (list, tuple)) else [rec['image_path']]
+            missing_images = [path for path in image_paths if not os.path.exists(path)]
+            if missing_images:
+                report[i]["message"] = f"Image not found: {', '.join(missing_images)}"
+                continue
+            seen_usernames.add(rec['username'])
+            tasks.append((i, list(image_paths), rec['password']))
+
+        # Encoding paralel
+        encoded = {}
+        if tasks:
+            chunksize = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for index, template, password_hash, error in executor.map(
+                        _encode_enrollment_photos, tasks, chunksize=chunksize):
+                    if error:
+                        report[index]["message"] = error
+                    else:
+                        encoded[index] = (template, password_hash)
+
+        if encoded and not allow_duplicates:
+            self._flag_bulk_duplicates(records, encoded, report)
+
+        # Insert ke database per batch
+        pending = sorted(encoded)
+        cursor = self.conn.cursor()
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            rows = []
+            for index in batch:
+                rec = records[index]
+                encoding_path = self._employee_file(rec['username'], "_encoding.json")
+                rows.append((rec['nama'], rec['departemen'], rec['posisi'],
+                             encoding_path, rec['username'], encoded[index][1],
+                             self.tenant_id, rec.get('site_id') or self.site_id))
+            try:
+                inserted = execute_values(cursor, '''
+                    INSERT INTO karyawan (nama, departemen, posisi, face_encoding_path, username, password_hash,
+                                          tenant_id, site_id)
+                    VALUES %s
+                    ON CONFLICT (username) DO NOTHING
+                    RETURNING username
+                ''', rows, page_size=batch_size, fetch=True)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                for index in batch:
+                    report[index]["message"] = f"Database insert failed: {str(e)}"
+                continue
+
+            inserted_usernames = {row[0] for row in inserted}
+            for index, row in zip(batch, rows):
+                rec = records[index]
+                if rec['username'] not in inserted_usernames:
+                    report[index]["message"] = f"Username {rec['username']} already exists"
+                    continue
+                # File encoding + foto hanya ditulis untuk baris yang masuk database
+                with open(row[3], 'w') as f:
+                    json.dump(encoded[index][0], f)
+                first_image = rec['image_path'][0] if isinstance(rec['image_path'], (list, tuple)) else rec['image_path']
+                shutil.copyfile(first_image, self._employee_file(rec['username'], ".jpg"))
+                report[index]["status"] = "success"
+                report[index]["message"] = f"Employee {rec['nama']} registered successfully"
+
+        if encoded:
+            self.load_known_faces()
+        return report
+
+    def _flag_bulk_duplicates(self, records: List[Dict], encoded: Dict, report: List[Dict]) -> None:
+        """
+        Tandai baris bulk yang wajahnya mirip karyawan terdaftar atau baris
+        lain di batch yang sama; baris tersebut dikeluarkan dari `encoded`
+        """
+        indexes = sorted(encoded)
+        parsed = [parse_face_template(encoded[index][0]) for index in indexes]
+        samples = [p[0] for p in parsed]
+        centroids = np.vstack([p[2] for p in parsed])
+
+        self.load_global_faces()
+        gallery = self.global_gallery
+        flagged = {}
+        for i, j, distance in find_duplicates(centroids, samples, gallery.centroids, gallery.samples,
+                                              threshold=self.duplicate_distance):
+            if i not in flagged or distance < flagged[i][1]:
+                flagged[i] = (gallery.data[j]['nama'], distance)
+        # Di dalam batch: baris yang lebih awal dipertahankan
+        for i, j, distance in find_duplicates(centroids, samples, threshold=self.duplicate_distance):
+            if i not in flagged and j not in flagged:
+                flagged[j] = (records[indexes[i]]['nama'], distance)
+
+        for i, (nama, distance) in flagged.items():
+            index = indexes[i]
+            report[index]["status"] = "duplicate"
+            report[index]["message"] = f"Wajah mirip {nama} ({distance:.2f})"
+            del encoded[index]
+
+    def _load_user_template(self, username: str):
+        """
+        Ambil data + template wajah satu user (mode API/Flutter)
+
+        Returns:
+            Tuple (employee dict, samples, quality) atau None jika user tidak ada
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT face_encoding_path, nama, departemen, posisi FROM karyawan WHERE username = %s AND tenant_id = %s",
+            (username, self.tenant_id)
+        )
+        user = cursor.fetchone()
+        if not user:
+            return None
+        encoding_path, nama, departemen, posisi = user
+        samples, quality, _ = load_face_template(encoding_path)
+        return {'nama': nama, 'departemen': departemen, 'posisi': posisi}, samples, quality
+
+    def _identify(self, frame: Frame, user_template=None, motion=None):
+        """
+        Deteksi + encoding wajah lalu cocokkan
+
+        Args:
+            frame: Gambar (Frame, diproses dalam RGB)
+            user_template: Hasil _load_user_template untuk mode API; None untuk
+                mode desktop (cocokkan ke seluruh gallery)
+            motion: MotionLivenessTracker dari stream kamera desktop (optional)
+
+        Returns:
+            Tuple (employee dict, FaceCrop wajah untuk bukti, error message)
+        """
+        rgb = frame.rgb()
+        annotate(height=rgb.shape[0], width=rgb.shape[1])
+        # Satu-satunya tahap yang bekerja di frame penuh
+        with stage('detect'):
+            face_locations = self.detector.locate(rgb)
+        annotate(faces=len(face_locations))
+        if len(face_locations) == 0:
+            return None, None, 'No face detected'
+
+        with stage('crop'):
+            crop = FaceCrop(frame, face_locations[0])
+        annotate(crop_height=crop.shape[0], crop_width=crop.shape[1])
+
+        # Liveness murah dulu, encoding (mahal) hanya untuk input yang lolos
+        if self.liveness.enabled:
+            with stage('liveness'):
+                liveness = self.liveness.check(crop.rgb(), crop.location, motion=motion)
+            if not liveness.live:
+                return None, None, f'Liveness check failed ({liveness.reason})'
+
+        with stage('encode'):
+            face_encodings = _fr().face_encodings(crop.rgb(), [crop.location])
+        if len(face_encodings) == 0:
+            return None, None, 'Face encoding failed'
+
+        if user_template is not None:
+            # ABSENSI API/FLUTTER: hanya cocokkan dengan user ini
+            with stage('verify'):
+                verified = self._verify_user(face_encodings[0], user_template)
+            if not verified:
+                return None, None, 'Wajah tidak cocok dengan akun ini'
+            return user_template[0], crop, None
+
+        # ABSENSI DESKTOP: top-k seluruh gallery site, lalu aturan tolerance + margin
+        with stage('match'):
+            match, reason = self._identify_encoding(face_encodings[0])
+        if match is None:
+            if reason == 'ambiguous':
+                return None, None, 'Wajah mirip lebih dari satu karyawan, coba lagi'
+            return None, None, 'Wajah tidak dikenali'
+        return match, crop, None
+
+    def score_face(self, encoding, k: int = SCORE_TOP_K, all_sites: bool = False) -> List[Dict]:
+        """
+        Skor top-k karyawan terdekat untuk satu encoding (satu pass vectorized)
+
+        Args:
+            encoding: Encoding wajah (128,)
+            k: Jumlah kandidat
+            all_sites: Skor ke gallery seluruh tenant, bukan hanya site service
+
+        Returns:
+            List metadata karyawan + 'distance', urut dari yang terdekat
+        """
+        if all_sites:
+            self.load_global_faces()
+            gallery = self.global_gallery
+        else:
+            self.load_known_faces()
+            gallery = self.gallery
+        encoding = np.asarray(encoding, dtype=np.float64)
+        return [dict(meta, distance=distance) for meta, distance in gallery.score(encoding, k=k)]
+
+    def _identify_encoding(self, encoding) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Identifikasi 1:N dengan threshold site; fallback ke seluruh tenant
+        hanya jika tidak ada kandidat di bawah tolerance (bukan saat ambigu)
+
+        Returns:
+            Tuple (metadata karyawan atau None, alasan penolakan)
+        """
+        thresholds = self.match_thresholds
+        candidates = self.score_face(encoding)
+        accepted, reason = thresholds.decide([c['distance'] for c in candidates])
+        if not accepted and reason != 'ambiguous' and self.fallback_global:
+            # Karyawan site lain yang sedang berkunjung
+            candidates = self.score_face(encoding, all_sites=True)
+            accepted, reason = thresholds.decide([c['distance'] for c in candidates])
+        self._log_distances('1:N', candidates, accepted, reason)
+        if not accepted:
+            return None, reason
+        match = dict(candidates[0])
+        match.pop('distance')
+        return match, None
+
+    def _verify_user(self, encoding, user_template) -> bool:
+        """Verifikasi 1:1 encoding terhadap template user (tolerance site)"""
+        employee, samples, quality = user_template
+        distance = template_distance(encoding, samples, quality)
+        accepted, reason = self.match_thresholds.decide([distance])
+        self._log_distances('1:1', [dict(employee, distance=distance)], accepted, reason)
+        return accepted
+
+    def _log_distances(self, mode: str, candidates: List[Dict], accepted: bool, reason: Optional[str]) -> None:
+        if self.distance_log is not None:
+            self.distance_log.record(
+                self.site_id, mode, [(c['nama'], c['distance']) for c in candidates], accepted, reason
+            )
+
+    def _save_evidence(self, crop: FaceCrop, nama: str, when: datetime.datetime,
+                       suffix: str = '') -> Tuple[str, str]:
+        """
+        Simpan wajah (margin EVIDENCE_MARGIN px) dari crop yang sama dengan
+        yang di-encode sebagai bukti absensi, dikonversi ke BGR di buffer crop
+
+        Returns:
+            Tuple (local_path, rel_path untuk kolom path_gambar)
+        """
+        filename = f"{nama}_{when.strftime('%Y-%m-%d')}_{when.strftime('%H-%M-%S')}{suffix}.jpg"
+        local_path = os.path.join(self.log_dir, filename)
+        cv2.imwrite(local_path, crop.bgr(EVIDENCE_MARGIN))
+        return local_path, f"images/{filename}"
+
+    def do_absensi(self, image_data, username=None, motion=None) -> Dict:
         """
         Lakukan absensi berdasarkan gambar wajah
         
         Args:
-            image_data: Data gambar (numpy array atau path file)
+            image_data: Frame, numpy array BGR (frame kamera) atau path file
+            username: Username (mode API), None untuk mode desktop
+            motion: MotionLivenessTracker stream kamera desktop (optional)
             
         Returns:
             Dict dengan hasil absensi
         """
+        # Di API server profil sudah dimulai per request; di desktop per panggilan
+        profile = self.profiler.begin('do_absensi') if self.profiler.enabled else None
+        result = None
         try:
-            face_locations = face_recognition.face_locations(image_data)
-            if len(face_locations) == 0:
-                return {'status': 'error', 'message': 'No face detected'}
-
-            face_encodings = face_recognition.face_encodings(image_data, face_locations)
-            if len(face_encodings) == 0:
-                return {'status': 'error', 'message': 'Face encoding failed'}
-                    
-            # Ambil lokasi wajah pertama
-
-            top, right, bottom, left = face_locations[0]
+            result = self._do_absensi(image_data, username, motion)
+            return result
+        finally:
+            self.profiler.end(profile, status=result.get('status') if result else 'exception')
 
+    def _do_absensi(self, image_data, username, motion) -> Dict:
+        frame = None
+        try:
+            with stage('decode'):
+                frame = as_frame(image_data)
+            user_template = None
             if username:
-                # ABSENSI API/FLUTTER: hanya cocokkan dengan user ini
-                cursor = self.conn.cursor()
-                cursor.execute("SELECT face_encoding_path, nama, departemen, posisi FROM karyawan WHERE username = %s", (username,))
-                user = cursor.fetchone()
-                if not user:
+                with stage('user_template'):
+                    user_template = self._load_user_template(username)
+                if user_template is None:
                     return {'status': 'error', 'message': 'User not found'}
-                encoding_path, nama, departemen, posisi = user
-                with open(encoding_path, 'r') as f:
-                    encoding = np.array(json.load(f))
-                matches = face_recognition.compare_faces([encoding], face_encodings[0], tolerance=0.45)
-                if not matches[0]:
-                    return {'status': 'error', 'message': 'Wajah tidak cocok dengan akun ini'}
-            else:
-                # ABSENSI DESKTOP: cocokkan dengan semua encoding
-                self.load_known_faces()
-                matches = face_recognition.compare_faces(
-                    [np.array(enc) for enc in self.known_face_encodings], face_encodings[0], tolerance=0.45
-                )
-                if True not in matches:
-                    return {'status': 'error', 'message': 'Wajah tidak dikenali'}
-                idx = matches.index(True)
-                nama = self.known_face_data[idx]['nama']
-                departemen = self.known_face_data[idx]['departemen']
-                posisi = self.known_face_data[idx]['posisi']
+
+            employee, crop, error = self._identify(frame, user_template, motion=motion)
+            if error:
+                return {'status': 'error', 'message': error}
+            nama = employee['nama']
 
             # Generate timestamp
             now = datetime.datetime.now()
-            tanggal = now.strftime("%Y-%m-%d")
-            jam = now.strftime("%H:%M:%S")
             
             # Simpan gambar absensi
-            margin = 20
-            height, width = image_data.shape[:2]
-            top = max(0, top - margin)
-            right = min(width, right + margin)
-            bottom = min(height, bottom + margin)
-            left = max(0, left - margin)
-            
-            face_image = image_data[top:bottom, left:right]
-            
-            filename = f"{nama}_{tanggal}_{now.strftime('%H-%M-%S')}.jpg"
-            local_path = os.path.join(self.log_dir, filename)
-            cv2.imwrite(local_path, face_image)
-            rel_path = f"images/{filename}"
+            with stage('evidence'):
+                local_path, rel_path = self._save_evidence(crop, nama, now)
             
             # Simpan ke database
+            with stage('record'):
+                return self._record_attendance(employee, now, local_path, rel_path)
+            
+        except Exception as e:
+            return {"status": "error", "message": f"Attendance failed: {str(e)}"}
+        finally:
+            if frame is not None and frame is not image_data:
+                frame.release()
+
+    def _record_attendance(self, employee: Dict, when: datetime.datetime,
+                           local_path: Optional[str], rel_path: Optional[str]) -> Dict:
+        """Insert satu baris log_absensi dan bentuk response sukses"""
+        nama = employee['nama']
+        departemen = employee['departemen']
+        posisi = employee['posisi']
+        tanggal = when.strftime("%Y-%m-%d")
+        jam = when.strftime("%H:%M:%S")
+
+        if self.local_store is not None:
+            # Local-first: commit ke disk lokal, replicator yang mengirim ke server
+            self.local_store.record(nama, departemen, posisi, tanggal, jam, rel_path, self.tenant_id, self.site_id)
+        else:
             cursor = self.conn.cursor()
             cursor.execute('''
-                INSERT INTO log_absensi (nama, departemen, posisi, tanggal, jam, path_gambar)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                INSERT INTO log_absensi (nama, departemen, posisi, tanggal, jam, path_gambar, tenant_id, site_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             ''', (
-                nama, 
-                departemen, 
-                posisi, 
-                tanggal, 
-                jam, 
-                rel_path
+                nama,
+                departemen,
+                posisi,
+                tanggal,
+                jam,
+                rel_path,
+                self.tenant_id,
+                self.site_id
             ))
-            
+
             self.conn.commit()
-            
-            return {
-                "status": "success",
-                "message": f"Attendance recorded for {nama}",
-                "data": {
-                    "nama": nama,
-                    "departemen": departemen,
-                    "posisi": posisi,
-                    "tanggal": tanggal,
-                    "jam": jam,
-                    "image_path": local_path
-                }
+
+        return {
+            "status": "success",
+            "message": f"Attendance recorded for {nama}",
+            "data": {
+                "nama": nama,
+                "departemen": departemen,
+                "posisi": posisi,
+                "tanggal": tanggal,
+                "jam": jam,
+                "image_path": local_path
             }
-            
+        }
+
+    def do_absensi_embedding(self, embedding, username: str, model_version: str,
+                             thumbnail: Optional[bytes] = None) -> Dict:
+        """
+        Absensi dengan embedding yang dihitung di device (tanpa deteksi di server)
+
+        Server hanya mengecek jarak ke template user dan mencatat log.
+
+        Args:
+            embedding: List 128 float hasil model on-device
+            username: Username dari JWT
+            model_version: Identitas model yang menghasilkan embedding
+            thumbnail: JPEG kecil (bytes) untuk audit, optional
+
+        Returns:
+            Dict dengan hasil absensi
+        """
+        try:
+            if model_version != EMBEDDING_MODEL_VERSION:
+                return {
+                    'status': 'error',
+                    'message': f'Unsupported embedding model {model_version!r}, expected {EMBEDDING_MODEL_VERSION!r}'
+                }
+            encoding = np.asarray(embedding, dtype=np.float64)
+            if encoding.shape != (EMBEDDING_SIZE,) or not np.all(np.isfinite(encoding)):
+                return {'status': 'error', 'message': f'Embedding must be {EMBEDDING_SIZE} finite numbers'}
+
+            user_template = self._load_user_template(username)
+            if user_template is None:
+                return {'status': 'error', 'message': 'User not found'}
+            employee = user_template[0]
+            if not self._verify_user(encoding, user_template):
+                return {'status': 'error', 'message': 'Wajah tidak cocok dengan akun ini'}
+
+            now = datetime.datetime.now()
+            local_path = rel_path = None
+            if thumbnail:
+                # Thumbnail disimpan apa adanya, tidak di-decode ulang
+                filename = f"{employee['nama']}_{now.strftime('%Y-%m-%d')}_{now.strftime('%H-%M-%S')}_thumb.jpg"
+                local_path = os.path.join(self.log_dir, filename)
+                with open(local_path, 'wb') as f:
+                    f.write(thumbnail)
+                rel_path = f"images/{filename}"
+
+            return self._record_attendance(employee, now, local_path, rel_path)
+
         except Exception as e:
             return {"status": "error", "message": f"Attendance failed: {str(e)}"}
+
+    def do_absensi_batch(self, items: List[Dict], username: str) -> List[Dict]:
+        """
+        Sinkronisasi banyak absensi offline sekaligus (mode API/Flutter)
+
+        Idempotent lewat client_id (unik per tenant): item yang client_id-nya
+        sudah tercatat untuk user ini tidak diproses ulang dan dilaporkan
+        sebagai duplicate; client_id milik user lain ditolak. Template user
+        hanya dibaca sekali, dan semua baris yang lolos di-insert dalam satu
+        execute_values.
+
+        Args:
+            items: List dict dengan key client_id, timestamp (datetime) dan image
+                (Frame, bytes JPEG/PNG atau numpy array BGR)
+            username: Username pemilik batch (dari JWT)
+
+        Returns:
+            List hasil per item, urut sesuai input
+        """
+        from psycopg2.extras import execute_values
+
+        results = [{'client_id': item['client_id'], 'status': 'error', 'message': None} for item in items]
+
+        user_template = self._load_user_template(username)
+        if user_template is None:
+            for result in results:
+                result['message'] = 'User not found'
+            return results
+
+        nama = user_template[0]['nama']
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT client_id, nama FROM log_absensi WHERE tenant_id = %s AND client_id = ANY(%s)",
+            (self.tenant_id, [item['client_id'] for item in items])
+        )
+        synced_by = dict(cursor.fetchall())
+
+        rows, pending = [], {}
+        for i, item in enumerate(items):
+            client_id = item['client_id']
+            if client_id in synced_by:
+                if synced_by[client_id] == nama:
+                    results[i].update(status='duplicate', message='Already synced')
+                else:
+                    results[i]['message'] = 'client_id already used by another user'
+                continue
+            if client_id in pending:
+                results[i]['message'] = 'Duplicate client_id in batch'
+                continue
+            frame = None
+            try:
+                frame = as_frame(item['image'])
+                employee, crop, error = self._identify(frame, user_template)
+                if error:
+                    results[i]['message'] = error
+                    continue
+                when = item['timestamp']
+                local_path, rel_path = self._save_evidence(
+                    crop, employee['nama'], when, suffix=f"_{client_id[:8]}"
+                )
+            except Exception as e:
+                results[i]['message'] = f"Attendance failed: {str(e)}"
+                continue
+            finally:
+                if frame is not None and frame is not item['image']:
+                    frame.release()
+
+            tanggal, jam = when.strftime("%Y-%m-%d"), when.strftime("%H:%M:%S")
+            rows.append((employee['nama'], employee['departemen'], employee['posisi'],
+                         tanggal, jam, rel_path, client_id, self.tenant_id, self.site_id))
+            pending[client_id] = (i, {**employee, 'tanggal': tanggal, 'jam': jam, 'image_path': local_path})
+
+        if rows:
+            try:
+                inserted = execute_values(cursor, '''
+                    INSERT INTO log_absensi (nama, departemen, posisi, tanggal, jam, path_gambar, client_id,
+                                             tenant_id, site_id)
+                    VALUES %s
+                    ON CONFLICT (tenant_id, client_id) DO NOTHING
+                    RETURNING client_id
+                ''', rows, page_size=len(rows), fetch=True)
+                self.conn.commit()
+            except Exception as e:
+                self.conn.rollback()
+                for i, _ in pending.values():
+                    results[i]['message'] = f"Attendance failed: {str(e)}"
+                return results
+
+            inserted_ids = {row[0] for row in inserted}
+            for client_id, (i, data) in pending.items():
+                if client_id in inserted_ids:
+                    results[i].update(status='success', message=f"Attendance recorded for {data['nama']}", data=data)
+                else:
+                    # Request paralel dengan client_id sama sudah lebih dulu masuk
+                    results[i].update(status='duplicate', message='Already synced')
+
+        return results
     
-    def load_known_faces(self) -> bool:
+    def gallery_version(self, all_sites: bool = False) -> str:
         """
-        Load data wajah dan encoding dari database
-        
+        Version stamp gallery dari database (satu query ringan)
+
+        Args:
+            all_sites: Stamp seluruh tenant, bukan hanya site service
+
         Returns:
-            bool: True jika berhasil load
+            Version feed karyawan_changes terbesar untuk partisi ini
         """
-        try:
-            self.known_face_encodings = []
-            self.known_face_data = []
-            
+        if self.local_store is not None and not all_sites:
+            # Version feed server saat salinan lokal terakhir ditarik
+            return self.local_store.gallery_version()
+        where, params = self._partition_filter(None if all_sites else self.site_id)
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COALESCE(MAX(version), 0) FROM karyawan_changes WHERE {where}", params)
+        return str(cursor.fetchone()[0])
+
+    def _load_gallery_entries(self, employees: List[Tuple]) -> List[Tuple[Dict, np.ndarray, np.ndarray]]:
+        """
+        Baca file encoding karyawan
+
+        Args:
+            employees: Tuple (id, nama, departemen, posisi, face_encoding_path, site_id)
+
+        Returns:
+            List (metadata, samples, quality); karyawan tanpa encoding dilewati
+        """
+        entries = []
+        for employee in employees:
+            try:
+                employee_id, nama, departemen, posisi, encoding_path, employee_site = employee
+
+                if encoding_path and os.path.exists(encoding_path):
+                    samples, quality, _ = load_face_template(encoding_path)
+                    entries.append(({
+                        'id': employee_id,
+                        'nama': nama,
+                        'departemen': departemen,
+                        'posisi': posisi,
+                        'site_id': employee_site
+                    }, samples, quality))
+            except Exception as e:
+                print(f"Error loading face for {employee[1]}: {e}")
+        return entries
+
+    def _read_gallery(self, site_id: Optional[str], version: str) -> FaceGallery:
+        """Baca semua file encoding satu partisi dan bangun FaceGallery"""
+        if self.local_store is not None and site_id == self.site_id:
+            employees = self.local_store.employees()
+        else:
+            where, params = self._partition_filter(site_id)
             cursor = self.conn.cursor()
-            cursor.execute("SELECT nama, departemen, posisi, face_encoding_path FROM karyawan")
+            cursor.execute(
+                f"SELECT id, nama, departemen, posisi, face_encoding_path, site_id FROM karyawan "
+                f"WHERE {where} ORDER BY id",
+                params
+            )
             employees = cursor.fetchall()
-            
-            for employee in employees:
-                try:
-                    if len(employee) == 4:
-                        nama, departemen, posisi, encoding_path = employee
-                    else:
-                        nama, departemen, posisi, encoding_path = employee
-                    
-                    if encoding_path and os.path.exists(encoding_path):
-                        with open(encoding_path, 'r') as f:
-                            encoding = json.load(f)
-                        
-                        self.known_face_encodings.append(encoding)
-                        self.known_face_data.append({
-                            'nama': nama,
-                            'departemen': departemen,
-                            'posisi': posisi
-                        })
-                except Exception as e:
-                    print(f"Error loading face for {employee[0]}: {e}")
-            
-            print(f"Loaded {len(self.known_face_encodings)} known faces")
+
+        entries = self._load_gallery_entries(employees)
+        gallery = FaceGallery(
+            [meta for meta, _, _ in entries],
+            [samples for _, samples, _ in entries],
+            [quality for _, _, quality in entries],
+            version=version
+        )
+        self._save_snapshot(gallery, site_id)
+        return gallery
+
+    def _save_snapshot(self, gallery: FaceGallery, site_id: Optional[str]) -> None:
+        try:
+            gallery.save_snapshot(self._snapshot_path(site_id))
+            self._unsaved_changes[site_id] = 0
+        except Exception as e:
+            print(f"Error saving gallery snapshot: {e}")
+
+    def _changed_employees(self, site_id: Optional[str], since: int) -> Optional[Tuple[int, set, List[Tuple]]]:
+        """
+        Karyawan yang berubah di feed sesudah version since
+
+        Returns:
+            (version terakhir, id yang berubah, data terbaru karyawan yang
+            masih ada di partisi), atau None jika perubahan tidak tersedia
+        """
+        if self.local_store is not None and site_id == self.site_id:
+            changes = self.local_store.changes_since(since)
+            if changes is None:
+                return None
+            changed_ids = {karyawan_id for _, karyawan_id in changes}
+            employees = self.local_store.employees(changed_ids) if changed_ids else []
+        else:
+            where, params = self._partition_filter(site_id)
+            cursor = self.conn.cursor()
+            cursor.execute(
+                f"SELECT version, karyawan_id FROM karyawan_changes WHERE {where} AND version > %s ORDER BY version",
+                params + (since,)
+            )
+            changes = cursor.fetchall()
+            changed_ids = {karyawan_id for _, karyawan_id in changes}
+            employees = []
+            if changed_ids:
+                cursor.execute(
+                    f"SELECT id, nama, departemen, posisi, face_encoding_path, site_id FROM karyawan "
+                    f"WHERE {where} AND id = ANY(%s) ORDER BY id",
+                    params + (sorted(changed_ids),)
+                )
+                employees = cursor.fetchall()
+        return (changes[-1][0] if changes else since), changed_ids, employees
+
+    def _update_gallery(self, current: FaceGallery, site_id: Optional[str], version: str) -> Optional[FaceGallery]:
+        """
+        Gallery partisi pada version terbaru tanpa membaca semua file encoding:
+        gallery di memory (atau snapshot di disk saat startup) ditambah
+        perubahan dari feed karyawan_changes, O(jumlah perubahan)
+
+        Returns:
+            FaceGallery atau None jika harus load penuh (belum ada snapshot,
+            snapshot dari stamp lama, atau feed lokal sudah diganti salinan penuh)
+        """
+        base = current if current.version is not None else FaceGallery.load_snapshot(self._snapshot_path(site_id))
+        if base is None or base.version == version:
+            return base
+        if not base.supports_changes():
+            return None
+        changed = self._changed_employees(site_id, int(base.version))
+        if changed is None:
+            return None
+        latest, changed_ids, employees = changed
+        # Perubahan dibaca sesudah version diambil, jadi sampai version pasti sudah termasuk
+        latest = max(latest, int(version)) if version.isdigit() else latest
+        gallery = base.apply_changes(changed_ids, self._load_gallery_entries(employees), version=str(latest))
+
+        self._unsaved_changes[site_id] = self._unsaved_changes.get(site_id, 0) + len(changed_ids)
+        if self._unsaved_changes[site_id] >= SNAPSHOT_EVERY_CHANGES:
+            self._save_snapshot(gallery, site_id)
+        return gallery
+
+    def load_global_faces(self) -> bool:
+        """
+        Load gallery seluruh site dalam tenant (untuk fallback global search).
+        Hanya di-load saat dibutuhkan, dengan version stamp, snapshot dan
+        feed perubahan yang sama seperti gallery site.
+        """
+        try:
+            with self._gallery_lock:
+                version = self.gallery_version(all_sites=True)
+                if self.global_gallery.version == version:
+                    return True
+                gallery = self._update_gallery(self.global_gallery, None, version)
+                self.global_gallery = gallery if gallery is not None else self._read_gallery(None, version)
             return True
-            
         except Exception as e:
-            print(f"Error loading known faces: {e}")
+            print(f"Error loading global faces: {e}")
             return False
-    
-    def get_all_employees(self) -> List[Dict]:
+
+    def refresh_shared_gallery(self) -> bool:
+        """
+        Attach ke generasi shared gallery terbaru jika ada yang baru dipublish
+
+        Returns:
+            bool: True jika gallery berganti generasi
         """
-        Get semua data karyawan
+        if self.shared_gallery is None or not self.shared_gallery.changed():
+            return False
+        gallery = self.shared_gallery.attach()
+        if gallery is None:
+            return False
+        self.gallery = gallery
+        return True
+
+    def _set_gallery(self, gallery: FaceGallery) -> None:
+        """Pasang gallery baru; di mode shared, publish lalu pakai view mmap-nya"""
+        self.gallery = gallery
+        if self.shared_gallery is not None:
+            self.shared_gallery.publish(gallery)
+            # Pakai view mmap supaya memory worker ini juga tidak dobel
+            self.refresh_shared_gallery()
+
+    def load_known_faces(self, force: bool = False) -> bool:
+        """
+        Load data wajah dan encoding dari database
+
+        Gallery di memory dipakai ulang jika version stamp database belum
+        berubah; jika berubah, shared gallery dicek dulu, lalu hanya karyawan
+        yang berubah sejak version gallery (atau snapshot di disk saat
+        startup) yang dibaca dari feed karyawan_changes. Semua file encoding
+        hanya dibaca ulang jika itu tidak mungkin. Hasil load dipublish ke
+        shared gallery supaya worker lain ikut berganti.
+
+        Args:
+            force: Abaikan gallery di memory dan snapshot, baca ulang semua file
         
         Returns:
-            List karyawan
+            bool: True jika berhasil load
         """
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id, nama, departemen, posisi FROM karyawan ORDER BY nama")
-            employees = cursor.fetchall()
-            
-            result = []
-            for emp in employees:
-                if self.db_type == 'postgresql':
-                    result.append({
-                        "id": emp[0],
-                        "nama": emp[1],
-                        "departemen": emp[2],
-                        "posisi": emp[3]
-                    })
-                else:
-                    result.append({
-                        "id": emp[0],
-                        "nama": emp[1],
-                        "departemen": emp[2],
-                        "posisi": emp[3]
-                    })
-            
-            return result
+            with self._gallery_lock:
+                version = self.gallery_version()
+                if not force:
+                    self.refresh_shared_gallery()
+                    if self.gallery.version == version:
+                        return True
+                    gallery = self._update_gallery(self.gallery, self.site_id, version)
+                    if gallery is not None:
+                        self._set_gallery(gallery)
+                        print(f"Loaded {len(self.gallery)} known faces (incremental, version {gallery.version})")
+                        return True
+
+                gallery = self._read_gallery(self.site_id, version)
+                self._set_gallery(gallery)
+                print(f"Loaded {len(self.gallery)} known faces")
+                return True
             
         except Exception as e:
-            print(f"Error getting employees: {e}")
-            return []
+            print(f"Error loading known faces: {e}")
+            return False
     
-    def get_attendance_logs(self, start_date: str = None, end_date: str = None) -> List[Dict]:
+    def _employees_query(self, site_id: Optional[str], all_sites: bool) -> Tuple[str, tuple]:
+        where, params = self._partition_filter(None if all_sites else (site_id or self.site_id))
+        return f"SELECT id, nama, departemen, posisi, site_id FROM karyawan WHERE {where} ORDER BY nama", params
+
+    def _attendance_logs_query(self, start_date: Optional[str], end_date: Optional[str],
+                               site_id: Optional[str], all_sites: bool) -> Tuple[str, tuple]:
+        where, params = self._partition_filter(None if all_sites else (site_id or self.site_id))
+        if start_date and end_date:
+            where += " AND tanggal BETWEEN %s AND %s"
+            params = params + (start_date, end_date)
+        return f'''
+            SELECT nama, departemen, posisi, tanggal, jam, path_gambar, site_id
+            FROM log_absensi
+            WHERE {where}
+            ORDER BY tanggal DESC, jam DESC
+        ''', params
+
+    def _query_json(self, query: str, params: tuple) -> Tuple[int, str]:
+        """Jalankan query lewat json_agg: (jumlah baris, array JSON sebagai teks)"""
+        cursor = self.conn.cursor()
+        cursor.execute(json_agg_sql(query), params)
+        return cursor.fetchone()
+
+    def get_all_employees(self, site_id: Optional[str] = None, all_sites: bool = False) -> List[Dict]:
         """
-        Get log absensi
+        Get data karyawan dalam tenant service
         
         Args:
-            start_date: Tanggal mulai (YYYY-MM-DD)
-            end_date: Tanggal akhir (YYYY-MM-DD)
-            
+            site_id: Filter site (default: site service)
+            all_sites: Semua site dalam tenant
+
         Returns:
-            List log absensi
+            List karyawan
         """
         try:
             cursor = self.conn.cursor()
-            cursor.execute("SELECT id, nama, departemen, posisi FROM karyawan ORDER BY nama")
-            employees = cursor.fetchall()
-            
-            result = []
-            for emp in employees:
-                if self.db_type == 'postgresql':
-                    result.append({
-                        "id": emp[0],
-                        "nama": emp[1],
-                        "departemen": emp[2],
-                        "posisi": emp[3]
-                    })
-                else:
-                    result.append({
-                        "id": emp[0],
-                        "nama": emp[1],
-                        "departemen": emp[2],
-                        "posisi": emp[3]
-                    })
-            
-            return result
+            cursor.execute(*self._employees_query(site_id, all_sites))
+            return rows_to_dicts(cursor)
             
         except Exception as e:
             print(f"Error getting employees: {e}")
             return []
+
+    def get_all_employees_json(self, site_id: Optional[str] = None, all_sites: bool = False) -> Tuple[int, str]:
+        """Seperti get_all_employees, tapi array JSON dibuat PostgreSQL (mode PG_JSON_PASSTHROUGH)"""
+        try:
+            return self._query_json(*self._employees_query(site_id, all_sites))
+        except Exception as e:
+            print(f"Error getting employees: {e}")
+            return 0, '[]'
     
-    def get_attendance_logs(self, start_date: str = None, end_date: str = None) -> List[Dict]:
+    def get_attendance_logs(self, start_date: str = None, end_date: str = None,
+                            site_id: Optional[str] = None, all_sites: bool = False) -> List[Dict]:
         """
         Get log absensi
         
         Args:
             start_date: Tanggal mulai (YYYY-MM-DD)
             end_date: Tanggal akhir (YYYY-MM-DD)
+            site_id: Filter site (default: site service)
+            all_sites: Semua site dalam tenant
             
         Returns:
             List log absensi
         """
         try:
             cursor = self.conn.cursor()
-            
-            if start_date and end_date:
-                cursor.execute('''
-                    SELECT nama, departemen, posisi, tanggal, jam, path_gambar 
-                    FROM log_absensi 
-                    WHERE tanggal BETWEEN %s AND %s 
-                    ORDER BY tanggal DESC, jam DESC
-                ''', (start_date, end_date))
-            else:
-                cursor.execute('''
-                    SELECT nama, departemen, posisi, tanggal, jam, path_gambar 
-                    FROM log_absensi 
-                    ORDER BY tanggal DESC, jam DESC
-                ''')
-            
-            logs = cursor.fetchall()
-            
-            result = []
-            for log in logs:
-                result.append({
-                    "nama": log[0],
-                    "departemen": log[1],
-                    "posisi": log[2],
-                    "tanggal": log[3],
-                    "jam": log[4],
-                    "path_gambar": log[5]
-                })
-            
-            return result
+            cursor.execute(*self._attendance_logs_query(start_date, end_date, site_id, all_sites))
+            # tanggal/jam tetap date/time, di-encode langsung oleh fast_json
+            return rows_to_dicts(cursor)
             
         except Exception as e:
             print(f"Error getting attendance logs: {e}")
             return []
+
+    def get_attendance_logs_json(self, start_date: str = None, end_date: str = None,
+                                 site_id: Optional[str] = None, all_sites: bool = False) -> Tuple[int, str]:
+        """Seperti get_attendance_logs, tapi array JSON dibuat PostgreSQL (mode PG_JSON_PASSTHROUGH)"""
+        try:
+            return self._query_json(*self._attendance_logs_query(start_date, end_date, site_id, all_sites))
+        except Exception as e:
+            print(f"Error getting attendance logs: {e}")
+            return 0, '[]'
     
     def __del__(self):
         """Cleanup saat object dihapus"""
-        if hasattr(self, 'conn'):
+        if getattr(self, 'gallery_listener', None) is not None:
+            self.gallery_listener.stop()
+        if getattr(self, 'replicator', None) is not None:
+            self.replicator.stop()
+        if getattr(self, 'conn', None) is not None:
             self.conn.close()
 
 
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def get_face_service() -> FaceRecognitionService:
+    """
+    Instance FaceRecognitionService yang dipakai bersama dalam satu process.
+    Dibuat saat pertama kali dipanggil.
+    """
+    global _shared_service
+    if _shared_service is None:
+        with _shared_service_lock:
+            if _shared_service is None:
+                _shared_service = FaceRecognitionService()
+    return _shared_service
+
+
 # Utility functions untuk kompatibilitas dengan kode lama
-def register_employee(name: str, departemen: str, posisi: str, image_data) -> Dict:
+def register_employee(name: str, departemen: str, posisi: str, image_data, username, password) -> Dict:
     """Wrapper function untuk register employee"""
-    service = FaceRecognitionService()
-    return service.register_employee(name, departemen, posisi, image_data)
+    return get_face_service().register_employee(name, departemen, posisi, image_data, username, password)
 
 
 def do_absensi(image_data) -> Dict:
     """Wrapper function untuk absensi"""
-    service = FaceRecognitionService()
-    return service.do_absensi(image_data)
+    return get_face_service().do_absensi(image_data)
 
 
 def load_known_faces() -> bool:
     """Wrapper function untuk load known faces"""
-    service = FaceRecognitionService()
-    return service.load_known_faces()
+    return get_face_service().load_known_faces()
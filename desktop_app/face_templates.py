@@ -0,0 +1,146 @@
+"""
+Face Templates - multi-sample enrollment dan matching
+Satu karyawan disimpan sebagai beberapa sample encoding + centroid
+
+Format file encoding (JSON):
+    {
+        "samples": [[128 float], ...],
+        "quality": [float, ...],
+        "centroid": [128 float]
+    }
+File lama (satu list 128 float) tetap bisa dibaca sebagai template 1 sample.
+"""
+import json
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_TOLERANCE = 0.45
+
+# Identitas model encoding di gallery. Embedding dari client (mode on-device)
+# hanya diterima jika dihasilkan model yang sama.
+EMBEDDING_MODEL_VERSION = "dlib_face_recognition_resnet_model_v1"
+EMBEDDING_SIZE = 128
+
+# Shortlist centroid sedikit lebih longgar dari tolerance, keputusan akhir tetap di refine
+CENTROID_SLACK = 0.08
+MAX_CANDIDATES = 5
+
+# Sample berkualitas rendah harus lebih dekat untuk dianggap cocok
+QUALITY_PENALTY = 0.05
+
+# Referensi normalisasi quality score
+MIN_FACE_SIZE = 100
+MIN_SHARPNESS = 100.0
+
+
+def face_quality(image: np.ndarray, face_location: Tuple[int, int, int, int]) -> float:
+    """
+    Hitung quality score sample wajah (0..1)
+
+    Kombinasi ukuran wajah dan ketajaman (variance of Laplacian) di area wajah.
+    """
+    top, right, bottom, left = face_location
+    face = image[max(0, top):bottom, max(0, left):right]
+    if face.size == 0:
+        return 0.0
+
+    size_score = min(1.0, min(bottom - top, right - left) / MIN_FACE_SIZE)
+    gray = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY) if face.ndim == 3 else face
+    sharpness_score = min(1.0, cv2.Laplacian(gray, cv2.CV_64F).var() / MIN_SHARPNESS)
+    return float(max(0.05, size_score * sharpness_score))
+
+
+def build_face_template(encodings: Sequence[Sequence[float]], qualities: Optional[Sequence[float]] = None) -> Dict:
+    """
+    Buat template dari beberapa encoding, centroid = rata-rata berbobot quality
+
+    Returns:
+        Dict template siap disimpan sebagai JSON
+    """
+    samples = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+    if qualities is None:
+        weights = np.ones(len(samples))
+    else:
+        weights = np.asarray(qualities, dtype=np.float64)
+    centroid = np.average(samples, axis=0, weights=weights)
+    return {
+        "samples": samples.tolist(),
+        "quality": weights.tolist(),
+        "centroid": centroid.tolist()
+    }
+
+
+def parse_face_template(data) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse isi file encoding (format template atau format lama)
+
+    Returns:
+        Tuple (samples (k, 128), quality (k,), centroid (128,))
+    """
+    if isinstance(data, dict):
+        samples = np.asarray(data["samples"], dtype=np.float64).reshape(-1, 128)
+        quality = np.asarray(data.get("quality") or np.ones(len(samples)), dtype=np.float64)
+        centroid = np.asarray(data.get("centroid") or samples.mean(axis=0), dtype=np.float64)
+    else:
+        samples = np.asarray(data, dtype=np.float64).reshape(-1, 128)
+        quality = np.ones(len(samples))
+        centroid = samples.mean(axis=0)
+    return samples, quality, centroid
+
+
+def load_face_template(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Baca file encoding dari disk, lihat parse_face_template"""
+    with open(path, 'r') as f:
+        return parse_face_template(json.load(f))
+
+
+def template_distance(encoding: np.ndarray, samples: np.ndarray, quality: np.ndarray) -> float:
+    """
+    Jarak encoding ke template: sample terdekat, ditambah penalti untuk sample
+    dengan quality rendah
+    """
+    distances = np.linalg.norm(samples - encoding, axis=1)
+    return float(np.min(distances + (1.0 - quality) * QUALITY_PENALTY))
+
+
+def score_gallery(encoding: np.ndarray, centroids: np.ndarray, samples: List[np.ndarray],
+                  quality: List[np.ndarray], k: int = 2,
+                  max_distance: Optional[float] = None) -> List[Tuple[int, float]]:
+    """
+    Skor top-k karyawan terdekat: jarak ke semua centroid dalam satu operasi
+    matriks, lalu refine semua sample kandidat shortlist sekaligus
+
+    Args:
+        encoding: Encoding wajah probe (128,)
+        centroids: Matriks centroid gallery (N, 128)
+        samples: List sample per karyawan, sejajar dengan centroids
+        quality: List quality per karyawan, sejajar dengan centroids
+        k: Jumlah kandidat yang dikembalikan
+        max_distance: Jika diisi, centroid lebih jauh dari max_distance +
+            CENTROID_SLACK tidak di-refine
+
+    Returns:
+        List (index karyawan, jarak template) urut dari yang terdekat
+    """
+    if len(centroids) == 0 or k <= 0:
+        return []
+
+    centroid_distances = np.linalg.norm(centroids - encoding, axis=1)
+    size = min(len(centroids), max(k, MAX_CANDIDATES))
+    shortlist = np.argpartition(centroid_distances, size - 1)[:size]
+    if max_distance is not None:
+        shortlist = shortlist[centroid_distances[shortlist] <= max_distance + CENTROID_SLACK]
+    if len(shortlist) == 0:
+        return []
+
+    counts = [len(samples[idx]) for idx in shortlist]
+    owners = np.repeat(np.arange(len(shortlist)), counts)
+    stacked = np.vstack([samples[idx] for idx in shortlist])
+    penalties = (1.0 - np.concatenate([quality[idx] for idx in shortlist])) * QUALITY_PENALTY
+    distances = np.linalg.norm(stacked - encoding, axis=1) + penalties
+
+    best = np.full(len(shortlist), np.inf)
+    np.minimum.at(best, owners, distances)
+    order = np.argsort(best)[:k]
+    return [(int(shortlist[i]), float(best[i])) for i in order]
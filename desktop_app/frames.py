@@ -0,0 +1,238 @@
+"""
+Frames - representasi gambar internal dengan urutan channel yang jelas
+
+Pipeline recognition bekerja di RGB (urutan yang diharapkan face_recognition/
+dlib, face_quality dan liveness). Input dari OpenCV (kamera, imread, imdecode)
+berupa BGR dan dikonversi tepat satu kali saat dibungkus menjadi Frame;
+konversi balik ke BGR hanya dilakukan untuk crop kecil yang ditulis dengan
+cv2.imwrite.
+
+Buffer seukuran frame untuk hasil konversi diambil dari BufferPool dan
+dikembalikan saat Frame di-release, sehingga request/frame berikutnya dengan
+resolusi yang sama tidak mengalokasikan array baru.
+
+Setelah deteksi, setiap wajah dipotong sekali menjadi FaceCrop (dengan
+margin); landmark, encoding, liveness, quality dan JPEG bukti dikerjakan
+pada crop kecil itu, jadi hanya deteksi yang menyentuh frame penuh.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+RGB = 'RGB'
+BGR = 'BGR'
+
+# Margin FaceCrop relatif terhadap sisi terpanjang box deteksi (minimal
+# MIN_CROP_MARGIN px). Chip 150x150 yang di-align dlib (landmark + padding
+# 0.25, bisa berotasi) harus muat di dalam crop supaya encoding dari crop
+# sama dengan encoding dari frame penuh.
+FACE_CROP_MARGIN = 0.6
+MIN_CROP_MARGIN = 20
+
+
+class BufferPool:
+    """Pool array numpy per (shape, dtype), thread-safe"""
+
+    def __init__(self, max_per_shape: int = 8):
+        self.max_per_shape = max_per_shape
+        self._free = defaultdict(list)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.hits += 1
+                return free.pop()
+            self.misses += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer: np.ndarray) -> None:
+        key = (buffer.shape, buffer.dtype.str)
+        with self._lock:
+            free = self._free[key]
+            if len(free) < self.max_per_shape:
+                free.append(buffer)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'pooled': sum(len(free) for free in self._free.values())
+            }
+
+
+FRAME_POOL = BufferPool()
+
+
+class Frame:
+    def __init__(self, pixels: np.ndarray, order: str = RGB, pool: Optional[BufferPool] = None):
+        """
+        Args:
+            pixels: Array (H, W, 3) uint8, atau (H, W) grayscale
+            order: Urutan channel `pixels` (RGB atau BGR)
+            pool: Jika diisi, `pixels` berasal dari pool ini dan dikembalikan
+                saat release()
+        """
+        if order not in (RGB, BGR):
+            raise ValueError(f"Unknown channel order {order!r}")
+        self.pixels = pixels
+        self.order = order
+        self._pool = pool
+        self._converted = None
+
+    @classmethod
+    def from_bgr(cls, bgr: np.ndarray, pool: Optional[BufferPool] = FRAME_POOL) -> 'Frame':
+        """Bungkus frame OpenCV (BGR): konversi sekali ke RGB ke buffer pool"""
+        if bgr.ndim != 3:
+            return cls(bgr, RGB)
+        if pool is None:
+            return cls(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), RGB)
+        rgb = pool.acquire(bgr.shape, bgr.dtype)
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+        return cls(rgb, RGB, pool=pool)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.pixels.shape
+
+    def rgb(self) -> np.ndarray:
+        """Array RGB (tanpa copy jika frame sudah RGB)"""
+        if self.order == RGB or self.pixels.ndim != 3:
+            return self.pixels
+        if self._converted is None:
+            self._converted = cv2.cvtColor(self.pixels, cv2.COLOR_BGR2RGB)
+        return self._converted
+
+    def crop_bgr(self, top: int, right: int, bottom: int, left: int) -> np.ndarray:
+        """Crop dalam urutan BGR untuk cv2.imwrite (konversi hanya di area crop)"""
+        crop = self.pixels[max(0, top):bottom, max(0, left):right]
+        if self.order == BGR or crop.ndim != 3:
+            return crop
+        return cv2.cvtColor(crop, cv2.COLOR_RGB2BGR)
+
+    def bgr(self) -> np.ndarray:
+        """Array BGR penuh (untuk cv2.imwrite seluruh frame)"""
+        height, width = self.pixels.shape[:2]
+        return self.crop_bgr(0, width, height, 0)
+
+    def release(self) -> None:
+        """Kembalikan buffer ke pool; Frame tidak boleh dipakai lagi setelahnya"""
+        if self._pool is not None:
+            self._pool.release(self.pixels)
+            self._pool = None
+        self.pixels = None
+        self._converted = None
+
+    def __enter__(self) -> 'Frame':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class FaceCrop:
+    def __init__(self, frame: Frame, face_location: Tuple[int, int, int, int],
+                 margin: float = FACE_CROP_MARGIN):
+        """
+        Potong satu wajah dari frame (satu copy seukuran crop, contiguous)
+
+        Args:
+            frame: Frame sumber
+            face_location: (top, right, bottom, left) dalam koordinat frame
+            margin: Margin relatif terhadap ukuran wajah
+
+        Attributes:
+            location: face_location dalam koordinat crop
+            box: (top, right, bottom, left) area crop dalam koordinat frame
+        """
+        top, right, bottom, left = face_location
+        pad = max(MIN_CROP_MARGIN, int(round(margin * max(bottom - top, right - left))))
+        height, width = frame.shape[:2]
+        self.box = (max(0, top - pad), min(width, right + pad), min(height, bottom + pad), max(0, left - pad))
+        crop_top, crop_right, crop_bottom, crop_left = self.box
+
+        region = frame.pixels[crop_top:crop_bottom, crop_left:crop_right]
+        if frame.order == BGR and region.ndim == 3:
+            # Frame BGR: konversi hanya area crop, tidak pernah frame penuh
+            self.pixels = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+        else:
+            self.pixels = np.ascontiguousarray(region)
+        self.order = RGB
+        self._bgr_region = None
+        self.location = (top - crop_top, right - crop_left, bottom - crop_top, left - crop_left)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.pixels.shape
+
+    def rgb(self) -> np.ndarray:
+        if self.order != RGB:
+            raise ValueError("FaceCrop sudah dikonversi ke BGR")
+        return self.pixels
+
+    def bgr(self, margin: Optional[int] = None) -> np.ndarray:
+        """
+        Area wajah + margin px (default seluruh crop) dalam BGR untuk
+        cv2.imwrite, dikonversi in-place di buffer crop (view, tanpa alokasi).
+        Setelah ini rgb() tidak bisa dipakai lagi.
+        """
+        if margin is None:
+            top, left, bottom, right = 0, 0, self.pixels.shape[0], self.pixels.shape[1]
+        else:
+            face_top, face_right, face_bottom, face_left = self.location
+            top, left = max(0, face_top - margin), max(0, face_left - margin)
+            bottom = min(self.pixels.shape[0], face_bottom + margin)
+            right = min(self.pixels.shape[1], face_right + margin)
+        region = self.pixels[top:bottom, left:right]
+        if self._bgr_region is not None:
+            if self._bgr_region != (top, left, bottom, right):
+                raise ValueError("FaceCrop sudah dikonversi ke BGR dengan area lain")
+            return region
+        if region.ndim == 3:
+            cv2.cvtColor(region, cv2.COLOR_RGB2BGR, dst=region)
+        self._bgr_region = (top, left, bottom, right)
+        self.order = BGR
+        return region
+
+
+def decode_image(data: bytes, pool: Optional[BufferPool] = FRAME_POOL) -> Frame:
+    """
+    Decode JPEG/PNG menjadi Frame RGB. cv2.imdecode dengan IMREAD_COLOR sudah
+    menerapkan EXIF orientation.
+    """
+    bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if bgr is None:
+        raise ValueError("Unsupported or corrupt image")
+    return Frame.from_bgr(bgr, pool=pool)
+
+
+def as_frame(image, order: str = BGR) -> Frame:
+    """
+    Normalisasi input gambar menjadi Frame. Frame baru (bukan input Frame)
+    memakai buffer pool dan harus di-release oleh pemanggil.
+
+    Args:
+        image: Frame, bytes file gambar terenkode, path file, atau numpy array
+        order: Urutan channel jika `image` numpy array (default BGR: frame
+            kamera / cv2.imread, kompatibel dengan pemanggil lama)
+    """
+    if isinstance(image, Frame):
+        return image
+    if isinstance(image, (bytes, bytearray)):
+        return decode_image(image)
+    if isinstance(image, str):
+        bgr = cv2.imread(image)
+        if bgr is None:
+            raise ValueError(f"Cannot read image {image}")
+        return Frame.from_bgr(bgr)
+    if isinstance(image, np.ndarray):
+        return Frame.from_bgr(image) if order == BGR else Frame(image, RGB)
+    raise ValueError("Invalid image format")
@@ -0,0 +1,150 @@
+"""
+Gallery Feed - langganan perubahan karyawan lewat LISTEN/NOTIFY PostgreSQL
+
+Trigger karyawan_change_feed (docker/init.sql / DesktopDatabaseConfig.init_tables)
+mencatat setiap perubahan karyawan ke tabel karyawan_changes dengan version
+yang naik terus, lalu NOTIFY channel karyawan_changes dengan payload
+"tenant/site/version". Version stamp gallery = version terbesar partisi,
+sehingga service yang tertinggal cukup membaca perubahan sesudah
+version-nya (lihat FaceRecognitionService.load_known_faces).
+
+GalleryListener memegang satu koneksi khusus LISTEN dan memanggil callback
+begitu ada NOTIFY untuk partisinya, jadi semua service yang berjalan
+ikut ter-update kurang dari sedetik setelah registrasi commit. NOTIFY
+hanya pemicu: isi perubahan selalu dibaca dari tabel, jadi notifikasi yang
+hilang saat koneksi putus tertutup oleh refresh setelah reconnect.
+
+Konfigurasi lewat environment:
+    GALLERY_LISTEN   true untuk mengaktifkan listener di FaceRecognitionService (default false)
+"""
+import os
+import select
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from desktop_database_config import DesktopDatabaseConfig
+from local_store import backoff_delay
+
+CHANNEL = 'karyawan_changes'
+
+# NOTIFY beruntun (mis. registrasi bulk) digabung jadi satu refresh
+DEBOUNCE_SECONDS = 0.2
+POLL_TIMEOUT = 5.0
+
+
+def gallery_listen_enabled() -> bool:
+    return os.getenv('GALLERY_LISTEN', 'false').lower() in ('1', 'true', 'yes')
+
+
+def parse_notification(payload: str) -> Optional[Tuple[str, str, int]]:
+    """
+    Payload NOTIFY "tenant/site/version" menjadi tuple
+
+    Returns:
+        (tenant_id, site_id, version) atau None jika format tidak dikenal
+    """
+    tenant_id, sep, rest = payload.partition('/')
+    site_id, sep2, version = rest.rpartition('/')
+    if not sep or not sep2 or not version.isdigit():
+        return None
+    return tenant_id, site_id, int(version)
+
+
+class GalleryListener:
+    def __init__(self, tenant_id: str, site_id: Optional[str], on_change: Callable[[], object],
+                 debounce: float = DEBOUNCE_SECONDS):
+        """
+        Args:
+            tenant_id: Tenant yang didengarkan
+            site_id: Site yang didengarkan; None = semua site dalam tenant
+            on_change: Dipanggil (di thread listener) setelah ada perubahan
+                di partisi ini, dan sekali setiap kali (re)connect
+            debounce: Detik menunggu NOTIFY susulan sebelum memanggil on_change
+        """
+        self.tenant_id = tenant_id
+        self.site_id = site_id
+        self.on_change = on_change
+        self.debounce = debounce
+
+        self.conn = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self.last_version = None
+        self.last_error = None
+
+    def _matches(self, payload: str) -> bool:
+        parsed = parse_notification(payload)
+        if parsed is None:
+            return False
+        tenant_id, site_id, version = parsed
+        if tenant_id != self.tenant_id or (self.site_id is not None and site_id != self.site_id):
+            return False
+        self.last_version = max(version, self.last_version or 0)
+        return True
+
+    def _connect(self) -> None:
+        self.conn, _ = DesktopDatabaseConfig.get_connection()
+        self.conn.autocommit = True
+        self.conn.cursor().execute(f"LISTEN {CHANNEL}")
+
+    def _close(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def _wait(self, timeout: float) -> bool:
+        """Tunggu NOTIFY sampai timeout; True jika ada yang untuk partisi ini"""
+        if not select.select([self.conn], [], [], timeout)[0]:
+            return False
+        self.conn.poll()
+        matched = False
+        while self.conn.notifies:
+            matched = self._matches(self.conn.notifies.pop(0).payload) or matched
+        return matched
+
+    def _notify(self) -> None:
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"⚠️ Gallery refresh dari feed gagal: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._connect()
+                self._failures = 0
+                self.last_error = None
+                # Perubahan selama belum/tidak terhubung tidak punya NOTIFY
+                self._notify()
+                while not self._stop.is_set():
+                    if not self._wait(POLL_TIMEOUT):
+                        continue
+                    # Kumpulkan NOTIFY susulan dulu supaya bulk insert = satu refresh
+                    deadline = time.time() + self.debounce
+                    while time.time() < deadline and not self._stop.is_set():
+                        self._wait(max(0.0, deadline - time.time()))
+                    self._notify()
+            except Exception as e:
+                self._failures += 1
+                self.last_error = str(e)
+                delay = backoff_delay(self._failures)
+                print(f"⚠️ Gallery listener terputus, reconnect dalam {delay:.0f} detik: {e}")
+                self._close()
+                self._stop.wait(delay)
+        self._close()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='gallery-listener', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = POLL_TIMEOUT + 1) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,34 @@
+"""
+Konfigurasi gunicorn untuk API server
+
+Master process membangun gallery wajah sekali dan mempublish-nya ke shared
+gallery (mmap di /dev/shm) sebelum worker di-fork. Worker hanya attach
+read-only, dan reload dari worker mana pun dipublish sebagai generasi baru
+yang otomatis dipakai semua worker.
+
+Usage:
+    gunicorn -c gunicorn.conf.py api_server:app
+"""
+import os
+
+from shared_gallery import default_shared_dir
+
+bind = os.getenv('API_BIND', '0.0.0.0:5050')
+workers = int(os.getenv('API_WORKERS', '4'))
+
+os.environ.setdefault('SHARED_GALLERY_DIR', default_shared_dir())
+
+
+def on_starting(server):
+    """Bangun dan publish gallery di master sebelum worker dibuat"""
+    from face_recognition_service import FaceRecognitionService
+
+    service = FaceRecognitionService()
+    server.log.info(
+        "Shared gallery %s published with %d known faces",
+        service.shared_gallery.generation, len(service.gallery)
+    )
+    # Thread listener tidak ikut ke worker hasil fork; worker membuat sendiri
+    if service.gallery_listener is not None:
+        service.gallery_listener.stop()
+    service.conn.close()
@@ -0,0 +1,217 @@
+"""
+Liveness - pre-check anti-spoofing yang murah sebelum face encoding
+
+Dua jenis pemeriksaan:
+- Tekstur/frekuensi pada crop wajah (satu gambar, dipakai API dan desktop):
+    * foto cetak / layar yang difoto ulang kehilangan detail frekuensi tinggi
+      sehingga rasio energi frekuensi tinggi rendah
+    * layar menghasilkan pola moire: puncak tajam di spektrum frekuensi tinggi
+- Gerakan multi-frame (stream kamera desktop): wajah asli punya gerakan kecil
+  (kedip, ekspresi) yang tidak ikut bergerak bersama background, foto diam
+  atau bergerak kaku bersama background
+
+Semua gambar input dalam urutan RGB (Frame.rgb(), lihat frames.py).
+
+Konfigurasi lewat environment:
+    LIVENESS_MODE          off | texture (default off)
+    LIVENESS_MIN_HF_RATIO  batas bawah rasio energi frekuensi tinggi
+    LIVENESS_MAX_PEAK      batas atas rasio puncak spektrum (moire)
+
+Default-nya mati: threshold di atas belum dikalibrasi. Aktifkan texture
+hanya setelah LIVENESS_MIN_HF_RATIO / LIVENESS_MAX_PEAK dipilih dengan
+bench_liveness.py pada capture asli dari kamera/ponsel site.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+FACE_SIZE = 128
+# Lebar (bin) garis sumbu spektrum yang diabaikan untuk peak_ratio
+AXIS_MASK = 1
+
+
+class LivenessResult:
+    def __init__(self, live: bool, reason: Optional[str], scores: Dict[str, float], elapsed_ms: float):
+        self.live = live
+        self.reason = reason
+        self.scores = scores
+        self.elapsed_ms = elapsed_ms
+
+    def to_dict(self) -> Dict:
+        return {'live': self.live, 'reason': self.reason, 'scores': self.scores, 'elapsed_ms': self.elapsed_ms}
+
+
+def _face_gray(image: np.ndarray, face_location: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+    """Crop wajah, grayscale, resize ke FACE_SIZE x FACE_SIZE (float32)"""
+    top, right, bottom, left = face_location
+    face = image[max(0, top):bottom, max(0, left):right]
+    if face.size == 0:
+        return None
+    if face.ndim == 3:
+        face = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY)
+    return cv2.resize(face, (FACE_SIZE, FACE_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def texture_scores(image: np.ndarray, face_location: Tuple[int, int, int, int]) -> Optional[Dict[str, float]]:
+    """
+    Hitung skor frekuensi pada crop wajah
+
+    Returns:
+        Dict hf_ratio (energi frekuensi tinggi / total) dan peak_ratio
+        (puncak / median magnitude di band frekuensi tinggi, tanpa garis
+        sumbu), atau None jika crop kosong
+    """
+    face = _face_gray(image, face_location)
+    if face is None:
+        return None
+    face -= face.mean()
+    # Window Hann supaya tepi crop tidak muncul sebagai frekuensi tinggi palsu
+    window = np.outer(np.hanning(FACE_SIZE), np.hanning(FACE_SIZE)).astype(np.float32)
+    spectrum = np.abs(np.fft.fftshift(np.fft.fft2(face * window)))
+
+    center = FACE_SIZE // 2
+    yy, xx = np.ogrid[:FACE_SIZE, :FACE_SIZE]
+    radius = np.sqrt((yy - center) ** 2 + (xx - center) ** 2)
+    high_band = radius > FACE_SIZE / 4
+    # Tepi lurus horizontal/vertikal (kusen pintu, rak) menghasilkan garis di
+    # sumbu spektrum, bukan puncak moire: abaikan untuk peak_ratio
+    off_axis = (np.abs(yy - center) > AXIS_MASK) & (np.abs(xx - center) > AXIS_MASK)
+
+    energy = spectrum ** 2
+    total = energy.sum() + 1e-9
+    high = spectrum[high_band & off_axis]
+    return {
+        'hf_ratio': float(energy[high_band].sum() / total),
+        'peak_ratio': float(high.max() / (np.median(high) + 1e-9))
+    }
+
+
+class LivenessChecker:
+    def __init__(self, mode: Optional[str] = None, min_hf_ratio: Optional[float] = None,
+                 max_peak_ratio: Optional[float] = None):
+        self.mode = (mode or os.getenv('LIVENESS_MODE', 'off')).lower()
+        self.min_hf_ratio = min_hf_ratio if min_hf_ratio is not None else float(
+            os.getenv('LIVENESS_MIN_HF_RATIO', '0.002'))
+        self.max_peak_ratio = max_peak_ratio if max_peak_ratio is not None else float(
+            os.getenv('LIVENESS_MAX_PEAK', '60'))
+        self._lock = threading.Lock()
+        self._metrics = {'checks': 0, 'rejected': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'reasons': {}}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def check(self, image: np.ndarray, face_location: Tuple[int, int, int, int],
+              motion: Optional['MotionLivenessTracker'] = None) -> LivenessResult:
+        """
+        Jalankan pre-check liveness untuk satu wajah
+
+        Args:
+            image: Gambar RGB (frame penuh atau FaceCrop.rgb())
+            face_location: (top, right, bottom, left) dalam koordinat image
+            motion: Tracker gerakan stream kamera (desktop), optional
+        """
+        start = time.perf_counter()
+        reason = None
+        scores = texture_scores(image, face_location) or {}
+        if not scores:
+            reason = 'empty_face_crop'
+        elif scores['hf_ratio'] < self.min_hf_ratio:
+            reason = 'low_texture'
+        elif scores['peak_ratio'] > self.max_peak_ratio:
+            reason = 'moire_pattern'
+
+        if reason is None and motion is not None:
+            motion_score = motion.score()
+            if motion_score is not None:
+                scores['motion'] = motion_score
+                if not motion.is_live():
+                    reason = 'no_natural_motion'
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record(reason, elapsed_ms)
+        return LivenessResult(reason is None, reason, scores, elapsed_ms)
+
+    def _record(self, reason: Optional[str], elapsed_ms: float) -> None:
+        with self._lock:
+            self._metrics['checks'] += 1
+            self._metrics['total_ms'] += elapsed_ms
+            self._metrics['max_ms'] = max(self._metrics['max_ms'], elapsed_ms)
+            if reason is not None:
+                self._metrics['rejected'] += 1
+                self._metrics['reasons'][reason] = self._metrics['reasons'].get(reason, 0) + 1
+
+    def metrics(self) -> Dict:
+        """Snapshot metrik: jumlah check, rejection per alasan, latency rata-rata/maks"""
+        with self._lock:
+            checks = self._metrics['checks']
+            return {
+                'mode': self.mode,
+                'checks': checks,
+                'rejected': self._metrics['rejected'],
+                'rejection_rate': self._metrics['rejected'] / checks if checks else 0.0,
+                'avg_ms': self._metrics['total_ms'] / checks if checks else 0.0,
+                'max_ms': self._metrics['max_ms'],
+                'reasons': dict(self._metrics['reasons'])
+            }
+
+
+class MotionLivenessTracker:
+    """
+    Tracker gerakan untuk stream kamera desktop. Dipanggil setiap frame
+    dengan lokasi wajah hasil deteksi preview.
+    """
+
+    def __init__(self, history: int = 8, min_face_motion: float = 0.6, min_relative_motion: float = 1.3):
+        """
+        Args:
+            history: Jumlah frame yang dibandingkan
+            min_face_motion: Rata-rata perbedaan piksel minimum di area wajah
+            min_relative_motion: Minimum rasio gerakan wajah / gerakan background
+        """
+        self.history = history
+        self.min_face_motion = min_face_motion
+        self.min_relative_motion = min_relative_motion
+        self._faces = deque(maxlen=history)
+        self._backgrounds = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def update(self, frame: np.ndarray, face_location: Optional[Tuple[int, int, int, int]]) -> None:
+        """Tambahkan frame RGB; tanpa wajah, history direset"""
+        with self._lock:
+            if face_location is None:
+                self._faces.clear()
+                self._backgrounds.clear()
+                return
+            face = _face_gray(frame, face_location)
+            small = cv2.resize(frame, (64, 48), interpolation=cv2.INTER_AREA)
+            background = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY).astype(np.float32) if small.ndim == 3 else small
+            if face is not None:
+                self._faces.append(face)
+                self._backgrounds.append(background)
+
+    def score(self) -> Optional[float]:
+        """Rata-rata gerakan wajah antar frame, None jika history belum cukup"""
+        with self._lock:
+            if len(self._faces) < self.history:
+                return None
+            faces = np.stack(self._faces)
+        return float(np.abs(np.diff(faces, axis=0)).mean())
+
+    def is_live(self) -> bool:
+        with self._lock:
+            if len(self._faces) < self.history:
+                # Belum cukup frame: jangan blokir, texture check tetap berlaku
+                return True
+            faces = np.stack(self._faces)
+            backgrounds = np.stack(self._backgrounds)
+        face_motion = float(np.abs(np.diff(faces, axis=0)).mean())
+        background_motion = float(np.abs(np.diff(backgrounds, axis=0)).mean())
+        if face_motion < self.min_face_motion:
+            return False
+        return face_motion / (background_motion + 1e-3) >= self.min_relative_motion
@@ -0,0 +1,409 @@
+"""
+Load test end-to-end: mobile check-in + polling dashboard secara bersamaan
+
+Setiap virtual user (coroutine asyncio, satu koneksi keep-alive per target
+seperti aplikasi mobile) menjalankan langkah-langkah flow dari file skenario
+JSON dengan think time. HTTP client-nya stdlib saja (asyncio streams), jadi
+tidak butuh service atau package tambahan.
+
+Skenario (lihat loadtest_scenario.json):
+    seed        RNG think time dan pembagian user; seed sama = beban sama
+    duration    batas waktu run (detik)
+    ramp_up     user tiap flow mulai merata dalam N detik pertama
+    warmup      request yang mulai sebelum detik ini tidak masuk statistik
+    targets     nama -> base URL (mis. api, dashboard)
+    users_file  CSV username,password[,image] (loadtest_seed.py)
+    flows       list {name, users, iterations (null = ulang sampai duration), steps}
+
+Step request: {name, target, method, path, headers, json, once, extract}
+    - string di path/headers/json boleh berisi {username}, {password},
+      {image} (foto user, base64) dan variabel hasil extract
+    - extract: {"token": "access_token"} menyimpan field response JSON
+    - once: true hanya dijalankan di iterasi pertama (mis. login)
+Step think: {"think": [min, max]} detik, uniform
+
+Report per endpoint (nama step): jumlah request, ok (2xx), ditolak (4xx),
+error (5xx / timeout / koneksi), throughput, latency p50/p90/p95/p99.
+Report JSON menyimpan hash skenario dan commit supaya run bisa dibandingkan
+(--compare report_sebelumnya.json).
+
+Usage:
+    python loadtest_seed.py --employees 2000 --photos foto_wajah/
+    python loadtest.py loadtest_scenario.json --report hasil.json
+    python loadtest.py loadtest_scenario.json --users 400 --compare hasil.json
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import datetime
+import hashlib
+import json
+import os
+import platform
+import random
+import ssl
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+REQUEST_TIMEOUT = 30.0
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# ----------------------------------------------------------------------
+# HTTP client asyncio minimal (HTTP/1.1 keep-alive)
+# ----------------------------------------------------------------------
+class HttpConnection:
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.tls = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.tls else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.tls else None
+        )
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers: Dict[str, str],
+                      body: Optional[bytes]) -> Tuple[int, bytes]:
+        """
+        Kirim satu request
+
+        Returns:
+            (status code, body response)
+        """
+        reused = self.writer is not None
+        if not reused:
+            await self._connect()
+        try:
+            return await self._exchange(method, path, headers, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            if not reused:
+                raise
+        # Koneksi keep-alive sudah ditutup server saat idle: ulang sekali
+        await self._connect()
+        try:
+            return await self._exchange(method, path, headers, body)
+        except Exception:
+            self.close()
+            raise
+
+    async def _exchange(self, method: str, path: str, headers: Dict[str, str],
+                        body: Optional[bytes]) -> Tuple[int, bytes]:
+        lines = [f"{method} {self.prefix}{path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Content-Length: {len(body) if body else 0}")
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            data = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            data = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            data = await self.reader.read()
+            self.close()
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, data
+
+
+# ----------------------------------------------------------------------
+# Skenario
+# ----------------------------------------------------------------------
+def load_users(path: str) -> List[Dict[str, str]]:
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return [dict(row) for row in csv.DictReader(f)]
+
+
+class Variables(dict):
+    """Variabel virtual user; yang belum ada (mis. token saat login gagal) jadi string kosong"""
+
+    def __missing__(self, key):
+        return ''
+
+
+def render(value, variables: Dict[str, str]):
+    """Ganti {nama} di string (rekursif untuk dict/list JSON)"""
+    if isinstance(value, str):
+        return value.format_map(variables)
+    if isinstance(value, dict):
+        return {key: render(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render(item, variables) for item in value]
+    return value
+
+
+class Stats:
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.bytes = Counter()
+        self.warmup = Counter()
+
+    def add(self, endpoint: str, started: float, latency: float, status, size: int) -> None:
+        if started < self.warmup_until:
+            self.warmup[endpoint] += 1
+            return
+        self.statuses[endpoint][status] += 1
+        self.bytes[endpoint] += size
+        if isinstance(status, int) and 200 <= status < 300:
+            self.latencies[endpoint].append(latency)
+
+    def summary(self, window: float) -> Dict[str, Dict]:
+        result = {}
+        for endpoint, statuses in sorted(self.statuses.items()):
+            latencies = self.latencies[endpoint]
+            ok = sum(n for s, n in statuses.items() if isinstance(s, int) and 200 <= s < 300)
+            rejected = sum(n for s, n in statuses.items() if isinstance(s, int) and 400 <= s < 500)
+            total = sum(statuses.values())
+            result[endpoint] = {
+                'requests': total,
+                'ok': ok,
+                'rejected': rejected,
+                'errors': total - ok - rejected,
+                'error_rate': (total - ok - rejected) / total if total else 0.0,
+                'throughput': ok / window if window > 0 else 0.0,
+                'latency_ms': {
+                    **{f"p{int(q * 100)}": percentile(latencies, q) * 1000 for q in PERCENTILES},
+                    'mean': statistics.mean(latencies) * 1000 if latencies else float('nan'),
+                    'max': max(latencies) * 1000 if latencies else float('nan')
+                },
+                'bytes': self.bytes[endpoint],
+                'statuses': {str(s): n for s, n in sorted(statuses.items(), key=lambda item: str(item[0]))}
+            }
+        return result
+
+
+class VirtualUser:
+    def __init__(self, flow: Dict, index: int, user: Dict[str, str], targets: Dict[str, str],
+                 images: Dict[str, str], rng: random.Random, stats: Stats, clock_start: float,
+                 timeout: float):
+        self.flow = flow
+        self.index = index
+        self.variables = Variables(user)
+        self.variables['image'] = images.get(user.get('image') or '', '')
+        self.connections = {name: HttpConnection(url) for name, url in targets.items()}
+        self.rng = rng
+        self.stats = stats
+        self.clock_start = clock_start
+        self.timeout = timeout
+
+    async def _request(self, step: Dict) -> None:
+        connection = self.connections[step['target']]
+        headers = render(step.get('headers', {}), self.variables)
+        body = None
+        if 'json' in step:
+            body = json.dumps(render(step['json'], self.variables)).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+        started = time.perf_counter()
+        try:
+            status, data = await asyncio.wait_for(
+                connection.request(step.get('method', 'GET'), render(step['path'], self.variables), headers, body),
+                self.timeout
+            )
+        except asyncio.TimeoutError:
+            connection.close()
+            status, data = 'timeout', b''
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            connection.close()
+            status, data = type(e).__name__, b''
+        latency = time.perf_counter() - started
+        self.stats.add(step['name'], started - self.clock_start, latency, status, len(data))
+
+        if step.get('extract') and isinstance(status, int) and 200 <= status < 300:
+            try:
+                payload = json.loads(data)
+                for variable, field in step['extract'].items():
+                    self.variables[variable] = str(payload[field])
+            except (ValueError, KeyError, TypeError):
+                pass
+
+    async def run(self, start_delay: float, deadline: float) -> None:
+        await asyncio.sleep(start_delay)
+        iterations = self.flow.get('iterations')
+        iteration = 0
+        try:
+            while time.perf_counter() < deadline and (iterations is None or iteration < iterations):
+                for step in self.flow['steps']:
+                    if time.perf_counter() >= deadline:
+                        return
+                    if 'think' in step:
+                        low, high = step['think']
+                        await asyncio.sleep(self.rng.uniform(low, high))
+                    elif not (step.get('once') and iteration > 0):
+                        await self._request(step)
+                iteration += 1
+        finally:
+            for connection in self.connections.values():
+                connection.close()
+
+
+def load_images(users: List[Dict[str, str]]) -> Dict[str, str]:
+    """Foto yang dipakai user sebagai base64 (dibaca sekali)"""
+    images = {}
+    for path in {user.get('image') for user in users if user.get('image')}:
+        with open(path, 'rb') as f:
+            images[path] = base64.b64encode(f.read()).decode('ascii')
+    return images
+
+
+async def run_scenario(scenario: Dict, users: List[Dict[str, str]], timeout: float) -> Tuple[Stats, float]:
+    images = load_images(users)
+    clock_start = time.perf_counter()
+    duration = float(scenario['duration'])
+    ramp_up = float(scenario.get('ramp_up', 0))
+    stats = Stats(float(scenario.get('warmup', 0)))
+    deadline = clock_start + duration
+
+    tasks = []
+    offset = 0
+    for flow in scenario['flows']:
+        count = int(flow['users'])
+        for index in range(count):
+            # Flow tanpa login (dashboard) tetap dapat user, tapi tidak memakainya
+            user = users[(offset + index) % len(users)] if users else {}
+            rng = random.Random(f"{scenario.get('seed', 0)}:{flow['name']}:{index}")
+            virtual_user = VirtualUser(flow, index, user, scenario['targets'], images, rng, stats,
+                                       clock_start, timeout)
+            tasks.append(virtual_user.run(ramp_up * index / count, deadline))
+        offset += count
+    await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - clock_start
+
+
+# ----------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def print_report(endpoints: Dict[str, Dict], baseline: Optional[Dict] = None) -> None:
+    print(f"{'endpoint':<18} {'req':>7} {'ok':>7} {'4xx':>5} {'err':>5} {'req/s':>8} "
+          f"{'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  (ms)")
+    for name, e in endpoints.items():
+        latency = e['latency_ms']
+        print(f"{name:<18} {e['requests']:>7} {e['ok']:>7} {e['rejected']:>5} {e['errors']:>5} "
+              f"{e['throughput']:>8.1f} {latency['p50']:>7.0f} {latency['p95']:>7.0f} "
+              f"{latency['p99']:>7.0f} {latency['max']:>7.0f}")
+        if baseline and name in baseline:
+            before = baseline[name]
+            print(f"{'  vs baseline':<18} {'':>7} {'':>7} {'':>5} "
+                  f"{e['errors'] - before['errors']:>+5} {e['throughput'] - before['throughput']:>+8.1f} "
+                  f"{latency['p50'] - before['latency_ms']['p50']:>+7.0f} "
+                  f"{latency['p95'] - before['latency_ms']['p95']:>+7.0f} "
+                  f"{latency['p99'] - before['latency_ms']['p99']:>+7.0f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test check-in mobile + dashboard")
+    parser.add_argument('scenario', help="File skenario JSON")
+    parser.add_argument('--users', type=int, help="Override jumlah user flow pertama")
+    parser.add_argument('--duration', type=float, help="Override durasi (detik)")
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT, help="Timeout per request (detik)")
+    parser.add_argument('--report', help="Simpan report JSON ke file ini")
+    parser.add_argument('--compare', help="Report JSON run sebelumnya sebagai baseline")
+    args = parser.parse_args(argv)
+
+    with open(args.scenario, 'rb') as f:
+        raw = f.read()
+    scenario = json.loads(raw)
+    if args.users is not None:
+        scenario['flows'][0]['users'] = args.users
+    if args.duration is not None:
+        scenario['duration'] = args.duration
+
+    users_file = scenario.get('users_file')
+    if users_file and not os.path.isabs(users_file):
+        users_file = os.path.join(os.path.dirname(os.path.abspath(args.scenario)), users_file)
+    users = load_users(users_file) if users_file else []
+    needed = sum(int(flow['users']) for flow in scenario['flows'])
+    if users and len(users) < needed:
+        print(f"⚠️ {len(users)} user di {users_file} untuk {needed} virtual user, sebagian dipakai ulang")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('scenario_sha256') != hashlib.sha256(raw).hexdigest():
+            print("⚠️ Baseline dibuat dengan file skenario berbeda")
+
+    started_at = datetime.datetime.now().isoformat(timespec='seconds')
+    stats, elapsed = asyncio.run(run_scenario(scenario, users, args.timeout))
+    window = elapsed - float(scenario.get('warmup', 0))
+    endpoints = stats.summary(window)
+
+    print(f"scenario {scenario.get('name', args.scenario)}: {elapsed:.0f}s, "
+          f"{sum(f['users'] for f in scenario['flows'])} virtual users, "
+          f"measured {window:.0f}s (warmup {sum(stats.warmup.values())} requests excluded)")
+    print_report(endpoints, baseline['endpoints'] if baseline else None)
+
+    if args.report:
+        report = {
+            'scenario': scenario.get('name', args.scenario),
+            'scenario_sha256': hashlib.sha256(raw).hexdigest(),
+            'overrides': {'users': args.users, 'duration': args.duration},
+            'commit': git_commit(),
+            'started_at': started_at,
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'elapsed': elapsed,
+            'measured_window': window,
+            'endpoints': endpoints
+        }
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report disimpan ke {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Load test /api/login - mengukur login per detik per core
+
+Skenario:
+    cold  - setiap request memakai user berbeda (KDF selalu dijalankan)
+    warm  - user yang sama login berulang (cache verifikasi terpakai)
+
+User dibaca dari CSV (username,password). Untuk skenario cold, siapkan
+user sebanyak jumlah request, misalnya dengan bulk_enrollment.py.
+
+Usage:
+    python loadtest_login.py --users users.csv --scenario cold --concurrency 32 --duration 30 --server-cores 4
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_users(path: str):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return [(row['username'], row['password']) for row in csv.DictReader(f)]
+
+
+def post_login(url: str, username: str, password: str, timeout: float):
+    """Kirim satu request login, return (status_code, latency_detik)"""
+    body = json.dumps({'username': username, 'password': password}).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            res.read()
+            status = res.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test endpoint /api/login")
+    parser.add_argument('--url', default='http://localhost:5050/api/login')
+    parser.add_argument('--users', required=True, help="CSV username,password")
+    parser.add_argument('--scenario', choices=['cold', 'warm'], default='cold')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help="Durasi test (detik)")
+    parser.add_argument('--server-cores', type=int, default=os.cpu_count(),
+                        help="Jumlah core server, untuk metrik login/detik/core")
+    parser.add_argument('--timeout', type=float, default=15.0)
+    args = parser.parse_args(argv)
+
+    users = load_users(args.users)
+    if not users:
+        print("❌ File users kosong", file=sys.stderr)
+        return 1
+    if args.scenario == 'warm':
+        users = users[:1]
+    user_iter = itertools.cycle(users)
+    user_lock = threading.Lock()
+
+    deadline = time.monotonic() + args.duration
+    latencies, statuses = [], Counter()
+    result_lock = threading.Lock()
+
+    def worker():
+        while time.monotonic() < deadline:
+            with user_lock:
+                username, password = next(user_iter)
+            status, latency = post_login(args.url, username, password, args.timeout)
+            with result_lock:
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append(latency)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for _ in range(args.concurrency):
+            executor.submit(worker)
+    elapsed = time.monotonic() - started
+
+    success = statuses.get(200, 0)
+    rate = success / elapsed
+    print(f"scenario            {args.scenario}")
+    print(f"requests            {sum(statuses.values())}  {dict(statuses)}")
+    print(f"logins/sec          {rate:.1f}")
+    print(f"logins/sec/core     {rate / max(1, args.server_cores):.1f}")
+    print(f"latency p50/p95/p99 {percentile(latencies, 0.5) * 1000:.0f} / "
+          f"{percentile(latencies, 0.95) * 1000:.0f} / {percentile(latencies, 0.99) * 1000:.0f} ms")
+    if latencies:
+        print(f"latency mean        {statistics.mean(latencies) * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
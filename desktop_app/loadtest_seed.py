@@ -0,0 +1,158 @@
+"""
+Fixture load test - isi PostgreSQL dengan karyawan sintetis
+
+Karyawan dibuat deterministik dari --seed (nama, username, encoding), jadi
+seed yang sama menghasilkan gallery yang sama dan hasil load test bisa
+dibandingkan antar run. Encoding sintetis membuat gallery seukuran produksi
+tanpa foto; check-in dengan foto hanya cocok untuk karyawan yang
+di-enroll dari --photos (butuh face_recognition), sisanya tetap menjalankan
+seluruh pipeline deteksi + matching lalu ditolak (400).
+
+Jalankan di host API server (atau dengan data_wajah yang sama) karena
+server membaca file encoding dari face_encoding_path.
+
+Usage:
+    python loadtest_seed.py --employees 2000 --users-out loadtest_users.csv
+    python loadtest_seed.py --employees 2000 --photos foto_wajah/ --users-out loadtest_users.csv
+    python loadtest_seed.py --clean
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+from desktop_database_config import DesktopDatabaseConfig
+from face_templates import build_face_template
+
+USERNAME_PREFIX = "lt_"
+NAME_PREFIX = "Loadtest"
+ENCODING_DIR = os.path.join("data_wajah", "loadtest")
+DEPARTMENTS = ['Produksi', 'Gudang', 'Maintenance', 'QC', 'HRD', 'Logistik']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+SAMPLES_PER_EMPLOYEE = 3
+# Jarak antar sample satu karyawan kecil, antar karyawan jauh (seperti encoding dlib)
+SAMPLE_NOISE = 0.015
+
+
+def synthetic_template(rng: np.random.Generator) -> dict:
+    """Template dengan SAMPLES_PER_EMPLOYEE sample di sekitar satu titik acak"""
+    center = rng.normal(0, 0.09, 128)
+    samples = center + rng.normal(0, SAMPLE_NOISE, (SAMPLES_PER_EMPLOYEE, 128))
+    return build_face_template(samples)
+
+
+def photo_templates(photos: List[str]) -> List[Optional[dict]]:
+    """Template dari foto (satu wajah per foto); None jika wajah tidak terdeteksi"""
+    try:
+        import face_recognition
+    except ImportError:
+        print("⚠️ face_recognition tidak terpasang, semua karyawan memakai encoding sintetis")
+        return [None] * len(photos)
+    templates = []
+    for path in photos:
+        encodings = face_recognition.face_encodings(face_recognition.load_image_file(path))
+        if not encodings:
+            print(f"⚠️ Wajah tidak terdeteksi: {path}")
+        templates.append(build_face_template(encodings[:1]) if encodings else None)
+    return templates
+
+
+def list_photos(directory: Optional[str]) -> List[str]:
+    if not directory:
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def seed(conn, employees: int, seed_value: int, password: str, tenant_id: str, site_id: str,
+         photos: List[str], users_out: str) -> int:
+    from psycopg2.extras import execute_values
+    from werkzeug.security import generate_password_hash
+
+    rng = np.random.default_rng(seed_value)
+    enrolled = photo_templates(photos)
+    # Semua user memakai password sama: cukup satu hash (KDF mahal)
+    password_hash = generate_password_hash(password)
+
+    os.makedirs(ENCODING_DIR, exist_ok=True)
+    rows, users = [], []
+    for i in range(employees):
+        username = f"{USERNAME_PREFIX}{i:05d}"
+        template = synthetic_template(rng)
+        image = photos[i] if i < len(photos) else (photos[i % len(photos)] if photos else '')
+        if i < len(enrolled) and enrolled[i] is not None:
+            template = enrolled[i]
+        encoding_path = os.path.join(ENCODING_DIR, f"{username}_encoding.json")
+        with open(encoding_path, 'w') as f:
+            json.dump(template, f)
+        rows.append((f"{NAME_PREFIX} {i:05d}", DEPARTMENTS[i % len(DEPARTMENTS)], 'Operator',
+                     encoding_path, username, password_hash, tenant_id, site_id))
+        users.append((username, password, image))
+
+    cursor = conn.cursor()
+    execute_values(cursor, '''
+        INSERT INTO karyawan (nama, departemen, posisi, face_encoding_path, username, password_hash,
+                              tenant_id, site_id)
+        VALUES %s
+        ON CONFLICT (username) DO UPDATE SET
+            nama = EXCLUDED.nama, departemen = EXCLUDED.departemen, posisi = EXCLUDED.posisi,
+            face_encoding_path = EXCLUDED.face_encoding_path, password_hash = EXCLUDED.password_hash,
+            tenant_id = EXCLUDED.tenant_id, site_id = EXCLUDED.site_id
+    ''', rows, page_size=1000)
+    conn.commit()
+
+    with open(users_out, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['username', 'password', 'image'])
+        writer.writerows(users)
+    return len(rows)
+
+
+def clean(conn) -> None:
+    """Hapus karyawan, log absensi dan file encoding hasil fixture"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM log_absensi WHERE nama LIKE %s", (f"{NAME_PREFIX} %",))
+    logs = cursor.rowcount
+    cursor.execute("DELETE FROM karyawan WHERE username LIKE %s", (f"{USERNAME_PREFIX}%",))
+    employees = cursor.rowcount
+    conn.commit()
+    shutil.rmtree(ENCODING_DIR, ignore_errors=True)
+    print(f"✅ {employees} karyawan dan {logs} log absensi load test dihapus")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed karyawan sintetis untuk load test")
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42, help="Seed RNG (hasil sama untuk seed sama)")
+    parser.add_argument('--password', default='loadtest123')
+    parser.add_argument('--tenant', default=os.getenv('TENANT_ID', 'default'))
+    parser.add_argument('--site', default=os.getenv('SITE_ID', 'default'))
+    parser.add_argument('--photos', help="Direktori foto wajah; foto ke-i di-enroll untuk karyawan ke-i")
+    parser.add_argument('--users-out', default='loadtest_users.csv', help="CSV username,password,image untuk loadtest.py")
+    parser.add_argument('--clean', action='store_true', help="Hapus data fixture lalu keluar")
+    args = parser.parse_args(argv)
+
+    conn, db_type = DesktopDatabaseConfig.get_connection()
+    try:
+        DesktopDatabaseConfig.init_tables(conn, db_type)
+        if args.clean:
+            clean(conn)
+            return 0
+        count = seed(conn, args.employees, args.seed, args.password, args.tenant, args.site,
+                     list_photos(args.photos), args.users_out)
+        print(f"✅ {count} karyawan load test di {args.tenant}/{args.site}, user di {args.users_out}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,559 @@
+"""
+Local Store - penyimpanan lokal kiosk (local-first) + replikasi ke PostgreSQL
+
+Mode kiosk dengan LOCAL_STORE=true:
+- Check-in dicatat ke SQLite lokal (WAL) dengan latency disk lokal, tanpa
+  round trip ke server. Setiap baris punya client_id (UUID) yang dibuat di
+  kiosk, jadi id tidak pernah bentrok antar kiosk dan insert ulang ke
+  PostgreSQL idempotent (ON CONFLICT (tenant_id, client_id) DO NOTHING, sama dengan
+  sinkronisasi offline mobile)
+- Salinan karyawan site ini (gallery) disimpan lokal, sehingga kiosk bisa
+  start dan mengenali wajah saat server tidak terjangkau
+- Replicator (thread background) mengirim log yang belum terkirim per batch
+  dan menarik perubahan gallery dari feed karyawan_changes server (hanya
+  karyawan yang berubah; salinan penuh hanya saat pertama kali). Gagal koneksi = retry dengan backoff
+  eksponensial (dibatasi REPLICATION_MAX_BACKOFF); baris yang ditolak
+  server sendiri (bukan masalah jaringan) dicoba ulang satu per satu dan
+  setelah REPLICATION_MAX_ATTEMPTS ditandai failed (tetap tersimpan lokal)
+
+Konfigurasi lewat environment:
+    LOCAL_STORE                 true untuk mengaktifkan (default false)
+    LOCAL_STORE_PATH            file SQLite (default kiosk_store.db)
+    LOCAL_STORE_RETENTION_DAYS  log yang sudah terkirim dihapus setelah N hari (default 30)
+    REPLICATION_INTERVAL        detik antar siklus replikasi (default 5)
+    REPLICATION_BATCH_SIZE      baris per INSERT ke PostgreSQL (default 500)
+"""
+import datetime
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from desktop_database_config import DesktopDatabaseConfig
+
+LOCAL_STORE_PATH = "kiosk_store.db"
+
+REPLICATION_MAX_ATTEMPTS = 10
+REPLICATION_BASE_BACKOFF = 2.0
+REPLICATION_MAX_BACKOFF = 300.0
+
+# Status baris log lokal
+PENDING = 'pending'
+REPLICATED = 'replicated'
+FAILED = 'failed'
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS log_absensi (
+        client_id TEXT PRIMARY KEY,
+        nama TEXT NOT NULL,
+        departemen TEXT,
+        posisi TEXT,
+        tanggal TEXT NOT NULL,
+        jam TEXT NOT NULL,
+        path_gambar TEXT,
+        tenant_id TEXT NOT NULL,
+        site_id TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL DEFAULT 0,
+        replicated_at REAL,
+        last_error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_log_absensi_status ON log_absensi(status, next_attempt)",
+    """
+    CREATE TABLE IF NOT EXISTS karyawan (
+        id INTEGER PRIMARY KEY,
+        nama TEXT NOT NULL,
+        departemen TEXT,
+        posisi TEXT,
+        face_encoding_path TEXT,
+        site_id TEXT NOT NULL
+    )
+    """,
+    # Cermin feed karyawan_changes server sejak salinan penuh terakhir,
+    # dibaca service untuk update gallery incremental
+    """
+    CREATE TABLE IF NOT EXISTS karyawan_changes (
+        version INTEGER PRIMARY KEY,
+        karyawan_id INTEGER NOT NULL
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+]
+
+EMPLOYEE_COLUMNS = 'id, nama, departemen, posisi, face_encoding_path, site_id'
+
+LOG_COLUMNS = ('client_id', 'nama', 'departemen', 'posisi', 'tanggal', 'jam', 'path_gambar', 'tenant_id', 'site_id')
+
+
+def _network_errors() -> Tuple:
+    """Error yang berarti server tidak terjangkau (bukan data ditolak)"""
+    import psycopg2
+    # RuntimeError: DesktopDatabaseConfig.get_connection gagal connect
+    return psycopg2.OperationalError, psycopg2.InterfaceError, RuntimeError
+
+
+def local_store_enabled() -> bool:
+    return os.getenv('LOCAL_STORE', 'false').lower() in ('1', 'true', 'yes')
+
+
+def backoff_delay(attempts: int) -> float:
+    """Jeda sebelum percobaan berikutnya: 2, 4, 8, ... detik, maksimal REPLICATION_MAX_BACKOFF"""
+    return min(REPLICATION_MAX_BACKOFF, REPLICATION_BASE_BACKOFF * 2 ** max(0, attempts - 1))
+
+
+class LocalStore:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: File SQLite, default env LOCAL_STORE_PATH
+        """
+        self.path = path or os.getenv('LOCAL_STORE_PATH', LOCAL_STORE_PATH)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: check-in yang sudah dikonfirmasi ke user tidak hilang saat listrik padam
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        for sql in SCHEMA:
+            self.conn.execute(sql)
+        # Dipakai thread UI (record) dan thread replicator bersamaan
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Log absensi
+    # ------------------------------------------------------------------
+    def record(self, nama: str, departemen: str, posisi: str, tanggal: str, jam: str,
+               path_gambar: Optional[str], tenant_id: str, site_id: str) -> str:
+        """
+        Catat satu check-in lokal
+
+        Returns:
+            client_id baru (UUID hex)
+        """
+        client_id = uuid.uuid4().hex
+        with self._lock:
+            self.conn.execute(
+                f"INSERT INTO log_absensi ({', '.join(LOG_COLUMNS)}, created_at) VALUES ({', '.join(['?'] * 10)})",
+                (client_id, nama, departemen, posisi, tanggal, jam, path_gambar, tenant_id, site_id, time.time())
+            )
+        return client_id
+
+    def due(self, limit: int, now: Optional[float] = None) -> List[Tuple]:
+        """Log pending yang sudah waktunya dikirim, urut waktu check-in (tuple sesuai LOG_COLUMNS)"""
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT {', '.join(LOG_COLUMNS)} FROM log_absensi "
+                "WHERE status = ? AND next_attempt <= ? ORDER BY created_at LIMIT ?",
+                (PENDING, now if now is not None else time.time(), limit)
+            ).fetchall()
+
+    def mark_replicated(self, client_ids: Sequence[str]) -> None:
+        # Satu transaksi (satu fsync) per batch
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "UPDATE log_absensi SET status = ?, replicated_at = ?, last_error = NULL WHERE client_id = ?",
+                    [(REPLICATED, time.time(), client_id) for client_id in client_ids]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def mark_retry(self, client_ids: Sequence[str], error: str, max_attempts: Optional[int] = None) -> None:
+        """
+        Catat percobaan gagal dan jadwalkan ulang dengan backoff
+
+        Args:
+            max_attempts: Jika diisi, baris yang sudah mencapai batas ini
+                ditandai failed (tidak dicoba lagi otomatis)
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for client_id in client_ids:
+                    row = self.conn.execute(
+                        "SELECT attempts FROM log_absensi WHERE client_id = ?", (client_id,)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    attempts = row[0] + 1
+                    status = FAILED if max_attempts is not None and attempts >= max_attempts else PENDING
+                    self.conn.execute(
+                        "UPDATE log_absensi SET status = ?, attempts = ?, next_attempt = ?, last_error = ? "
+                        "WHERE client_id = ?",
+                        (status, attempts, now + backoff_delay(attempts), error[:500], client_id)
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def retry_failed(self) -> int:
+        """Kembalikan log berstatus failed ke antrian (mis. setelah data server diperbaiki)"""
+        with self._lock:
+            return self.conn.execute(
+                "UPDATE log_absensi SET status = ?, attempts = 0, next_attempt = 0 WHERE status = ?",
+                (PENDING, FAILED)
+            ).rowcount
+
+    def prune(self, retention_days: float) -> int:
+        """Hapus log yang sudah terkirim lebih dari retention_days"""
+        cutoff = time.time() - retention_days * 86400
+        with self._lock:
+            return self.conn.execute(
+                "DELETE FROM log_absensi WHERE status = ? AND replicated_at < ?", (REPLICATED, cutoff)
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM log_absensi GROUP BY status").fetchall()
+        counts = {PENDING: 0, REPLICATED: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    # ------------------------------------------------------------------
+    # Gallery (salinan karyawan site ini)
+    # ------------------------------------------------------------------
+    def replace_employees(self, employees: Sequence[Tuple], version: str) -> None:
+        """
+        Ganti salinan karyawan dalam satu transaksi
+
+        Args:
+            employees: Tuple (id, nama, departemen, posisi, face_encoding_path, site_id)
+            version: Version stamp gallery server untuk isi ini
+        """
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM karyawan")
+                self.conn.execute("DELETE FROM karyawan_changes")
+                self.conn.executemany("INSERT INTO karyawan VALUES (?, ?, ?, ?, ?, ?)", employees)
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [('gallery_version', version), ('gallery_base_version', version)]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def apply_employee_changes(self, changes: Sequence[Tuple[int, int]], employees: Sequence[Tuple],
+                               version: str) -> None:
+        """
+        Terapkan perubahan dari feed server dalam satu transaksi
+
+        Args:
+            changes: Tuple (version, karyawan_id) dari karyawan_changes server
+            employees: Data terbaru karyawan yang berubah dan masih ada di
+                site ini, tuple seperti replace_employees
+            version: Version feed setelah perubahan ini
+        """
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "DELETE FROM karyawan WHERE id = ?", [(karyawan_id,) for _, karyawan_id in changes]
+                )
+                self.conn.executemany("INSERT INTO karyawan VALUES (?, ?, ?, ?, ?, ?)", employees)
+                self.conn.executemany("INSERT OR REPLACE INTO karyawan_changes VALUES (?, ?)", changes)
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('gallery_version', ?)", (version,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def employees(self, ids: Optional[Sequence[int]] = None) -> List[Tuple]:
+        """
+        Karyawan lokal: tuple (id, nama, departemen, posisi, face_encoding_path, site_id), urut id
+
+        Args:
+            ids: Hanya karyawan dengan id ini; None = semua
+        """
+        with self._lock:
+            if ids is None:
+                return self.conn.execute(f"SELECT {EMPLOYEE_COLUMNS} FROM karyawan ORDER BY id").fetchall()
+            ids = list(ids)
+            rows = []
+            # Batas jumlah parameter SQLite
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows.extend(self.conn.execute(
+                    f"SELECT {EMPLOYEE_COLUMNS} FROM karyawan WHERE id IN ({', '.join(['?'] * len(chunk))})",
+                    chunk
+                ).fetchall())
+            return sorted(rows)
+
+    def changes_since(self, version: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        Perubahan karyawan lokal sesudah version
+
+        Returns:
+            List (version, karyawan_id) urut version, atau None jika version
+            lebih lama dari salinan penuh terakhir (harus load penuh)
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'gallery_base_version'").fetchone()
+            if row is None or not row[0].isdigit() or version < int(row[0]):
+                return None
+            return self.conn.execute(
+                "SELECT version, karyawan_id FROM karyawan_changes WHERE version > ? ORDER BY version", (version,)
+            ).fetchall()
+
+    def gallery_version(self) -> str:
+        """Version stamp server terakhir yang ditarik ('' jika belum pernah)"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'gallery_version'").fetchone()
+        return row[0] if row else ''
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class Replicator:
+    def __init__(self, store: LocalStore, tenant_id: str, site_id: str,
+                 on_gallery_change: Optional[Callable[[], None]] = None,
+                 interval: Optional[float] = None, batch_size: Optional[int] = None,
+                 max_attempts: int = REPLICATION_MAX_ATTEMPTS):
+        """
+        Args:
+            store: LocalStore kiosk
+            tenant_id, site_id: Partisi kiosk ini
+            on_gallery_change: Dipanggil (di thread replicator) setelah salinan
+                karyawan lokal berubah
+            interval: Detik antar siklus, default env REPLICATION_INTERVAL
+            batch_size: Baris per INSERT, default env REPLICATION_BATCH_SIZE
+            max_attempts: Percobaan per baris yang ditolak server sebelum failed
+        """
+        self.store = store
+        self.tenant_id = tenant_id
+        self.site_id = site_id
+        self.on_gallery_change = on_gallery_change
+        self.interval = interval if interval is not None else float(os.getenv('REPLICATION_INTERVAL', '5'))
+        self.batch_size = batch_size or int(os.getenv('REPLICATION_BATCH_SIZE', '500'))
+        self.max_attempts = max_attempts
+        self.retention_days = float(os.getenv('LOCAL_STORE_RETENTION_DAYS', '30'))
+
+        self.conn = None
+        # Koneksi PostgreSQL replicator dipakai thread background dan pull() manual
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._offline_until = 0.0
+        self._failures = 0
+        self.last_sync = None
+        self.last_error = None
+
+    # ------------------------------------------------------------------
+    # Koneksi
+    # ------------------------------------------------------------------
+    def _connection(self):
+        if self.conn is None:
+            self.conn, _ = DesktopDatabaseConfig.get_connection()
+        return self.conn
+
+    def _drop_connection(self, error: Exception) -> None:
+        """Koneksi putus: tutup dan tunda percobaan berikutnya (backoff)"""
+        self._failures += 1
+        self._offline_until = time.time() + backoff_delay(self._failures)
+        self.last_error = str(error)
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    @property
+    def online(self) -> bool:
+        return self.conn is not None and self._failures == 0
+
+    # ------------------------------------------------------------------
+    # Push log
+    # ------------------------------------------------------------------
+    def _insert(self, rows: Sequence[Tuple]) -> None:
+        from psycopg2.extras import execute_values
+
+        cursor = self._connection().cursor()
+        execute_values(cursor, f'''
+            INSERT INTO log_absensi ({', '.join(LOG_COLUMNS)})
+            VALUES %s
+            ON CONFLICT (tenant_id, client_id) DO NOTHING
+        ''', rows, page_size=len(rows))
+        self.conn.commit()
+
+    def push(self) -> int:
+        """
+        Kirim log pending per batch sampai antrian (yang sudah jatuh tempo) habis
+
+        Returns:
+            Jumlah baris yang terkirim
+        """
+        network_errors = _network_errors()
+        sent = 0
+        with self._lock:
+            try:
+                while True:
+                    rows = self.store.due(self.batch_size)
+                    if not rows:
+                        return sent
+                    try:
+                        self._insert(rows)
+                    except network_errors:
+                        raise
+                    except Exception as e:
+                        # Ditolak server: pisahkan baris bermasalah supaya yang lain tetap terkirim
+                        self.conn.rollback()
+                        sent += self._push_one_by_one(rows, e, network_errors)
+                        continue
+                    self.store.mark_replicated([row[0] for row in rows])
+                    sent += len(rows)
+            except network_errors as e:
+                # Jaringan / server mati: seluruh antrian menunggu backoff koneksi
+                self._drop_connection(e)
+                raise
+
+    def _push_one_by_one(self, rows: Sequence[Tuple], batch_error: Exception, network_errors: Tuple) -> int:
+        print(f"⚠️ Batch replikasi ditolak ({batch_error}), dicoba per baris")
+        sent = 0
+        for row in rows:
+            try:
+                self._insert([row])
+            except network_errors:
+                raise
+            except Exception as e:
+                self.conn.rollback()
+                self.store.mark_retry([row[0]], str(e), max_attempts=self.max_attempts)
+                continue
+            self.store.mark_replicated([row[0]])
+            sent += 1
+        return sent
+
+    # ------------------------------------------------------------------
+    # Pull gallery
+    # ------------------------------------------------------------------
+    def server_gallery_version(self) -> str:
+        """Version feed karyawan_changes terbesar untuk site ini di server"""
+        cursor = self._connection().cursor()
+        cursor.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM karyawan_changes WHERE tenant_id = %s AND site_id = %s",
+            (self.tenant_id, self.site_id)
+        )
+        version = cursor.fetchone()[0]
+        self.conn.commit()
+        return str(version)
+
+    def pull(self) -> bool:
+        """
+        Tarik perubahan karyawan site ini jika version feed server berubah.
+        Salinan penuh hanya jika salinan lokal belum ada (atau dari stamp lama).
+
+        Returns:
+            bool: True jika salinan lokal berubah
+        """
+        with self._lock:
+            try:
+                version = self.server_gallery_version()
+                local_version = self.store.gallery_version()
+                if version == local_version:
+                    return False
+                cursor = self.conn.cursor()
+                if local_version.isdigit():
+                    cursor.execute(
+                        "SELECT version, karyawan_id FROM karyawan_changes "
+                        "WHERE tenant_id = %s AND site_id = %s AND version > %s ORDER BY version",
+                        (self.tenant_id, self.site_id, int(local_version))
+                    )
+                    changes = cursor.fetchall()
+                    cursor.execute(
+                        f"SELECT {EMPLOYEE_COLUMNS} FROM karyawan "
+                        "WHERE tenant_id = %s AND site_id = %s AND id = ANY(%s) ORDER BY id",
+                        (self.tenant_id, self.site_id, sorted({karyawan_id for _, karyawan_id in changes}))
+                    )
+                else:
+                    changes = None
+                    cursor.execute(
+                        f"SELECT {EMPLOYEE_COLUMNS} FROM karyawan WHERE tenant_id = %s AND site_id = %s ORDER BY id",
+                        (self.tenant_id, self.site_id)
+                    )
+                employees = cursor.fetchall()
+                self.conn.commit()
+            except Exception as e:
+                self._drop_connection(e)
+                raise
+            if changes is None:
+                self.store.replace_employees(employees, version)
+                print(f"✅ Gallery lokal diperbarui ({len(employees)} karyawan)")
+            else:
+                latest = str(changes[-1][0]) if changes else version
+                self.store.apply_employee_changes(changes, employees, latest)
+                print(f"✅ Gallery lokal diperbarui ({len(changes)} perubahan)")
+        if self.on_gallery_change is not None:
+            self.on_gallery_change()
+        return True
+
+    # ------------------------------------------------------------------
+    # Thread background
+    # ------------------------------------------------------------------
+    def sync_once(self) -> None:
+        """Satu siklus: push log, pull gallery, bersihkan log lama. Error dicatat, tidak dilempar."""
+        if time.time() < self._offline_until:
+            return
+        try:
+            self.push()
+            self.pull()
+            self._failures = 0
+            self.last_error = None
+            self.last_sync = datetime.datetime.now()
+        except Exception as e:
+            if self.conn is not None:
+                # Error selain koneksi (mis. query gagal)
+                self._drop_connection(e)
+            print(f"⚠️ Replikasi gagal, dicoba lagi dalam {backoff_delay(self._failures):.0f} detik: {e}")
+        try:
+            self.store.prune(self.retention_days)
+        except Exception as e:
+            print(f"Error pruning local store: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sync_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='replicator', daemon=True)
+            self._thread.start()
+
+    def sync_now(self) -> None:
+        """Bangunkan thread replicator tanpa menunggu interval (juga reset backoff)"""
+        self._offline_until = 0.0
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def status(self) -> Dict:
+        """Ringkasan untuk UI kiosk: antrian lokal, status koneksi, sinkron terakhir"""
+        return {
+            'online': self.online,
+            'last_sync': self.last_sync.isoformat() if self.last_sync else None,
+            'last_error': self.last_error,
+            **self.store.counts()
+        }
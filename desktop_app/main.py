@@ -3,6 +3,7 @@ Refactored Tkinter Application - menggunakan FaceRecognitionService
 Aplikasi Tkinter tetap berjalan seperti biasa, tapi sekarang menggunakan service layer
 """
 import cv2
+import numpy as np
 import os
 import sys
 from PIL import Image, ImageTk
@@ -13,7 +14,17 @@ import tkinter.ttk as ttk
 import tkinter.simpledialog as simpledialog
 
 # Import service layer baru
-from face_recognition_service import FaceRecognitionService
+from face_recognition_service import get_face_service
+from liveness import MotionLivenessTracker
+
+# Jumlah frame yang diambil saat pendaftaran (template multi-sample)
+ENROLLMENT_SAMPLES = 5
+ENROLLMENT_INTERVAL = 0.2
+
+# Ukuran preview kamera (lebar, tinggi)
+DISPLAY_SIZE = (640, 480)
+# Interval refresh status sinkronisasi local store (ms)
+SYNC_STATUS_INTERVAL_MS = 5000
 
 class AbsensiApp:
     def __init__(self, root):
@@ -23,7 +34,7 @@ class AbsensiApp:
 
         # Initialize face recognition service
         try:
-            self.face_service = FaceRecognitionService()
+            self.face_service = get_face_service()
             print("✅ Face Recognition Service initialized")
         except Exception as e:
             messagebox.showerror("Service Error", f"Tidak dapat menginisialisasi service: {e}")
@@ -31,6 +42,14 @@ class AbsensiApp:
 
         # Setup kamera
         self.cap = cv2.VideoCapture(0)
+        self._capture = None
+        self._rgb = None
+        self._display = None
+
+        # Gerakan wajah di stream kamera untuk pre-check liveness
+        self.motion_tracker = MotionLivenessTracker()
+        # Pendaftaran yang sedang mengambil sample (data dialog, frame, sisa sample)
+        self._enrollment = None
 
         # Video frame
         self.video_label = tk.Label(root)
@@ -38,6 +57,8 @@ class AbsensiApp:
 
         # Tombol-tombol kontrol
         self.create_buttons()
+        if self.face_service.replicator is not None:
+            self.refresh_sync_status()
 
         # Update video
         self.update_video()
@@ -99,37 +120,54 @@ class AbsensiApp:
         
         self.status_label = tk.Label(
             self.status_frame, 
-            text=f"Known faces loaded: {len(self.face_service.known_face_encodings)}",
             font=("Arial", 9),
             fg="green"
         )
         self.status_label.pack()
+        self.update_status()
 
     def daftar_wajah(self):
         """Dialog pendaftaran karyawan menggunakan service"""
+        if self._enrollment is not None:
+            return
         dialog = EmployeeRegistrationDialog(self.root)
         if dialog.result:
-            nama, departemen, posisi, username, password = dialog.result
+            # Sample diambil lewat root.after supaya preview kamera tetap jalan
+            self._enrollment = {'data': dialog.result, 'frames': [], 'remaining': ENROLLMENT_SAMPLES}
+            self._capture_enrollment_sample()
 
-            ret, frame = self.cap.read()
-            if ret:
-                result = self.face_service.register_employee(
-                    nama, departemen, posisi, frame, username=username, password=password
-                )
-                if result['status'] == 'success':
-                    messagebox.showinfo("Berhasil", result['message'])
-                    self.update_status()
-                else:
-                    messagebox.showerror("Error", result['message'])
+    def _capture_enrollment_sample(self):
+        """Ambil satu sample enrollment; sample terakhir menyelesaikan pendaftaran"""
+        enrollment = self._enrollment
+        ret, frame = self.cap.read()
+        if ret:
+            enrollment['frames'].append(frame)
+        enrollment['remaining'] -= 1
+        if enrollment['remaining'] > 0:
+            self.root.after(int(ENROLLMENT_INTERVAL * 1000), self._capture_enrollment_sample)
+            return
+
+        self._enrollment = None
+        nama, departemen, posisi, username, password = enrollment['data']
+        frames = enrollment['frames']
+        if frames:
+            result = self.face_service.register_employee(
+                nama, departemen, posisi, frames, username=username, password=password
+            )
+            if result['status'] == 'success':
+                messagebox.showinfo("Berhasil", result['message'])
+                self.update_status()
             else:
-                messagebox.showerror("Error", "Tidak dapat mengambil gambar dari kamera")
+                messagebox.showerror("Error", result['message'])
+        else:
+            messagebox.showerror("Error", "Tidak dapat mengambil gambar dari kamera")
 
     def lakukan_absensi(self):
         """Lakukan absensi menggunakan service"""
         ret, frame = self.cap.read()
         if ret:
             # Gunakan service untuk absensi
-            result = self.face_service.do_absensi(frame)
+            result = self.face_service.do_absensi(frame, motion=self.motion_tracker)
             
             if result['status'] == 'success':
                 data = result['data']
@@ -146,8 +184,13 @@ class AbsensiApp:
             messagebox.showerror("Error", "Tidak dapat mengambil gambar dari kamera")
 
     def reload_faces(self):
-        """Reload known faces dari database"""
+        """Reload known faces dari database (hanya karyawan yang berubah)"""
         try:
+            if self.face_service.replicator is not None:
+                try:
+                    self.face_service.replicator.pull()
+                except Exception as e:
+                    print(f"⚠️ Server tidak terjangkau, reload dari salinan lokal: {e}")
             success = self.face_service.load_known_faces()
             if success:
                 self.update_status()
@@ -159,28 +202,45 @@ class AbsensiApp:
 
     def update_status(self):
         """Update status label"""
-        self.status_label.config(
-            text=f"Known faces loaded: {len(self.face_service.known_face_encodings)}"
-        )
+        text = f"Known faces loaded: {len(self.face_service.known_face_encodings)}"
+        replicator = self.face_service.replicator
+        if replicator is not None:
+            sync = replicator.status()
+            text += f"\nSinkronisasi: {'online' if sync['online'] else 'offline'}, {sync['pending']} antrian"
+            if sync['failed']:
+                text += f", {sync['failed']} gagal"
+        self.status_label.config(text=text)
+
+    def refresh_sync_status(self):
+        """Status antrian local store diperbarui berkala (mode LOCAL_STORE)"""
+        self.update_status()
+        self.root.after(SYNC_STATUS_INTERVAL_MS, self.refresh_sync_status)
 
     def update_video(self):
         """Update video display dengan face detection"""
-        ret, frame = self.cap.read()
+        # Buffer capture/RGB/display dipakai ulang antar frame (dialokasikan
+        # ulang hanya jika resolusi kamera berubah)
+        ret, frame = self.cap.read(self._capture)
         if ret:
-            # Deteksi wajah dan gambar bounding box
+            self._capture = frame
+            if self._rgb is None or self._rgb.shape != frame.shape:
+                self._rgb = np.empty_like(frame)
+            # Satu konversi BGR -> RGB per frame; deteksi, liveness dan display memakai RGB
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+
+            # Deteksi wajah dan gambar bounding box (preview: stage detector pertama saja)
             try:
-                import face_recognition
-                face_locations = face_recognition.face_locations(frame)
+                face_locations = self.face_service.detector.locate(rgb, escalate=False)
+                self.motion_tracker.update(rgb, face_locations[0] if face_locations else None)
                 for (top, right, bottom, left) in face_locations:
-                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+                    cv2.rectangle(rgb, (left, top), (right, bottom), (0, 255, 0), 2)
             except ImportError:
                 # Jika face_recognition tidak tersedia, skip face detection
                 pass
 
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame_rgb)
-            img = img.resize((640, 480), Image.Resampling.LANCZOS)
-            imgtk = ImageTk.PhotoImage(image=img)
+            display = cv2.resize(rgb, DISPLAY_SIZE, dst=self._display, interpolation=cv2.INTER_AREA)
+            self._display = display
+            imgtk = ImageTk.PhotoImage(image=Image.fromarray(display))
 
             self.video_label.imgtk = imgtk
             self.video_label.configure(image=imgtk)
@@ -0,0 +1,131 @@
+"""
+Match Policy - keputusan terima/tolak hasil scoring wajah
+
+Aturan:
+- tolerance: jarak kandidat terbaik harus <= tolerance
+- margin: kandidat terbaik harus lebih dekat minimal `margin` dari kandidat
+  kedua (orang lain); jika dua orang hampir sama dekat, hasil dianggap ambigu
+  dan ditolak daripada salah mencatat absensi orang lain
+
+Threshold bisa berbeda per site (kamera, pencahayaan, jumlah karyawan).
+Konfigurasi dibaca dari file JSON (env MATCH_THRESHOLDS_FILE, default
+match_thresholds.json), format sama dengan output calibrate_thresholds.py:
+
+    {
+        "default": {"tolerance": 0.45, "margin": 0.02},
+        "sites": {"plant-a": {"tolerance": 0.42, "margin": 0.03}}
+    }
+
+Env MATCH_TOLERANCE / MATCH_MARGIN menimpa nilai default.
+
+Setiap keputusan bisa dicatat ke log JSONL (jarak top-k) sebagai bahan
+kalibrasi offline.
+"""
+import datetime
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from face_templates import DEFAULT_TOLERANCE
+
+DEFAULT_MARGIN = 0.02
+THRESHOLDS_FILE = "match_thresholds.json"
+
+
+class MatchThresholds:
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE, margin: float = DEFAULT_MARGIN):
+        self.tolerance = tolerance
+        self.margin = margin
+
+    def to_dict(self) -> Dict:
+        return {'tolerance': self.tolerance, 'margin': self.margin}
+
+    def decide(self, distances: Sequence[float]) -> Tuple[bool, Optional[str]]:
+        """
+        Terapkan aturan tolerance + margin ke jarak kandidat (urut naik, satu per orang)
+
+        Returns:
+            Tuple (diterima, alasan penolakan: 'no_candidate' | 'above_tolerance' | 'ambiguous')
+        """
+        if not distances:
+            return False, 'no_candidate'
+        if distances[0] > self.tolerance:
+            return False, 'above_tolerance'
+        if len(distances) > 1 and distances[1] - distances[0] < self.margin:
+            return False, 'ambiguous'
+        return True, None
+
+
+class ThresholdConfig:
+    def __init__(self, default: Optional[MatchThresholds] = None, sites: Optional[Dict[str, MatchThresholds]] = None):
+        self.default = default or MatchThresholds()
+        self.sites = sites or {}
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'ThresholdConfig':
+        """Baca konfigurasi threshold dari file JSON + override env"""
+        path = path or os.getenv('MATCH_THRESHOLDS_FILE', THRESHOLDS_FILE)
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Error reading match thresholds {path}: {e}")
+
+        default = data.get('default', {})
+        default = MatchThresholds(
+            tolerance=float(os.getenv('MATCH_TOLERANCE', default.get('tolerance', DEFAULT_TOLERANCE))),
+            margin=float(os.getenv('MATCH_MARGIN', default.get('margin', DEFAULT_MARGIN)))
+        )
+        sites = {
+            site: MatchThresholds(
+                tolerance=float(values.get('tolerance', default.tolerance)),
+                margin=float(values.get('margin', default.margin))
+            )
+            for site, values in data.get('sites', {}).items()
+        }
+        return cls(default, sites)
+
+    def for_site(self, site_id: Optional[str]) -> MatchThresholds:
+        return self.sites.get(site_id, self.default)
+
+    def to_dict(self) -> Dict:
+        return {
+            'default': self.default.to_dict(),
+            'sites': {site: thresholds.to_dict() for site, thresholds in self.sites.items()}
+        }
+
+
+class DistanceLog:
+    """Append-only log JSONL jarak top-k per keputusan match"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, site_id: str, mode: str, candidates: List[Tuple[str, float]],
+               accepted: bool, reason: Optional[str]) -> None:
+        """
+        Args:
+            site_id: Site tempat check-in
+            mode: '1:N' (desktop, seluruh gallery) atau '1:1' (user dari JWT)
+            candidates: List (nama, jarak) urut dari yang terdekat
+            accepted: Hasil keputusan
+            reason: Alasan penolakan
+        """
+        entry = {
+            'ts': datetime.datetime.now().isoformat(timespec='seconds'),
+            'site_id': site_id,
+            'mode': mode,
+            'candidates': [nama for nama, _ in candidates],
+            'distances': [round(distance, 5) for _, distance in candidates],
+            'accepted': accepted,
+            'reason': reason
+        }
+        try:
+            with self._lock, open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except Exception as e:
+            print(f"Error writing distance log: {e}")
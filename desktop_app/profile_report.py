@@ -0,0 +1,116 @@
+"""
+Gabungkan capture request_profiler menjadi flame graph / ringkasan
+
+Default-nya stack dari semua capture (.folded) dijumlahkan dan ditulis dalam
+format collapsed ("frame;frame;frame jumlah") yang bisa langsung dibaca
+flamegraph.pl, speedscope, atau inferno. Stage timing muncul sebagai frame
+"stage:<nama>" di bawah endpoint.
+
+Usage:
+    python profile_report.py profiles/ > absensi.folded
+    flamegraph.pl absensi.folded > absensi.svg
+    python profile_report.py profiles/ --min-ms 1000 --summary
+    python profile_report.py profiles/ --trigger sampled --pstats 30
+"""
+import argparse
+import os
+import statistics
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from request_profiler import PROFILE_DIR, list_captures
+
+
+def select(captures: List[Dict], endpoint: Optional[str], min_ms: float, trigger: Optional[str]) -> List[Dict]:
+    return [
+        c for c in captures
+        if (endpoint is None or c['endpoint'] == endpoint)
+        and c['duration_ms'] >= min_ms
+        and (trigger is None or c['trigger'] == trigger)
+    ]
+
+
+def merge_folded(captures: List[Dict]) -> Counter:
+    stacks = Counter()
+    for capture in captures:
+        try:
+            with open(capture['path'] + '.folded', 'r') as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        stacks[stack] += int(count)
+        except FileNotFoundError:
+            continue
+    return stacks
+
+
+def print_summary(captures: List[Dict]) -> None:
+    print(f"{'started':<20} {'endpoint':<22} {'ms':>8} {'trigger':<8} {'status':<8} stages / fields")
+    stage_times = defaultdict(list)
+    for c in captures:
+        stages = ' '.join(f"{s['name']}={s['ms']:.0f}" for s in c['stages'])
+        fields = ' '.join(f"{k}={v}" for k, v in c.get('fields', {}).items())
+        print(f"{c['started_at'][:19]:<20} {c['endpoint']:<22} {c['duration_ms']:>8.0f} "
+              f"{c['trigger']:<8} {str(c.get('status')):<8} {stages}  {fields}")
+        for s in c['stages']:
+            stage_times[s['name']].append(s['ms'])
+
+    durations = sorted(c['duration_ms'] for c in captures)
+    print(f"\n{len(captures)} capture, durasi median {statistics.median(durations):.0f} ms, "
+          f"max {durations[-1]:.0f} ms")
+    print(f"{'stage':<16} {'n':>5} {'mean ms':>8} {'max ms':>8}")
+    for name, times in sorted(stage_times.items(), key=lambda item: -sum(item[1])):
+        print(f"{name:<16} {len(times):>5} {statistics.mean(times):>8.1f} {max(times):>8.1f}")
+
+
+def print_pstats(captures: List[Dict], limit: int) -> int:
+    import pstats
+
+    paths = [c['path'] + '.prof' for c in captures if os.path.exists(c['path'] + '.prof')]
+    if not paths:
+        print("❌ Tidak ada capture cProfile (PROFILE_MODE=cprofile, trigger sampled)", file=sys.stderr)
+        return 1
+    stats = pstats.Stats(paths[0])
+    for path in paths[1:]:
+        stats.add(path)
+    print(f"{len(paths)} profil cProfile digabung")
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gabungkan capture profil request")
+    parser.add_argument('directory', nargs='?', default=os.getenv('PROFILE_DIR', PROFILE_DIR))
+    parser.add_argument('--endpoint', help="Hanya endpoint ini (mis. /api/absensi)")
+    parser.add_argument('--min-ms', type=float, default=0.0, help="Hanya request minimal N ms")
+    parser.add_argument('--trigger', choices=['sampled', 'slow'])
+    parser.add_argument('--summary', action='store_true', help="Tabel capture + stage timing, bukan flame graph")
+    parser.add_argument('--pstats', type=int, metavar='N', help="Top N fungsi dari gabungan cProfile")
+    parser.add_argument('--output', help="Tulis output collapsed ke file ini (default stdout)")
+    args = parser.parse_args(argv)
+
+    captures = select(list_captures(args.directory), args.endpoint, args.min_ms, args.trigger)
+    if not captures:
+        print("❌ Tidak ada capture yang cocok", file=sys.stderr)
+        return 1
+    if args.summary:
+        print_summary(captures)
+        return 0
+    if args.pstats:
+        return print_pstats(captures, args.pstats)
+
+    stacks = merge_folded(captures)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for stack, count in sorted(stacks.items()):
+            out.write(f"{stack} {count}\n")
+    finally:
+        if args.output:
+            out.close()
+    print(f"{len(captures)} capture, {sum(stacks.values())} sample", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
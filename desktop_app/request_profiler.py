@@ -0,0 +1,293 @@
+"""
+Request Profiler - profil per request untuk check-in yang lambat (opt-in)
+
+Dua pemicu:
+- Sampling: sebagian request (PROFILE_SAMPLE_RATE) diprofil penuh dengan
+  cProfile (PROFILE_MODE=cprofile) atau hanya stack sampling (stack)
+- Lambat: setiap request yang diprofil di-stack-sample dengan murah
+  (satu thread sampler, sys._current_frames tiap PROFILE_INTERVAL_MS); hasil
+  hanya disimpan jika durasinya >= PROFILE_SLOW_MS, jadi request lambat
+  tertangkap tanpa tahu sebelumnya request mana yang akan lambat
+
+Setiap capture berisi <nama>.json (endpoint, durasi, pemicu, status, stage
+timing, ukuran gambar, dll), <nama>.folded (stack sampling, format collapsed
+"frame;frame;frame jumlah") dan <nama>.prof (cProfile, jika ada). Direktori
+dibatasi PROFILE_MAX_CAPTURES capture terbaru. Gabungkan dengan
+profile_report.py untuk flame graph.
+
+Kode yang diprofil menandai tahapannya dengan stage("detect") dan
+menambahkan info dengan annotate(width=..., height=...); keduanya no-op jika
+thread ini tidak sedang diprofil.
+
+Konfigurasi lewat environment:
+    PROFILE_SAMPLE_RATE   fraksi request yang diprofil (0-1, default 0)
+    PROFILE_SLOW_MS       simpan profil request >= N ms (default 0 = mati)
+    PROFILE_MODE          cprofile | stack (untuk request sampling, default cprofile)
+    PROFILE_DIR           direktori capture (default profiles)
+    PROFILE_MAX_CAPTURES  jumlah capture yang disimpan (default 200)
+    PROFILE_INTERVAL_MS   interval stack sampling (default 5)
+
+Catatan: kode native yang memegang GIL (mis. dlib) tidak bisa disela
+sampler; waktunya terlihat di stage timing, bukan di stack.
+"""
+import cProfile
+import datetime
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+PROFILE_DIR = "profiles"
+MAX_CAPTURES = 200
+INTERVAL_MS = 5.0
+
+_local = threading.local()
+# Hanya satu cProfile aktif per process (Python 3.12+: satu tool profiler per interpreter)
+_cprofile_lock = threading.Lock()
+
+
+def current_profile() -> Optional['RequestProfile']:
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def stage(name: str):
+    """Catat durasi satu tahap request yang sedang diprofil"""
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+    parent = profile.current_stage
+    profile.current_stage = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stages.append((name, (time.perf_counter() - start) * 1000))
+        profile.current_stage = parent
+
+
+def annotate(**fields) -> None:
+    """Tambahkan info (ukuran gambar, jumlah wajah, ...) ke request yang sedang diprofil"""
+    profile = current_profile()
+    if profile is not None:
+        profile.fields.update(fields)
+
+
+class RequestProfile:
+    def __init__(self, endpoint: str, sampled: bool):
+        self.endpoint = endpoint
+        self.sampled = sampled
+        self.thread_id = threading.get_ident()
+        self.started_at = datetime.datetime.now()
+        self.started = time.perf_counter()
+        self.stages = []
+        self.fields = {}
+        self.stacks = Counter()
+        self.current_stage = None
+        self.cprofile = None
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Satu thread yang mengambil stack semua thread yang sedang diprofil"""
+
+    def __init__(self, interval_ms: float = INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    def register(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[id(profile)] = profile
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+
+    def unregister(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.pop(id(profile), None)
+            if not self._profiles:
+                self._active.clear()
+
+    def _sample(self) -> None:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        frames = sys._current_frames()
+        for profile in profiles:
+            frame = frames.get(profile.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            names.reverse()
+            if profile.current_stage:
+                names.insert(0, f"stage:{profile.current_stage}")
+            profile.stacks[';'.join(names)] += 1
+
+    def _run(self) -> None:
+        while True:
+            self._active.wait()
+            self._sample()
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    def __init__(self, sample_rate: float = 0.0, slow_ms: float = 0.0, directory: str = PROFILE_DIR,
+                 max_captures: int = MAX_CAPTURES, mode: str = 'cprofile', interval_ms: float = INTERVAL_MS):
+        """
+        Args:
+            sample_rate: Fraksi request yang selalu disimpan (0-1)
+            slow_ms: Request >= N ms disimpan; 0 = pemicu lambat mati
+            directory: Direktori capture
+            max_captures: Capture terlama dihapus di atas jumlah ini
+            mode: 'cprofile' atau 'stack' untuk request hasil sampling
+            interval_ms: Interval stack sampling
+        """
+        if mode not in ('cprofile', 'stack'):
+            raise ValueError(f"Unknown PROFILE_MODE: {mode}")
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self.max_captures = max_captures
+        self.mode = mode
+        self.interval_ms = interval_ms
+        self.sampler = StackSampler(interval_ms)
+        self._random = random.Random()
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'RequestProfiler':
+        return cls(
+            sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', '0')),
+            slow_ms=float(os.getenv('PROFILE_SLOW_MS', '0')),
+            directory=os.getenv('PROFILE_DIR', PROFILE_DIR),
+            max_captures=int(os.getenv('PROFILE_MAX_CAPTURES', str(MAX_CAPTURES))),
+            mode=os.getenv('PROFILE_MODE', 'cprofile').lower(),
+            interval_ms=float(os.getenv('PROFILE_INTERVAL_MS', str(INTERVAL_MS)))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    def begin(self, endpoint: str) -> Optional[RequestProfile]:
+        """
+        Mulai profil request di thread ini
+
+        Returns:
+            RequestProfile (berikan ke end()), atau None jika profiler mati
+            atau thread ini sudah diprofil
+        """
+        if not self.enabled or current_profile() is not None:
+            return None
+        profile = RequestProfile(endpoint, sampled=self._random.random() < self.sample_rate)
+        if profile.sampled and self.mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+            profile.cprofile = cProfile.Profile()
+            try:
+                profile.cprofile.enable()
+            except ValueError:
+                # Profiler lain (debugger, coverage) sudah aktif
+                profile.cprofile = None
+                _cprofile_lock.release()
+        _local.profile = profile
+        self.sampler.register(profile)
+        return profile
+
+    def end(self, profile: Optional[RequestProfile], status=None) -> Optional[str]:
+        """
+        Selesaikan profil; simpan jika request hasil sampling atau lambat
+
+        Returns:
+            Path capture (.json) atau None jika tidak disimpan
+        """
+        if profile is None:
+            return None
+        duration_ms = (time.perf_counter() - profile.started) * 1000
+        if profile.cprofile is not None:
+            profile.cprofile.disable()
+            _cprofile_lock.release()
+        self.sampler.unregister(profile)
+        _local.profile = None
+
+        if profile.sampled:
+            trigger = 'sampled'
+        elif self.slow_ms > 0 and duration_ms >= self.slow_ms:
+            trigger = 'slow'
+        else:
+            return None
+        try:
+            return self._write(profile, duration_ms, trigger, status)
+        except Exception as e:
+            print(f"⚠️ Profil request tidak tersimpan: {e}")
+            return None
+
+    def _write(self, profile: RequestProfile, duration_ms: float, trigger: str, status) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', profile.endpoint).strip('-') or 'request'
+        name = f"{profile.started_at.strftime('%Y%m%d-%H%M%S')}_{slug}_{duration_ms:.0f}ms_{uuid.uuid4().hex[:6]}"
+        base = os.path.join(self.directory, name)
+
+        with open(base + '.folded', 'w') as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f"{slug};{stack} {count}\n")
+        if profile.cprofile is not None:
+            profile.cprofile.dump_stats(base + '.prof')
+        meta = {
+            'endpoint': profile.endpoint,
+            'trigger': trigger,
+            'status': status,
+            'duration_ms': round(duration_ms, 2),
+            'started_at': profile.started_at.isoformat(),
+            'stages': [{'name': name, 'ms': round(ms, 2)} for name, ms in profile.stages],
+            'fields': profile.fields,
+            'samples': sum(profile.stacks.values()),
+            'interval_ms': self.interval_ms,
+            'cprofile': profile.cprofile is not None,
+            'pid': os.getpid()
+        }
+        # .json ditulis terakhir: capture dianggap lengkap setelah file ini ada
+        with open(base + '.json', 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        self._rotate()
+        return base + '.json'
+
+    def _rotate(self) -> None:
+        with self._write_lock:
+            captures = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+            for name in captures[:-self.max_captures] if self.max_captures > 0 else []:
+                for ext in ('.json', '.folded', '.prof'):
+                    try:
+                        os.remove(os.path.join(self.directory, name + ext))
+                    except FileNotFoundError:
+                        pass
+
+
+def list_captures(directory: str) -> List[Dict]:
+    """Metadata semua capture di directory (urut waktu), dengan key 'path' tanpa ekstensi"""
+    captures = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name[:-5])
+        try:
+            with open(path + '.json', 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta['path'] = path
+        captures.append(meta)
+    return captures
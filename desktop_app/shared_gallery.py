@@ -0,0 +1,158 @@
+"""
+Shared Gallery - gallery wajah yang dipakai bersama oleh semua worker
+gunicorn dalam satu host
+
+Gallery ditulis sebagai file .npy per generasi di direktori bersama
+(default /dev/shm, yaitu tmpfs). Worker membaca dengan np.load(mmap_mode='r')
+sehingga tidak ada copy: semua worker memakai page yang sama dan memory
+hanya dibayar sekali per host.
+
+Publish generasi baru bersifat atomic: file generasi ditulis lengkap dulu,
+lalu pointer CURRENT diganti dengan os.replace. Worker cukup stat() file
+CURRENT untuk tahu ada generasi baru.
+
+Struktur direktori:
+    <dir>/CURRENT            -> berisi nama generasi aktif, mis. gen-000007
+    <dir>/gen-000007/meta.json
+    <dir>/gen-000007/centroids.npy
+    <dir>/gen-000007/samples.npy
+    <dir>/gen-000007/quality.npy
+    <dir>/gen-000007/offsets.npy
+"""
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from typing import Optional
+
+from face_gallery import FaceGallery
+
+POINTER_FILE = "CURRENT"
+GENERATION_PREFIX = "gen-"
+
+# Generasi lama yang masih disimpan; worker yang masih memegang mmap
+# generasi yang sudah dihapus tetap aman (inode hidup sampai di-unmap)
+KEEP_GENERATIONS = 2
+
+
+def default_shared_dir() -> str:
+    """Direktori default: tmpfs /dev/shm jika ada, selain itu data_wajah/shared"""
+    if os.path.isdir('/dev/shm'):
+        return os.path.join('/dev/shm', 'absensi_gallery')
+    return os.path.join('data_wajah', 'shared')
+
+
+class SharedGallery:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or default_shared_dir()
+        os.makedirs(self.directory, exist_ok=True)
+        self.pointer_path = os.path.join(self.directory, POINTER_FILE)
+        self.generation = None
+        self._pointer_stat = None
+
+    def _read_pointer(self) -> Optional[str]:
+        try:
+            with open(self.pointer_path, 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def changed(self) -> bool:
+        """Cek (via stat) apakah pointer CURRENT berubah sejak attach terakhir"""
+        try:
+            st = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return False
+        return (st.st_ino, st.st_mtime_ns) != self._pointer_stat
+
+    def attach(self) -> Optional[FaceGallery]:
+        """
+        Attach read-only ke generasi aktif (zero copy via mmap)
+
+        Returns:
+            FaceGallery yang array-nya berupa view dari file mmap, atau None
+            jika belum ada generasi yang dipublish
+        """
+        try:
+            st = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return None
+        generation = self._read_pointer()
+        if generation is None:
+            return None
+
+        gen_dir = os.path.join(self.directory, generation)
+        try:
+            with open(os.path.join(gen_dir, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+            centroids = np.load(os.path.join(gen_dir, 'centroids.npy'), mmap_mode='r')
+            samples = np.load(os.path.join(gen_dir, 'samples.npy'), mmap_mode='r')
+            quality = np.load(os.path.join(gen_dir, 'quality.npy'), mmap_mode='r')
+            offsets = np.load(os.path.join(gen_dir, 'offsets.npy'))
+        except FileNotFoundError:
+            # Generasi sudah dibersihkan publisher lain, coba lagi di request berikutnya
+            return None
+
+        self.generation = generation
+        self._pointer_stat = (st.st_ino, st.st_mtime_ns)
+        return FaceGallery(
+            data=meta['data'],
+            samples=[samples[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)],
+            quality=[quality[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)],
+            centroids=centroids,
+            version=meta['version']
+        )
+
+    def publish(self, gallery: FaceGallery) -> str:
+        """
+        Tulis gallery sebagai generasi baru lalu swap pointer secara atomic
+
+        Returns:
+            Nama generasi baru
+        """
+        generations = self._generations()
+        last = int(generations[-1][len(GENERATION_PREFIX):]) if generations else 0
+        tmp_dir = tempfile.mkdtemp(prefix='.publish_', dir=self.directory)
+        try:
+            counts = np.array([len(s) for s in gallery.samples], dtype=np.int64)
+            np.save(os.path.join(tmp_dir, 'offsets.npy'), np.concatenate([[0], np.cumsum(counts)]))
+            np.save(os.path.join(tmp_dir, 'centroids.npy'), np.asarray(gallery.centroids, dtype=np.float64))
+            np.save(os.path.join(tmp_dir, 'samples.npy'),
+                    np.vstack(gallery.samples) if gallery.samples else np.empty((0, 128)))
+            np.save(os.path.join(tmp_dir, 'quality.npy'),
+                    np.concatenate(gallery.quality) if gallery.quality else np.empty(0))
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump({'version': gallery.version, 'data': gallery.data}, f)
+
+            # Nama generasi diambil dengan rename; jika bentrok dengan publisher
+            # lain, coba nomor berikutnya
+            while True:
+                last += 1
+                generation = f"{GENERATION_PREFIX}{last:06d}"
+                try:
+                    os.rename(tmp_dir, os.path.join(self.directory, generation))
+                    break
+                except OSError:
+                    if not os.path.exists(os.path.join(self.directory, generation)):
+                        raise
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        fd, tmp_pointer = tempfile.mkstemp(prefix='.pointer_', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            f.write(generation)
+        os.replace(tmp_pointer, self.pointer_path)
+
+        self._cleanup(keep=generation)
+        return generation
+
+    def _generations(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith(GENERATION_PREFIX))
+
+    def _cleanup(self, keep: str) -> None:
+        """Hapus generasi lama, sisakan KEEP_GENERATIONS terbaru"""
+        generations = [g for g in self._generations() if g <= keep]
+        for generation in generations[:-KEEP_GENERATIONS]:
+            shutil.rmtree(os.path.join(self.directory, generation), ignore_errors=True)
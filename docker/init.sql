@@ -9,6 +9,8 @@ CREATE TABLE IF NOT EXISTS karyawan (
     face_encoding_path TEXT,
     username VARCHAR(50) UNIQUE NOT NULL,
     password_hash TEXT NOT NULL,
+    tenant_id VARCHAR(50) NOT NULL DEFAULT 'default',
+    site_id VARCHAR(50) NOT NULL DEFAULT 'default',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -21,6 +23,9 @@ CREATE TABLE IF NOT EXISTS log_absensi (
     tanggal DATE NOT NULL,
     jam TIME NOT NULL,
     path_gambar TEXT,
+    client_id VARCHAR(64),
+    tenant_id VARCHAR(50) NOT NULL DEFAULT 'default',
+    site_id VARCHAR(50) NOT NULL DEFAULT 'default',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -29,6 +34,59 @@ CREATE INDEX IF NOT EXISTS idx_log_absensi_tanggal ON log_absensi(tanggal);
 CREATE INDEX IF NOT EXISTS idx_log_absensi_nama ON log_absensi(nama);
 CREATE INDEX IF NOT EXISTS idx_log_absensi_departemen ON log_absensi(departemen);
 CREATE INDEX IF NOT EXISTS idx_karyawan_nama ON karyawan(nama);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_log_absensi_tenant_client_id ON log_absensi(tenant_id, client_id);
+CREATE INDEX IF NOT EXISTS idx_karyawan_tenant_site ON karyawan(tenant_id, site_id, id);
+CREATE INDEX IF NOT EXISTS idx_log_absensi_tenant_site_tanggal ON log_absensi(tenant_id, site_id, tanggal);
+
+-- Feed perubahan karyawan: gallery wajah di-update incremental dari sini
+-- (version naik terus, NOTIFY karyawan_changes "tenant/site/version").
+-- Advisory lock: version dibagikan sesuai urutan commit. Ganti password
+-- tidak tercatat (UPDATE OF kolom gallery saja).
+CREATE TABLE IF NOT EXISTS karyawan_changes (
+    version BIGSERIAL PRIMARY KEY,
+    karyawan_id INTEGER NOT NULL,
+    op CHAR(1) NOT NULL,
+    tenant_id VARCHAR(50) NOT NULL,
+    site_id VARCHAR(50) NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_karyawan_changes_tenant_site ON karyawan_changes(tenant_id, site_id, version);
+
+CREATE OR REPLACE FUNCTION karyawan_change_feed() RETURNS trigger AS $$
+DECLARE
+    changed BIGINT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('karyawan_changes'));
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO karyawan_changes (karyawan_id, op, tenant_id, site_id)
+        VALUES (OLD.id, 'D', OLD.tenant_id, OLD.site_id) RETURNING version INTO changed;
+        PERFORM pg_notify('karyawan_changes', OLD.tenant_id || '/' || OLD.site_id || '/' || changed);
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        -- Pindah tenant/site: partisi lama mencatat hapus
+        IF OLD.tenant_id <> NEW.tenant_id OR OLD.site_id <> NEW.site_id THEN
+            INSERT INTO karyawan_changes (karyawan_id, op, tenant_id, site_id)
+            VALUES (OLD.id, 'D', OLD.tenant_id, OLD.site_id) RETURNING version INTO changed;
+            PERFORM pg_notify('karyawan_changes', OLD.tenant_id || '/' || OLD.site_id || '/' || changed);
+        END IF;
+    END IF;
+    INSERT INTO karyawan_changes (karyawan_id, op, tenant_id, site_id)
+    VALUES (NEW.id, left(TG_OP, 1), NEW.tenant_id, NEW.site_id) RETURNING version INTO changed;
+    PERFORM pg_notify('karyawan_changes', NEW.tenant_id || '/' || NEW.site_id || '/' || changed);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS karyawan_change_feed ON karyawan;
+CREATE TRIGGER karyawan_change_feed
+AFTER INSERT OR DELETE OR UPDATE OF nama, departemen, posisi, face_encoding_path, tenant_id, site_id
+ON karyawan
+FOR EACH ROW EXECUTE FUNCTION karyawan_change_feed();
+
+-- Pencarian nama di dashboard (ILIKE '%...%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_log_absensi_nama_trgm ON log_absensi USING gin (nama gin_trgm_ops);
 
 
 -- Grant necessary permissions
@@ -5,6 +5,26 @@ import 'package:http/http.dart' as http;
 import 'main.dart'; 
 
 String? globalAccessToken;
+String? globalRefreshToken;
+
+/// Tukar refresh token dengan access token baru, tanpa login ulang.
+/// Return true jika berhasil (globalAccessToken sudah diperbarui).
+Future<bool> refreshAccessToken(String apiUrl) async {
+  if (globalRefreshToken == null) return false;
+  try {
+    final res = await http
+        .post(
+          Uri.parse('$apiUrl/token/refresh'),
+          headers: {"Authorization": "Bearer $globalRefreshToken"},
+        )
+        .timeout(const Duration(seconds: 10));
+    if (res.statusCode != 200) return false;
+    globalAccessToken = jsonDecode(res.body)['access_token'];
+    return globalAccessToken != null;
+  } catch (_) {
+    return false;
+  }
+}
 
 class LoginPage extends StatefulWidget {
   final String apiUrl;
@@ -37,6 +57,7 @@ class _LoginPageState extends State<LoginPage> {
       if (res.statusCode == 200) {
         final body = jsonDecode(res.body);
         globalAccessToken = body['access_token']; // Simpan token JWT
+        globalRefreshToken = body['refresh_token'];
         ScaffoldMessenger.of(context).showSnackBar(
           SnackBar(content: Text("Login sukses! Selamat datang ${body['data']['nama']}"), backgroundColor: Colors.green),
         );
@@ -134,17 +134,23 @@ class _AttendancePageState extends State<AttendancePage> {
     String base64Image = base64Encode(imageBytes);
 
     try {
-      var res = await http.post(
+      Future<http.Response> postAttendance() => http.post(
         Uri.parse(apiUrl),
         headers: {
           "Content-Type": "application/json",
-          "Authorization": "Bearer ${widget.accessToken}", // Tambahkan header Authorization
+          "Authorization": "Bearer ${globalAccessToken ?? widget.accessToken}", // Tambahkan header Authorization
         },
         body: jsonEncode({
           "image": base64Image,
         }),
       )
       .timeout(const Duration(seconds: 20));
+
+      var res = await postAttendance();
+      // Access token kedaluwarsa: refresh sekali lalu ulangi request
+      if (res.statusCode == 401 && await refreshAccessToken(apiUrl.replaceAll('/absensi', ''))) {
+        res = await postAttendance();
+      }
       
       setState(() => _isLoading = false);
 